@@ -14,12 +14,28 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 load_dotenv()
 
-from fastapi import FastAPI
-from fastapi.responses import StreamingResponse
-from app.api.models import UserDataInput
-from app.services.recommender import generate_advice_stream
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from app.api.models import BatchAdviceRequest, UserDataInput
+from app.core.config import get_batch_max_items
+from app.services.batch_advice import BatchItemCounter, stream_batch_advice
+from app.services.recommender import generate_advice_stream_async
+from app.services.http_client import close_http_client
+from app.services.metrics import render_metrics
+from app.services.model_registry import model_registry, warm_up_models
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load HF_PRELOAD_MODELS before serving so the first request doesn't pay the load
+    await run_in_threadpool(warm_up_models)
+    yield
+    await close_http_client()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
 async def root():
@@ -27,4 +43,35 @@ async def root():
 
 @app.post("/get_advice")
 async def get_advice(user_data: UserDataInput):
-    return StreamingResponse(generate_advice_stream(user_data), media_type="text/plain")
\ No newline at end of file
+    return StreamingResponse(generate_advice_stream_async(user_data), media_type="text/plain")
+
+@app.post("/batch_advice", openapi_extra={"requestBody": {
+    "required": True, "content": {"application/json": {"schema": BatchAdviceRequest.model_json_schema()}},
+}})
+async def batch_advice(request: Request):
+    # Records are counted while the body arrives, so an oversized batch is refused before it is buffered and validated
+    max_items = get_batch_max_items()
+    counter = BatchItemCounter()
+    body = bytearray()
+    async for data in request.stream():
+        body += data
+        if counter.feed(data) > max_items:
+            raise HTTPException(status_code=413, detail=f"A batch may contain at most {max_items} items")
+    try:
+        batch = BatchAdviceRequest.model_validate_json(bytes(body))
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
+    # One NDJSON line per item, in completion order; `index` refers back to the request
+    return StreamingResponse(
+        stream_batch_advice(batch.items, batch.max_concurrency), media_type="application/x-ndjson"
+    )
+
+@app.get("/model_pool/stats")
+async def model_pool_stats():
+    return model_registry.get_stats()
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -1,7 +1,20 @@
-from pydantic import BaseModel, validator, Field
-from typing import List, Optional
+from pydantic import BaseModel, validator, Field, GetCoreSchemaHandler
+from pydantic_core import core_schema
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Union
+import hashlib
+import math
 import pandas as pd
 from datetime import date
+from pandas.api.types import union_categoricals
+
+if TYPE_CHECKING:
+    from app.services.statement_index import StatementIndex
+
+try:
+    import pyarrow  # noqa: F401
+    DESCRIPTION_DTYPE = "string[pyarrow]"
+except ImportError:
+    DESCRIPTION_DTYPE = object
 
 class BankStatementEntry(BaseModel):
     Date: date
@@ -10,6 +23,162 @@ class BankStatementEntry(BaseModel):
     Withdrawals: Optional[float] = None
     Deposits: Optional[float] = None
 
+def _optional_float(value) -> Optional[float]:
+    return None if pd.isna(value) else float(value)
+
+class BankStatement(Sequence):
+    """
+    Columnar bank statement shared across the request lifecycle.
+
+    Transactions are held once in a compact DataFrame (datetime dates,
+    categorical categories, float amounts). Iterating or indexing yields
+    BankStatementEntry views built on demand, so code written against
+    List[BankStatementEntry] keeps working, while analytics use to_frame()
+    directly instead of rebuilding a DataFrame from entry objects.
+    """
+
+    COLUMNS = ['Date', 'Description', 'Category', 'Withdrawals', 'Deposits']
+
+    def __init__(self, frame: pd.DataFrame):
+        missing_columns = [col for col in ['Date', 'Description', 'Category'] if col not in frame.columns]
+        if missing_columns:
+            raise ValueError(f"Bank statement is missing required columns: {', '.join(missing_columns)}")
+        self._frame = pd.DataFrame({
+            'Date': pd.to_datetime(frame['Date']).to_numpy(),
+            'Description': pd.array(frame['Description'].astype(str).to_numpy(), dtype=DESCRIPTION_DTYPE),
+            'Category': pd.Categorical(frame['Category'].astype(str).to_numpy()),
+            'Withdrawals': pd.to_numeric(frame['Withdrawals'], errors='coerce').astype(float).to_numpy()
+                if 'Withdrawals' in frame.columns else 0.0,
+            'Deposits': pd.to_numeric(frame['Deposits'], errors='coerce').astype(float).to_numpy()
+                if 'Deposits' in frame.columns else 0.0,
+        })
+        if 'Summary' in frame.columns:
+            # Marks the monthly total rows of a statement reduced by aggregate_statement_chunks
+            self._frame['Summary'] = frame['Summary'].eq(True).to_numpy()
+        self._fingerprint = None
+        self._hasher = None
+        self._aggregates = None
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "BankStatement":
+        return cls(frame)
+
+    @classmethod
+    def from_entries(cls, entries: List[Union[BankStatementEntry, Dict[str, Any]]]) -> "BankStatement":
+        entries = [entry if isinstance(entry, BankStatementEntry) else BankStatementEntry(**entry) for entry in entries]
+        return cls(pd.DataFrame({
+            column: [getattr(entry, column) for entry in entries] for column in cls.COLUMNS
+        }))
+
+    def to_frame(self) -> pd.DataFrame:
+        """The shared underlying DataFrame. Treat it as read-only; copy before modifying."""
+        return self._frame
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return [entry.dict() for entry in self]
+
+    def aggregates(self) -> "StatementIndex":
+        """Category x month aggregates of the statement, built on first use."""
+        if self._aggregates is None:
+            # Imported here so the API schema does not depend on the services layer at import time
+            from app.services.statement_index import StatementIndex
+
+            self._aggregates = StatementIndex.from_frame(self._frame)
+        return self._aggregates
+
+    def total(self, column: str) -> float:
+        return self.aggregates().total(column)
+
+    def category_totals(self, column: str = 'Withdrawals') -> pd.Series:
+        return self.aggregates().category_totals(column)
+
+    def fingerprint(self) -> str:
+        """Content hash of the statement, stable across processes."""
+        if self._fingerprint is None:
+            if self._hasher is None:
+                self._hasher = hashlib.sha256(self._row_hashes(self._frame))
+            self._fingerprint = self._hasher.hexdigest()
+        return self._fingerprint
+
+    @staticmethod
+    def _row_hashes(frame: pd.DataFrame) -> bytes:
+        return pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes()
+
+    def append(self, transactions: Union["BankStatement", pd.DataFrame, List[Any]]) -> "BankStatement":
+        """
+        A new statement with transactions added after these ones.
+
+        The aggregates and fingerprint already computed for this statement
+        are extended with the new rows rather than rebuilt from every row.
+        """
+        if isinstance(transactions, BankStatement):
+            added = transactions
+        elif isinstance(transactions, pd.DataFrame):
+            added = BankStatement.from_frame(transactions)
+        else:
+            added = BankStatement.from_entries(transactions)
+
+        combined = BankStatement.__new__(BankStatement)
+        frame = pd.concat([self._frame, added._frame], ignore_index=True)
+        same_columns = list(self._frame.columns) == list(added._frame.columns)
+        if not same_columns:
+            frame['Summary'] = frame['Summary'].eq(True)
+        frame['Category'] = union_categoricals([self._frame['Category'], added._frame['Category']], ignore_order=True)
+        combined._frame = frame
+        combined._fingerprint = None
+        combined._hasher = None
+        if self._hasher is not None and same_columns:
+            combined._hasher = self._hasher.copy()
+            combined._hasher.update(self._row_hashes(added._frame))
+        combined._aggregates = self._aggregates.append(added._frame) if self._aggregates is not None else None
+        return combined
+
+    def __len__(self) -> int:
+        return len(self._frame)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        row = self._frame.iloc[index]
+        return BankStatementEntry.model_construct(
+            Date=row['Date'].date(), Description=str(row['Description']), Category=str(row['Category']),
+            Withdrawals=_optional_float(row['Withdrawals']), Deposits=_optional_float(row['Deposits'])
+        )
+
+    def __iter__(self) -> Iterator[BankStatementEntry]:
+        columns = zip(
+            self._frame['Date'].dt.date.tolist(),
+            self._frame['Description'].astype(object).tolist(),
+            self._frame['Category'].astype(object).tolist(),
+            self._frame['Withdrawals'].tolist(),
+            self._frame['Deposits'].tolist(),
+        )
+        for entry_date, description, category, withdrawals, deposits in columns:
+            yield BankStatementEntry.model_construct(
+                Date=entry_date, Description=description, Category=category,
+                Withdrawals=_optional_float(withdrawals), Deposits=_optional_float(deposits)
+            )
+
+    def __repr__(self) -> str:
+        return f"BankStatement({len(self)} transactions)"
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source_type: Any, handler: GetCoreSchemaHandler) -> core_schema.CoreSchema:
+        # JSON bodies arrive as a list of entries; Python callers may also pass a
+        # BankStatement or an already-normalized DataFrame without per-row validation.
+        from_entries = core_schema.no_info_after_validator_function(
+            cls.from_entries, handler.generate_schema(List[BankStatementEntry])
+        )
+        return core_schema.json_or_python_schema(
+            json_schema=from_entries,
+            python_schema=core_schema.union_schema([
+                core_schema.is_instance_schema(cls),
+                core_schema.no_info_after_validator_function(cls.from_frame, core_schema.is_instance_schema(pd.DataFrame)),
+                from_entries,
+            ]),
+            serialization=core_schema.plain_serializer_function_ser_schema(lambda statement: statement.to_records()),
+        )
+
 class UserDataInput(BaseModel):
     name: str
     age: int = Field(..., ge=18, le=120)
@@ -18,7 +187,7 @@ class UserDataInput(BaseModel):
     current_savings: float = Field(..., ge=0, le=10000000)
     goals: List[str]
     timeline_months: int = Field(..., ge=1, le=600)
-    bank_statement: List[BankStatementEntry]
+    bank_statement: BankStatement
     selected_llm: str
     constraints: Optional[List[str]] = Field(None, description="User-specified constraints for budgeting")
     follow_up_question: Optional[str] = None
@@ -40,23 +209,17 @@ class UserDataInput(BaseModel):
         if not v:
             raise ValueError("Bank statement must not be empty")
         
-        df = pd.DataFrame([entry.dict() for entry in v])
-        required_columns = ['Date', 'Description', 'Category', 'Withdrawals', 'Deposits']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        
-        if missing_columns:
-            raise ValueError(f"Bank statement is missing required columns: {', '.join(missing_columns)}")
-        
+        # Every BankStatementEntry is validated against its schema, so all required
+        # columns are present; column checks on raw uploads happen at ingestion.
         return v
 
     def to_dict(self):
         def clean_float(value):
             if isinstance(value, float):
-                return None if pd.isna(value) or pd.isinf(value) else round(value, 2)
+                return None if pd.isna(value) or math.isinf(value) else round(value, 2)
             return value
 
         data = self.dict()
-        data['bank_statement'] = [entry.dict() for entry in self.bank_statement]
         
         for entry in data['bank_statement']:
             entry.update({k: clean_float(v) for k, v in entry.items() if isinstance(v, float)})
@@ -68,4 +231,8 @@ class UserDataInput(BaseModel):
     class Config:
         arbitrary_types_allowed = True
 
-__all__ = ['UserDataInput', 'BankStatementEntry']
\ No newline at end of file
+class BatchAdviceRequest(BaseModel):
+    items: List[UserDataInput] = Field(..., min_length=1)
+    max_concurrency: Optional[int] = Field(None, ge=1, le=1024, description="Overrides BATCH_ADVICE_CONCURRENCY")
+
+__all__ = ['UserDataInput', 'BankStatementEntry', 'BankStatement', 'BatchAdviceRequest']
\ No newline at end of file
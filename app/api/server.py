@@ -0,0 +1,156 @@
+"""
+Pre-forking multi-worker server for the AI Budgeting Assistant API.
+
+The parent process loads the configuration and HF_PRELOAD_MODELS into the
+model pool, binds the listening socket and then forks the uvicorn
+workers. Model weights loaded before the fork are shared with every
+worker copy-on-write, so N workers serve on N cores with roughly the
+memory of one copy of the weights. Concurrency limits (LLM_CONCURRENCY_*,
+SERVER_WORKER_CONCURRENCY) and metrics are per worker, and torch's
+threads are divided between the workers (see get_hf_inference_settings).
+The parent restarts workers that die and passes SIGINT/SIGTERM on to them.
+
+Run from the project root:
+
+    python -m app.api.server --host 0.0.0.0 --port 8000 --workers 4
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict
+
+import uvicorn
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app.core.config import get_server_workers, get_worker_concurrency
+
+logger = logging.getLogger(__name__)
+
+# Pause before replacing a worker that exited, so a crashing worker cannot spin the CPU
+RESTART_DELAY_SECONDS = 1.0
+
+STOP_SIGNALS = {signal.SIGINT, signal.SIGTERM}
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def preload():
+    """Import the app and load the preloaded models in the parent so the workers inherit them."""
+    from app.api.main import app
+    from app.services.model_registry import warm_up_models
+
+    warm_up_models()
+    # Move everything loaded so far out of the garbage collector's reach; collections would
+    # otherwise write to those objects' pages and copy them into every worker
+    gc.collect()
+    gc.freeze()
+    return app
+
+class Supervisor:
+    """Forks the workers, replaces any that exit, and stops them all on SIGINT/SIGTERM."""
+
+    def __init__(self, app, sock: socket.socket, workers: int, limit_concurrency: int, log_level: str = "info"):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.limit_concurrency = limit_concurrency
+        self.log_level = log_level
+        self.children: Dict[int, int] = {}  # pid -> worker number
+        self.stopping = False
+
+    def spawn(self, number: int) -> None:
+        # Hold stop signals until the child has its default handlers and the parent has recorded its pid
+        signal.pthread_sigmask(signal.SIG_BLOCK, STOP_SIGNALS)
+        try:
+            pid = os.fork()
+        except BaseException:
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, STOP_SIGNALS)
+            raise
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, STOP_SIGNALS)
+            code = 0
+            try:
+                config = uvicorn.Config(
+                    self.app,
+                    limit_concurrency=self.limit_concurrency or None,
+                    log_level=self.log_level,
+                    lifespan="on",
+                )
+                uvicorn.Server(config).run(sockets=[self.sock])
+            except BaseException:
+                logger.exception(f"Worker {number} failed")
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = number
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, STOP_SIGNALS)
+        logger.info(f"Started worker {number} (pid {pid})")
+
+    def stop(self, signum, frame) -> None:
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        # Installed before forking so that a stop signal during startup still reaches every worker
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        for number in range(self.workers):
+            if self.stopping:
+                break
+            self.spawn(number)
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            number = self.children.pop(pid, None)
+            if number is None or self.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            logger.warning(f"Worker {number} (pid {pid}) exited with code {code}; restarting it")
+            time.sleep(RESTART_DELAY_SECONDS)
+            if not self.stopping:
+                self.spawn(number)
+        logger.info("All workers stopped")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: SERVER_WORKERS)")
+    parser.add_argument("--limit-concurrency", type=int, default=None,
+                        help="Connections per worker before answering 503 (default: SERVER_WORKER_CONCURRENCY)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    workers = max(1, args.workers or get_server_workers())
+    # Read by the torch thread settings, which split the CPUs between the workers
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    limit_concurrency = get_worker_concurrency() if args.limit_concurrency is None else args.limit_concurrency
+
+    sock = bind_socket(args.host, args.port)
+    app = preload()
+    logger.info(f"Serving on {args.host}:{args.port} with {workers} workers")
+    Supervisor(app, sock, workers, limit_concurrency, args.log_level).run()
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+from typing import Any, Dict, List
 
 def get_sources() -> str:
     """Retrieve financial sources from environment or default list."""
@@ -15,3 +16,122 @@ def get_sources() -> str:
     sources = os.getenv("FINANCIAL_SOURCES", ", ".join(default_sources))
     return sources
 
+def get_preload_models() -> List[str]:
+    """Hugging Face models to load eagerly at startup (comma-separated HF_PRELOAD_MODELS)."""
+    models = os.getenv("HF_PRELOAD_MODELS", "")
+    return [model.strip() for model in models.split(",") if model.strip()]
+
+def get_model_pool_size() -> int:
+    """Maximum number of Hugging Face models kept resident in the model pool."""
+    return int(os.getenv("HF_MODEL_POOL_SIZE", "2"))
+
+def get_model_pool_memory_mb() -> float:
+    """Memory cap for resident model weights in MB (0 disables the cap)."""
+    return float(os.getenv("HF_MODEL_POOL_MEMORY_MB", "0"))
+
+def get_backend_concurrency(backend: str) -> int:
+    """Maximum concurrent generations per LLM backend ("openai" or "huggingface")."""
+    # Concurrent local requests are batched into one generation, so admit a full batch at a time
+    defaults = {"openai": "128", "huggingface": str(max(2, get_hf_batch_settings()["max_batch_size"]))}
+    return int(os.getenv(f"LLM_CONCURRENCY_{backend.upper()}", defaults.get(backend, "8")))
+
+def get_http_pool_size() -> int:
+    """Size of the keep-alive connection pool used for OpenAI-compatible endpoints."""
+    return int(os.getenv("LLM_HTTP_POOL_SIZE", "100"))
+
+def get_advice_cache_settings() -> Dict[str, Any]:
+    """
+    Settings for the advice response cache (ADVICE_CACHE_* environment variables).
+
+    Cached advice is derived from users' financial data, so it is kept in
+    memory only unless ADVICE_CACHE_PATH names a SQLite file for the disk tier.
+    """
+    return {
+        "enabled": os.getenv("ADVICE_CACHE_ENABLED", "true").lower() == "true",
+        "db_path": os.getenv("ADVICE_CACHE_PATH", ""),
+        "ttl_seconds": float(os.getenv("ADVICE_CACHE_TTL_SECONDS", str(24 * 60 * 60))),
+        "max_memory_entries": int(os.getenv("ADVICE_CACHE_MEMORY_ENTRIES", "256")),
+        "max_disk_mb": float(os.getenv("ADVICE_CACHE_DISK_MB", "256")),
+    }
+
+def get_statement_memory_limit_mb() -> float:
+    """Memory ceiling for parsing an uploaded statement; larger uploads are aggregated in chunks."""
+    return float(os.getenv("STATEMENT_MEMORY_LIMIT_MB", "512"))
+
+def get_statement_cache_settings() -> Dict[str, Any]:
+    """Bounds of the cache of parsed uploads shared by reruns and sessions (STATEMENT_CACHE_*)."""
+    return {
+        "max_entries": int(os.getenv("STATEMENT_CACHE_ENTRIES", "8")),
+        "max_memory_mb": float(os.getenv("STATEMENT_CACHE_MB", "256")),
+    }
+
+def get_batch_concurrency() -> int:
+    """Default number of /batch_advice items generated concurrently."""
+    return int(os.getenv("BATCH_ADVICE_CONCURRENCY", "16"))
+
+def get_batch_max_items() -> int:
+    """Largest number of records accepted in one /batch_advice request."""
+    return int(os.getenv("BATCH_ADVICE_MAX_ITEMS", "5000"))
+
+def get_max_output_tokens(backend: str) -> int:
+    """Tokens reserved for the generated advice per LLM backend ("openai" or "huggingface")."""
+    defaults = {"openai": "1500", "huggingface": "500"}
+    return int(os.getenv(f"LLM_MAX_OUTPUT_TOKENS_{backend.upper()}", defaults.get(backend, "500")))
+
+def get_prompt_token_budget(backend: str) -> int:
+    """Input token budget for prompts per backend; 0 uses the model's context window minus the output tokens."""
+    defaults = {"openai": "2000", "huggingface": "0"}
+    return int(os.getenv(f"PROMPT_TOKEN_BUDGET_{backend.upper()}", defaults.get(backend, "0")))
+
+def get_hf_batch_settings() -> Dict[str, Any]:
+    """Micro-batching of local Hugging Face generations (HF_BATCH_* environment variables); a size of 1 disables it."""
+    return {
+        "max_batch_size": int(os.getenv("HF_BATCH_MAX_SIZE", "8")),
+        "window_ms": float(os.getenv("HF_BATCH_WINDOW_MS", "10")),
+    }
+
+def get_hf_inference_settings() -> Dict[str, Any]:
+    """
+    CPU inference settings for local models.
+
+    HF_INFERENCE_MODE is "fp32" or "int8". HF_TORCH_THREADS sets torch's
+    intra-op threads; when unset and WEB_CONCURRENCY workers share the box,
+    each worker gets an equal share of the CPUs. 0 keeps torch's defaults.
+    """
+    threads = int(os.getenv("HF_TORCH_THREADS", "0"))
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    if threads <= 0 and workers > 1:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+    return {
+        "mode": os.getenv("HF_INFERENCE_MODE", "fp32").lower(),
+        "threads": threads,
+        "interop_threads": int(os.getenv("HF_TORCH_INTEROP_THREADS", "0")),
+    }
+
+def get_prefix_cache_size() -> int:
+    """Prompt prefixes whose key/values are kept per local model (HF_PREFIX_CACHE_ENTRIES; 0 disables reuse)."""
+    return int(os.getenv("HF_PREFIX_CACHE_ENTRIES", "8"))
+
+def get_server_workers() -> int:
+    """Worker processes forked by app.api.server (SERVER_WORKERS, else WEB_CONCURRENCY, else one per CPU)."""
+    workers = os.getenv("SERVER_WORKERS") or os.getenv("WEB_CONCURRENCY")
+    return int(workers) if workers else (os.cpu_count() or 1)
+
+def get_worker_concurrency() -> int:
+    """Connections each server worker handles at once before answering 503 (0 means unlimited)."""
+    return int(os.getenv("SERVER_WORKER_CONCURRENCY", "0"))
+
+def get_projection_paths() -> int:
+    """Monte Carlo return paths simulated per savings projection scenario (PROJECTION_PATHS)."""
+    return int(os.getenv("PROJECTION_PATHS", "2000"))
+
+def get_chart_settings() -> Dict[str, Any]:
+    """Analysis page chart limits: pie slices before the rest is grouped as "Other", points per line, cached figures."""
+    max_points = os.getenv("CHART_MAX_POINTS", "121")
+    return {
+        "max_categories": int(os.getenv("CHART_MAX_CATEGORIES", "12")),
+        "max_points": int(max_points),
+        # Lines spanning more points than this before downsampling are drawn with WebGL
+        "webgl_points": int(os.getenv("CHART_WEBGL_POINTS", max_points)),
+        "cache_entries": int(os.getenv("CHART_CACHE_ENTRIES", "32")),
+    }
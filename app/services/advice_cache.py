@@ -0,0 +1,170 @@
+"""
+Content-addressed cache of generated advice for the AI Budgeting Assistant.
+
+Responses are stored as the exact list of streamed chunks under a hash of
+the canonicalized request, so a repeat submission can be replayed as the
+same stream without calling the LLM. Lookups go through an in-memory LRU
+tier first and fall back to a SQLite tier with TTL and size-based eviction.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.config import get_advice_cache_settings
+
+logger = logging.getLogger(__name__)
+
+def canonical_hash(payload: Any) -> str:
+    """Stable SHA-256 of a JSON-serializable payload, independent of key order."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class AdviceCache:
+    """
+    Two-tier cache mapping request hashes to streamed advice chunks.
+
+    Args:
+        db_path (str): SQLite file for the disk tier; empty to keep the cache in memory only.
+        ttl_seconds (float): Age after which an entry is treated as missing.
+        max_memory_entries (int): Size of the in-memory LRU tier.
+        max_disk_mb (float): Cap on stored chunk bytes in the disk tier.
+    """
+
+    def __init__(self, db_path: str = "", ttl_seconds: float = 24 * 60 * 60,
+                 max_memory_entries: int = 256, max_disk_mb: float = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+        self._db_path = db_path
+        self._connection = self._connect(db_path) if db_path else None
+        self._connection_pid = os.getpid()
+
+    @staticmethod
+    def _connect(db_path: str) -> Optional[sqlite3.Connection]:
+        try:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(db_path, check_same_thread=False)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS advice_cache ("
+                "key TEXT PRIMARY KEY, chunks TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            db.commit()
+            return db
+        except sqlite3.Error as e:
+            logger.error(f"Advice cache disk tier disabled: {str(e)}")
+            return None
+
+    @property
+    def _db(self) -> Optional[sqlite3.Connection]:
+        # SQLite connections must not cross fork(); a forked server worker opens its own
+        if self._connection is not None and self._connection_pid != os.getpid():
+            self._connection = self._connect(self._db_path)
+            self._connection_pid = os.getpid()
+        return self._connection
+
+    def get(self, key: str) -> Optional[List[str]]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry["created_at"] <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return list(entry["chunks"])
+                del self._memory[key]
+
+            row = None
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT chunks, created_at FROM advice_cache WHERE key = ? AND created_at >= ?",
+                    (key, now - self.ttl_seconds),
+                ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+
+            self._db.execute("UPDATE advice_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            chunks = json.loads(row[0])
+            self._remember(key, chunks, row[1])
+            self._stats["disk_hits"] += 1
+            return list(chunks)
+
+    def put(self, key: str, chunks: List[str]) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, list(chunks), now)
+            self._stats["writes"] += 1
+            if self._db is None:
+                return
+            serialized = json.dumps(chunks)
+            self._db.execute(
+                "INSERT OR REPLACE INTO advice_cache (key, chunks, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, serialized, len(serialized), now, now),
+            )
+            self._evict_disk(now)
+            self._db.commit()
+
+    def replay(self, chunks: List[str]) -> Iterator[str]:
+        """Yield a cached response with the chunking it was generated with."""
+        yield from chunks
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM advice_cache")
+                self._db.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            if self._db is not None:
+                count, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM advice_cache").fetchone()
+                stats["disk_entries"] = count
+                stats["disk_mb"] = round(size / (1024 * 1024), 3)
+            return stats
+
+    def _remember(self, key: str, chunks: List[str], created_at: float) -> None:
+        self._memory[key] = {"chunks": chunks, "created_at": created_at}
+        self._memory.move_to_end(key)
+        while len(self._memory) > max(self.max_memory_entries, 0):
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now: float) -> None:
+        self._db.execute("DELETE FROM advice_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM advice_cache").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        # Drop least recently read entries until the tier fits its byte budget again
+        for key, size in self._db.execute("SELECT key, size FROM advice_cache ORDER BY accessed_at, rowid").fetchall():
+            if total <= self.max_disk_bytes:
+                break
+            self._db.execute("DELETE FROM advice_cache WHERE key = ?", (key,))
+            total -= size
+
+def build_advice_cache() -> AdviceCache:
+    """Create the cache described by the ADVICE_CACHE_* settings."""
+    settings = get_advice_cache_settings()
+    if not settings["enabled"]:
+        return AdviceCache(max_memory_entries=0)
+    return AdviceCache(
+        db_path=settings["db_path"],
+        ttl_seconds=settings["ttl_seconds"],
+        max_memory_entries=settings["max_memory_entries"],
+        max_disk_mb=settings["max_disk_mb"],
+    )
@@ -0,0 +1,82 @@
+"""
+Registry of the LLM backends the app can call.
+
+Maps selectable model names to their backend and imports each backend's
+heavy runtime (torch and transformers for local Hugging Face models) only
+the first time that backend is used, so processes that only ever call
+GPT-4 start quickly and never load those libraries.
+"""
+
+import importlib
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import get_hf_inference_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "GPT-4"
+
+# Selectable model name -> backend serving it
+MODEL_BACKENDS = {
+    "GPT-4": "openai",
+    "gpt2": "huggingface",
+    "distilgpt2": "huggingface",
+}
+
+# Modules a backend needs at generation time, imported on first use
+BACKEND_RUNTIMES = {
+    "openai": [],
+    "huggingface": ["torch", "transformers"],
+}
+
+_runtimes: Dict[str, List[Any]] = {}
+_import_seconds: Dict[str, float] = {}
+_lock = threading.Lock()
+
+def backend_for_model(model_name: str) -> Optional[str]:
+    """The backend serving model_name, or None if the model is not supported."""
+    return MODEL_BACKENDS.get(model_name)
+
+def supported_models() -> List[str]:
+    """Selectable model names, DEFAULT_MODEL first."""
+    return [DEFAULT_MODEL] + [model for model in MODEL_BACKENDS if model != DEFAULT_MODEL]
+
+def load_runtime(backend: str) -> List[Any]:
+    """Import (once per process) and return the modules listed for backend in BACKEND_RUNTIMES."""
+    runtime = _runtimes.get(backend)
+    if runtime is not None:
+        return runtime
+    with _lock:
+        if backend not in _runtimes:
+            start = time.perf_counter()
+            modules = [importlib.import_module(name) for name in BACKEND_RUNTIMES[backend]]
+            if backend == "huggingface":
+                _configure_torch(modules[0])
+            _runtimes[backend] = modules
+            _import_seconds[backend] = time.perf_counter() - start
+            if BACKEND_RUNTIMES[backend]:
+                logger.info(f"Imported the {backend} backend runtime in {_import_seconds[backend]:.2f}s")
+        return _runtimes[backend]
+
+def _configure_torch(torch) -> None:
+    # Must run before torch does any parallel work: inter-op threads can only be set once
+    settings = get_hf_inference_settings()
+    if settings["threads"] > 0:
+        torch.set_num_threads(settings["threads"])
+    if settings["interop_threads"] > 0:
+        try:
+            torch.set_num_interop_threads(settings["interop_threads"])
+        except RuntimeError as e:
+            logger.warning(f"Could not set torch inter-op threads: {str(e)}")
+    logger.info(f"torch using {torch.get_num_threads()} intra-op threads")
+
+def transformers_module():
+    """The transformers module, imported on first use by the Hugging Face backend."""
+    _, transformers = load_runtime("huggingface")
+    return transformers
+
+def get_backend_stats() -> Dict[str, Any]:
+    return {"loaded_backends": list(_runtimes), "import_seconds": dict(_import_seconds)}
@@ -0,0 +1,129 @@
+"""
+Batch advice generation for the AI Budgeting Assistant.
+
+Fans many UserDataInput records out over the LLM backends with a bounded
+number of generations in flight. Identical inputs (same advice cache key)
+are generated once, and results are yielded as each one completes rather
+than in request order.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List
+
+from app.api.models import UserDataInput
+from app.core.config import get_batch_concurrency, get_sources
+from .recommender import ERROR_PREFIXES, advice_cache_key, generate_advice_stream_async
+
+logger = logging.getLogger(__name__)
+
+class BatchItemCounter:
+    """
+    Counts the records in a /batch_advice body's top-level "items" array as its bytes arrive.
+
+    Only brackets, quotes and commas are tracked, so an oversized batch can
+    be rejected long before the whole body has been received and validated.
+    """
+
+    def __init__(self):
+        self.items = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string = bytearray()
+        self._last_string = None
+        self._key = None
+        self._in_items = False
+        self._expect_item = False
+
+    def feed(self, data: bytes) -> int:
+        """Scan the next bytes of the body; returns the records counted so far."""
+        for byte in data:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif byte == 0x5C:  # backslash
+                    self._escape = True
+                elif byte == 0x22:  # closing quote
+                    self._in_string = False
+                    self._last_string = bytes(self._string)
+                    continue
+                if self._depth == 1:
+                    self._string.append(byte)
+                continue
+            if byte in b" \t\r\n":
+                continue
+            if self._in_items and self._depth == 2 and self._expect_item and byte != 0x5D:
+                self.items += 1
+                self._expect_item = False
+            if byte == 0x22:
+                self._in_string = True
+                self._string.clear()
+            elif byte == 0x3A and self._depth == 1:  # colon after a key of the top-level object
+                self._key = self._last_string
+            elif byte in b"{[":
+                self._depth += 1
+                if byte == 0x5B and self._depth == 2 and self._key == b"items":
+                    self._in_items = self._expect_item = True
+            elif byte in b"}]":
+                self._depth -= 1
+                if self._depth == 1:
+                    self._in_items = False
+            elif byte == 0x2C and self._in_items and self._depth == 2:
+                self._expect_item = True
+        return self.items
+
+async def _generate(user_data: UserDataInput) -> Dict[str, Any]:
+    start = time.perf_counter()
+    chunks = [chunk async for chunk in generate_advice_stream_async(user_data, user_data.follow_up_question)]
+    advice = "".join(chunks)
+    result = {"elapsed_seconds": round(time.perf_counter() - start, 4)}
+    if not chunks or chunks[-1].startswith(ERROR_PREFIXES):
+        result.update(status="error", error=chunks[-1] if chunks else "Empty response")
+    else:
+        result.update(status="ok", advice=advice)
+    return result
+
+async def run_batch_advice(items: List[UserDataInput], max_concurrency: int = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Generate advice for every item, yielding one result per item as it completes.
+
+    Each result has the item's position in the request (`index`), `status`
+    ("ok" or "error"), `advice` or `error`, `elapsed_seconds` spent generating
+    it and `deduplicated` (True when the advice was shared with an identical
+    earlier item). Closing the iterator cancels generations still pending.
+    """
+    sources = get_sources()
+    groups: Dict[str, List[int]] = {}
+    for index, user_data in enumerate(items):
+        groups.setdefault(advice_cache_key(user_data, sources, user_data.follow_up_question), []).append(index)
+    logger.info(f"Batch of {len(items)} items, {len(groups)} distinct")
+
+    semaphore = asyncio.Semaphore(max_concurrency or get_batch_concurrency())
+    completed = asyncio.Queue()
+
+    async def worker(indexes: List[int]):
+        async with semaphore:
+            try:
+                result = await _generate(items[indexes[0]])
+            except Exception as e:
+                logger.exception(f"Batch item {indexes[0]} failed")
+                result = {"status": "error", "error": f"Error generating advice: {str(e)}", "elapsed_seconds": 0.0}
+        await completed.put((indexes, result))
+
+    tasks = [asyncio.create_task(worker(indexes)) for indexes in groups.values()]
+    try:
+        for _ in range(len(tasks)):
+            indexes, result = await completed.get()
+            for position, index in enumerate(indexes):
+                yield {"index": index, **result, "deduplicated": position > 0}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def stream_batch_advice(items: List[UserDataInput], max_concurrency: int = None) -> AsyncIterator[str]:
+    """run_batch_advice results encoded as NDJSON lines."""
+    async for result in run_batch_advice(items, max_concurrency):
+        yield json.dumps(result) + "\n"
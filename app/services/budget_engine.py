@@ -0,0 +1,127 @@
+"""
+Numeric budget engine for the AI Budgeting Assistant.
+
+Turns the LLM's proposed budget into a numeric frame of previous spend,
+proposed amounts, deltas and percentage changes, capping the proposal at
+the client's income and allocating the remainder to savings. All amounts
+stay floats and every step is an array operation, so the same code
+evaluates one budget or many scenarios at once (one row of changes per
+scenario). Currency and percent strings are produced only by
+format_budget, for display and export.
+"""
+
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+DISPLAY_COLUMNS = ['Category', 'Previous Spend', 'Proposed Change', 'Percent Change', 'Change Reason']
+
+# Entries the LLM sometimes includes in the budget that are not spending
+NON_SPENDING_CATEGORIES = {'Income'}
+
+SAVINGS_REASON = 'Allocated remaining amount to savings'
+
+def parse_proposal(budget_data: Dict[str, Any]) -> Tuple[pd.DataFrame, List[str], List[str]]:
+    """
+    Proposed changes from the budget JSON as a frame of Category, Change and Change Reason.
+
+    Returns:
+        tuple: (proposal frame, categories whose change was not a number and
+        were given 0, categories skipped because their entry was unusable)
+    """
+    categories, changes, reasons, invalid, skipped = [], [], [], [], []
+    for category, details in budget_data.items():
+        if category in NON_SPENDING_CATEGORIES:
+            continue
+        if isinstance(details, dict):
+            try:
+                change = float(details.get('proposed_change', 0))
+            except (TypeError, ValueError):
+                invalid.append(category)
+                change = 0.0
+            reason = details.get('change_reason', '')
+        elif isinstance(details, (int, float)) and not isinstance(details, bool):
+            change, reason = float(details), ''
+        else:
+            skipped.append(category)
+            continue
+        categories.append(category)
+        changes.append(change)
+        reasons.append(reason)
+    proposal = pd.DataFrame({
+        'Category': pd.Series(categories, dtype=object),
+        'Change': np.asarray(changes, dtype=float),
+        'Change Reason': pd.Series(reasons, dtype=object),
+    })
+    return proposal, invalid, skipped
+
+def percent_change(previous: np.ndarray, proposed: np.ndarray) -> np.ndarray:
+    """Change from previous to proposed in percent; new spending (previous 0) is +inf, none at all is 0."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent = (proposed - previous) / previous * 100
+    return np.where(previous != 0, percent, np.where(proposed > 0, np.inf, 0.0))
+
+def allocate(previous: np.ndarray, changes: np.ndarray,
+             income: Union[float, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Proposed amounts and the savings remainder for one budget or a batch of scenarios.
+
+    changes holds one row per scenario (or is 1-D for a single budget) and
+    income is a scalar or one value per scenario. When a scenario's
+    proposed amounts add up to more than its income they are scaled down
+    proportionally to fit.
+
+    Returns:
+        tuple: (proposed amounts shaped like changes, savings per scenario)
+    """
+    proposed = previous + changes
+    total = proposed.sum(axis=-1)
+    income = np.asarray(income, dtype=float)
+    over = total > income
+    scale = np.divide(income, total, out=np.ones_like(total, dtype=float), where=over)
+    proposed = proposed * np.expand_dims(scale, -1)
+    return proposed, income - proposed.sum(axis=-1)
+
+def compute_budget(proposal: pd.DataFrame, previous_spend: pd.Series, income: float) -> pd.DataFrame:
+    """
+    Numeric budget frame for a parsed proposal, sorted by the size of the percentage change.
+
+    Columns: Category, Previous Spend, Proposed Change (the proposed amount),
+    Amount Change, Percent Change and Change Reason. A Savings row holding
+    the unallocated income is added unless the proposal budgets savings itself.
+    """
+    # Category totals from a BankStatement carry a categorical index; look categories up by plain label
+    previous_spend = pd.Series(previous_spend.to_numpy(dtype=float), index=previous_spend.index.astype(object))
+    previous = previous_spend.reindex(proposal['Category']).fillna(0).to_numpy(dtype=float)
+    proposed, savings = allocate(previous, proposal['Change'].to_numpy(dtype=float), income)
+
+    categories = proposal['Category'].tolist()
+    reasons = proposal['Change Reason'].tolist()
+    if 'Savings' not in categories:
+        categories.append('Savings')
+        reasons.append(SAVINGS_REASON)
+        previous = np.append(previous, float(previous_spend.get('Savings', 0)))
+        proposed = np.append(proposed, savings)
+
+    budget = pd.DataFrame({
+        'Category': pd.Series(categories, dtype=object),
+        'Previous Spend': previous,
+        'Proposed Change': proposed,
+        'Amount Change': proposed - previous,
+        'Percent Change': percent_change(previous, proposed),
+        'Change Reason': pd.Series(reasons, dtype=object),
+    })
+    order = np.argsort(-np.abs(budget['Percent Change'].to_numpy()), kind='stable')
+    return budget.iloc[order].reset_index(drop=True)
+
+def budget_total(budget: pd.DataFrame) -> float:
+    return float(budget['Proposed Change'].sum())
+
+def format_budget(budget: pd.DataFrame) -> pd.DataFrame:
+    """The budget's display columns with amounts as "$1,234.00" and changes as "12.34%"."""
+    formatted = budget[DISPLAY_COLUMNS].copy()
+    for column in ['Previous Spend', 'Proposed Change']:
+        formatted[column] = budget[column].fillna(0).map('${:,.2f}'.format)
+    formatted['Percent Change'] = budget['Percent Change'].map(lambda x: f"{x:,.2f}%" if pd.notnull(x) else "N/A")
+    return formatted
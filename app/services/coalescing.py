@@ -0,0 +1,206 @@
+"""
+Single-flight coalescing of identical advice generations.
+
+The first request for a key starts one upstream stream; identical
+requests arriving while it runs subscribe to the same flight, first
+receiving the chunks buffered so far and then each new chunk as it
+arrives. The upstream stream is only abandoned once every subscriber has
+gone away. SingleFlight serves the threaded (Streamlit) path and
+AsyncSingleFlight the asyncio (FastAPI) path.
+"""
+
+import asyncio
+import inspect
+import logging
+import threading
+import weakref
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from .metrics import ADVICE_COALESCED_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+class _Flight:
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.abandoned = False
+
+class SingleFlight:
+    """Coalesces identical blocking chunk streams; the upstream runs on its own thread."""
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def stream(self, key: str, start_stream: Callable[[], Iterator[str]],
+               on_complete: Callable[[List[str]], None] = None) -> Iterator[str]:
+        """
+        Stream the chunks of the flight for key, starting it with start_stream() if none is running.
+
+        The flight is joined when the returned iterator is first advanced and
+        left when it is exhausted or closed, so a stream dropped unread neither
+        starts a generation nor keeps one alive.
+
+        on_complete(chunks) is called once with the full response when the
+        upstream stream finishes (not when it fails or is abandoned).
+        """
+        return self._subscribe(key, start_stream, on_complete)
+
+    def _join(self, key, start_stream, on_complete) -> _Flight:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                with flight.condition:
+                    # A flight whose last subscriber just left is stopping; start a fresh one instead
+                    if not flight.abandoned:
+                        flight.subscribers += 1
+                        ADVICE_COALESCED_REQUESTS.inc()
+                        logger.info("Joining an identical in-flight advice generation")
+                        return flight
+            flight = _Flight()
+            flight.condition = threading.Condition()
+            flight.subscribers = 1
+            self._flights[key] = flight
+            threading.Thread(
+                target=self._produce, args=(key, flight, start_stream, on_complete), daemon=True
+            ).start()
+            return flight
+
+    def _produce(self, key, flight, start_stream, on_complete):
+        stream = None
+        try:
+            stream = start_stream()
+            for chunk in stream:
+                with flight.condition:
+                    if flight.abandoned:
+                        break
+                    flight.chunks.append(chunk)
+                    flight.condition.notify_all()
+            else:
+                if on_complete is not None:
+                    on_complete(flight.chunks)
+        except Exception as e:
+            flight.error = e
+        finally:
+            if stream is not None and hasattr(stream, "close"):
+                stream.close()
+            self._forget(key, flight)
+            with flight.condition:
+                flight.done = True
+                flight.condition.notify_all()
+
+    def _subscribe(self, key, start_stream, on_complete) -> Iterator[str]:
+        flight = self._join(key, start_stream, on_complete)
+        index = 0
+        try:
+            while True:
+                with flight.condition:
+                    while index >= len(flight.chunks) and not flight.done:
+                        flight.condition.wait()
+                    new_chunks = flight.chunks[index:]
+                    done = flight.done
+                yield from new_chunks
+                index += len(new_chunks)
+                if done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+        finally:
+            with flight.condition:
+                flight.subscribers -= 1
+                abandoned = flight.subscribers == 0 and not flight.done
+                if abandoned:
+                    # Nobody is listening any more: stop at the next chunk and let new requests start afresh
+                    flight.abandoned = True
+            if abandoned:
+                self._forget(key, flight)
+
+    def _forget(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+class AsyncSingleFlight:
+    """Coalesces identical async chunk streams; the upstream runs as its own task on the event loop."""
+
+    def __init__(self):
+        self._loop_flights: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, _Flight]]" = \
+            weakref.WeakKeyDictionary()
+
+    def _flights(self) -> Dict[str, _Flight]:
+        return self._loop_flights.setdefault(asyncio.get_running_loop(), {})
+
+    def in_flight(self) -> int:
+        return len(self._flights())
+
+    def stream(self, key: str, start_stream: Callable[[], AsyncIterator[str]],
+               on_complete: Callable[[List[str]], Any] = None) -> AsyncIterator[str]:
+        """Async counterpart of SingleFlight.stream; on_complete may return an awaitable, which is awaited."""
+        return self._subscribe(key, start_stream, on_complete)
+
+    def _join(self, key, start_stream, on_complete):
+        flights = self._flights()
+        flight = flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            flight.changed = asyncio.Event()
+            flights[key] = flight
+            flight.task = asyncio.create_task(self._produce(flights, key, flight, start_stream, on_complete))
+        else:
+            ADVICE_COALESCED_REQUESTS.inc()
+            logger.info("Joining an identical in-flight advice generation")
+        flight.subscribers += 1
+        return flights, flight
+
+    @staticmethod
+    def _notify(flight):
+        changed, flight.changed = flight.changed, asyncio.Event()
+        changed.set()
+
+    async def _produce(self, flights, key, flight, start_stream, on_complete):
+        stream = None
+        try:
+            stream = start_stream()
+            async for chunk in stream:
+                flight.chunks.append(chunk)
+                self._notify(flight)
+            if on_complete is not None:
+                result = on_complete(flight.chunks)
+                if inspect.isawaitable(result):
+                    await result
+        except Exception as e:
+            flight.error = e
+        finally:
+            if stream is not None and hasattr(stream, "aclose"):
+                await stream.aclose()
+            if flights.get(key) is flight:
+                del flights[key]
+            flight.done = True
+            self._notify(flight)
+
+    async def _subscribe(self, key, start_stream, on_complete) -> AsyncIterator[str]:
+        flights, flight = self._join(key, start_stream, on_complete)
+        index = 0
+        try:
+            while True:
+                while index < len(flight.chunks):
+                    yield flight.chunks[index]
+                    index += 1
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await flight.changed.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                if flights.get(key) is flight:
+                    del flights[key]
+                flight.task.cancel()
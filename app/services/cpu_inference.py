@@ -0,0 +1,57 @@
+"""
+CPU inference modes for local Hugging Face models.
+
+HF_INFERENCE_MODE selects how a model is prepared after loading:
+
+- "fp32": the weights as published (the default).
+- "int8": dynamic int8 quantization of the linear layers. Weights are
+  stored as int8 and activations quantized on the fly, which roughly
+  quarters the size of those layers and speeds up CPU matrix multiplies.
+  GPT-2 implements its projections as transformers' Conv1D, which the
+  quantizer does not recognise, so they are first converted to the
+  equivalent nn.Linear.
+
+Generation itself always runs under torch.inference_mode; thread counts
+are applied when the runtime is imported (see backends.load_runtime).
+"""
+
+import logging
+from typing import Any, Optional
+
+from app.core.config import get_hf_inference_settings
+from .backends import load_runtime, transformers_module
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_MODES = ("fp32", "int8")
+
+def conv1d_to_linear(model: Any) -> Any:
+    """Replace every transformers Conv1D in model with an equivalent nn.Linear, in place."""
+    torch, _ = load_runtime("huggingface")
+    conv1d = transformers_module().pytorch_utils.Conv1D
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if isinstance(child, conv1d):
+                # Conv1D stores its weight as (in_features, out_features)
+                linear = torch.nn.Linear(child.weight.shape[0], child.nf)
+                linear.weight = torch.nn.Parameter(child.weight.detach().t().contiguous())
+                linear.bias = child.bias
+                setattr(parent, name, linear)
+    return model
+
+def quantize_int8(model: Any) -> Any:
+    """Dynamically quantize model's linear layers to int8, in place."""
+    torch, _ = load_runtime("huggingface")
+    conv1d_to_linear(model)
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+def prepare_model(model: Any, mode: Optional[str] = None) -> Any:
+    """Put a freshly loaded model into the configured (or given) inference mode."""
+    mode = mode or get_hf_inference_settings()["mode"]
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"Unknown HF_INFERENCE_MODE {mode!r}; expected one of {', '.join(INFERENCE_MODES)}")
+    model.eval()
+    if mode == "int8":
+        model = quantize_int8(model)
+        logger.info("Quantized model linear layers to int8")
+    return model
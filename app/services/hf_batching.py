@@ -0,0 +1,232 @@
+"""
+Dynamic micro-batching for local Hugging Face generation.
+
+Streaming requests for the same model that arrive within a short window
+(HF_BATCH_WINDOW_MS, up to HF_BATCH_MAX_SIZE of them) are left-padded into
+one batch and generated by a single `model.generate` call. A streamer
+splits each step's tokens back out into every request's own text stream,
+and rows finish independently when they emit end-of-text, reach their
+token limit or their consumer goes away. On CPU one batched generation
+of N sequences costs far less than N single-sequence generations.
+"""
+
+import logging
+import queue
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import get_hf_batch_settings
+from .backends import load_runtime
+from .metrics import HF_BATCH_SIZE
+from .prefix_cache import PrefixEntry
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+class GenerationRequest:
+    """A prompt waiting for, or taking part in, a batched generation, with its own output stream."""
+
+    def __init__(self, model_name: str, tokenizer, model, input_ids: List[int], max_new_tokens: int,
+                 prefix: Optional[PrefixEntry] = None):
+        self.model_name = model_name
+        self.tokenizer = tokenizer
+        self.model = model
+        # Without a prefix these are the whole prompt; with one, only the part after it
+        self.input_ids = input_ids
+        self.prefix = prefix
+        self.max_new_tokens = max_new_tokens
+        self.generated: List[int] = []
+        self.finished = False
+        self.cancelled = threading.Event()
+        self._chunks = queue.Queue()
+        self._emitted = 0
+
+    def stream(self, timeout: float) -> Iterator[str]:
+        """Yield this request's text as the batch produces it; closing the iterator drops the request from its batch."""
+        try:
+            while True:
+                try:
+                    item = self._chunks.get(timeout=timeout)
+                except queue.Empty:
+                    raise RuntimeError(f"no tokens received for {timeout}s")
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.cancel()
+
+    def cancel(self) -> None:
+        """Drop the request: it is skipped if still queued, and its row stops at the next step if generating."""
+        self.cancelled.set()
+
+    def push(self, token_id: int) -> None:
+        self.generated.append(token_id)
+        self._emit(final=False)
+        if len(self.generated) >= self.max_new_tokens:
+            self.finish()
+
+    def finish(self) -> None:
+        if not self.finished:
+            self.finished = True
+            self._emit(final=True)
+            self._chunks.put(_DONE)
+
+    def fail(self, error: Exception) -> None:
+        if not self.finished:
+            self.finished = True
+            self._chunks.put(error)
+
+    def _emit(self, final: bool) -> None:
+        # Decode the whole sequence so multi-token words and byte-level characters come out right
+        text = self.tokenizer.decode(self.generated, skip_special_tokens=True)
+        if not final and text.endswith("�"):
+            return  # Wait for the rest of a multi-byte character
+        if len(text) > self._emitted:
+            self._chunks.put(text[self._emitted:])
+            self._emitted = len(text)
+
+class _BatchStreamer:
+    """Receives each generation step's tokens for the whole batch and routes them to their requests."""
+
+    def __init__(self, requests: List[GenerationRequest], eos_token_id: int):
+        self.requests = requests
+        self.eos_token_id = eos_token_id
+        self.prompt_seen = False
+
+    def put(self, value) -> None:
+        if not self.prompt_seen:
+            self.prompt_seen = True  # generate first echoes the padded prompts
+            return
+        for request, token_id in zip(self.requests, value.view(-1).tolist()):
+            if request.finished:
+                continue
+            if token_id == self.eos_token_id or request.cancelled.is_set():
+                request.finish()
+            else:
+                request.push(token_id)
+
+    def end(self) -> None:
+        for request in self.requests:
+            request.finish()
+
+@lru_cache(maxsize=None)
+def _rows_done_class():
+    # Defined on first use so importing this module does not import transformers
+    torch, transformers = load_runtime("huggingface")
+
+    class _RowsDone(transformers.StoppingCriteria):
+        """Per-row stop flags: a row stops once its request has finished or been abandoned."""
+
+        def __init__(self, requests: List[GenerationRequest]):
+            self.requests = requests
+
+        def __call__(self, input_ids, scores, **kwargs):
+            done = [request.finished or request.cancelled.is_set() for request in self.requests]
+            return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+    return _RowsDone
+
+class MicroBatcher:
+    """
+    Collects generation requests per model and runs them in batches.
+
+    Each model with pending requests has one worker thread, which exits as
+    soon as it finds no more work, so an idle process holds no threads.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, queue.Queue] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, model_name: str, tokenizer, model, inputs, max_new_tokens: int,
+               prefix: Optional[PrefixEntry] = None) -> GenerationRequest:
+        input_ids = inputs["input_ids"][0].tolist()
+        if prefix is not None:
+            input_ids = input_ids[prefix.length:]
+        request = GenerationRequest(model_name, tokenizer, model, input_ids, max_new_tokens, prefix)
+        with self._lock:
+            pending = self._pending.get(model_name)
+            if pending is None:
+                pending = self._pending[model_name] = queue.Queue()
+                threading.Thread(
+                    target=self._run, args=(model_name, pending), daemon=True, name=f"hf-batcher-{model_name}"
+                ).start()
+            pending.put(request)
+        return request
+
+    def _run(self, model_name: str, pending: queue.Queue) -> None:
+        while True:
+            for batch in self._group(self._collect(pending)):
+                self._generate(batch)
+            with self._lock:
+                if pending.empty():
+                    del self._pending[model_name]
+                    return
+
+    def _collect(self, pending: queue.Queue) -> List[GenerationRequest]:
+        settings = get_hf_batch_settings()
+        batch = [pending.get()]
+        deadline = time.monotonic() + settings["window_ms"] / 1000
+        while len(batch) < settings["max_batch_size"]:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return [request for request in batch if not request.cancelled.is_set()]
+
+    @staticmethod
+    def _group(requests: List[GenerationRequest]) -> List[List[GenerationRequest]]:
+        # A model evicted and reloaded between requests is a different object; never mix the two in a batch.
+        # Only prompts sharing a cached prefix can share its key/values.
+        groups: Dict[Tuple[int, int, int], List[GenerationRequest]] = {}
+        for request in requests:
+            key = (id(request.model), request.max_new_tokens, id(request.prefix))
+            groups.setdefault(key, []).append(request)
+        return list(groups.values())
+
+    def _generate(self, requests: List[GenerationRequest]) -> None:
+        torch, transformers = load_runtime("huggingface")
+        tokenizer, model = requests[0].tokenizer, requests[0].model
+        pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+        prefix = requests[0].prefix
+        prefix_ids = prefix.input_ids[0].tolist() if prefix is not None else []
+        width = max(len(request.input_ids) for request in requests)
+        # Decoder-only models continue from the last position, so pad on the left (after any shared prefix)
+        input_ids = torch.tensor([
+            prefix_ids + [pad_token_id] * (width - len(request.input_ids)) + request.input_ids
+            for request in requests
+        ])
+        attention_mask = torch.tensor([
+            [1] * len(prefix_ids) + [0] * (width - len(request.input_ids)) + [1] * len(request.input_ids)
+            for request in requests
+        ])
+        HF_BATCH_SIZE.observe(len(requests), model=requests[0].model_name)
+        logger.debug(f"Generating a batch of {len(requests)} for {requests[0].model_name}")
+        try:
+            with torch.inference_mode():
+                model.generate(
+                    input_ids=input_ids,
+                    attention_mask=attention_mask,
+                    past_key_values=prefix.expand(len(requests)) if prefix is not None else None,
+                    streamer=_BatchStreamer(requests, tokenizer.eos_token_id),
+                    max_new_tokens=requests[0].max_new_tokens,
+                    do_sample=True,
+                    top_k=50,
+                    top_p=0.95,
+                    pad_token_id=pad_token_id,
+                    stopping_criteria=transformers.StoppingCriteriaList([_rows_done_class()(requests)]),
+                )
+        except Exception as e:
+            logger.exception(f"Batched generation failed for {requests[0].model_name}")
+            for request in requests:
+                request.fail(e)
+
+micro_batcher = MicroBatcher()
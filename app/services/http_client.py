@@ -0,0 +1,61 @@
+"""
+Shared async resources for the LLM backends.
+
+Holds one pooled keep-alive `httpx.AsyncClient` and one concurrency
+semaphore per backend for each running event loop, so concurrent advice
+streams reuse connections and a slow backend cannot be flooded.
+"""
+
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+
+import httpx
+
+from app.core.config import get_backend_concurrency, get_http_pool_size
+from app.services.metrics import BACKEND_WAIT_SECONDS
+
+# Event loop -> {"client": AsyncClient, "semaphores": {backend: Semaphore}}
+_loop_state: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Any]]" = weakref.WeakKeyDictionary()
+
+def create_client() -> httpx.AsyncClient:
+    pool_size = get_http_pool_size()
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+    )
+
+def _get_state() -> Dict[str, Any]:
+    loop = asyncio.get_running_loop()
+    state = _loop_state.get(loop)
+    if state is None:
+        state = {"client": None, "semaphores": {}}
+        _loop_state[loop] = state
+    return state
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the pooled client for the running event loop, creating it on first use."""
+    state = _get_state()
+    if state["client"] is None or state["client"].is_closed:
+        state["client"] = create_client()
+    return state["client"]
+
+async def close_http_client() -> None:
+    state = _get_state()
+    client = state.pop("client", None)
+    state["client"] = None
+    if client is not None:
+        await client.aclose()
+
+@asynccontextmanager
+async def backend_slot(backend: str):
+    """Hold one of the backend's concurrency slots for the duration of a generation."""
+    semaphores = _get_state()["semaphores"]
+    if backend not in semaphores:
+        semaphores[backend] = asyncio.Semaphore(get_backend_concurrency(backend))
+    start = time.perf_counter()
+    async with semaphores[backend]:
+        BACKEND_WAIT_SECONDS.observe(time.perf_counter() - start, backend=backend)
+        yield
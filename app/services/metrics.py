@@ -0,0 +1,256 @@
+"""
+In-process latency metrics for the advice pipeline.
+
+Counters and histograms are kept per label set in memory and rendered in
+the Prometheus text exposition format for the API's `/metrics` endpoint;
+`summarize` condenses them into a log line for the Streamlit app.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def snapshot(self) -> Dict[Tuple[str, ...], float]:
+        """A copy of the value per label set, safe to iterate while other threads increment."""
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.snapshot().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def series(self) -> Dict[Tuple[str, ...], Tuple[List[int], float, int]]:
+        """A copy of (bucket counts, sum, count) per label set, safe to iterate while other threads observe."""
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Dict[str, float]]:
+        """Count, sum and bucket-estimated p50/p95 per label set."""
+        return {
+            key: {
+                "count": count,
+                "sum": total,
+                "p50": self._quantile(counts, count, 0.5),
+                "p95": self._quantile(counts, count, 0.95),
+            }
+            for key, (counts, total, count) in self.series().items()
+        }
+
+    def _quantile(self, counts: List[int], count: int, quantile: float) -> float:
+        # Upper bound of the bucket holding the quantile; observations past the last bucket report it
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (self.buckets[-1],), counts):
+            cumulative += bucket_count
+            if cumulative >= quantile * count:
+                return bound
+        return self.buckets[-1]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self.series().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+PROMPT_BUILD_SECONDS = Histogram(
+    "advice_prompt_build_seconds", "Time spent building the LLM prompt from the user's data."
+)
+PROMPT_TOKENS = Histogram(
+    "advice_prompt_tokens", "Input tokens of the prompt sent to each backend.", ("backend",), TOKEN_BUCKETS
+)
+BACKEND_REQUESTS = Counter(
+    "advice_backend_requests_total", "Advice generations by selected backend and outcome.", ("backend", "outcome")
+)
+BACKEND_WAIT_SECONDS = Histogram(
+    "advice_backend_wait_seconds", "Time spent waiting for a free concurrency slot on a backend.", ("backend",)
+)
+TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "advice_time_to_first_token_seconds", "Time from calling the backend to its first streamed chunk.", ("backend",)
+)
+INTER_TOKEN_SECONDS = Histogram(
+    "advice_inter_token_seconds", "Time between consecutive streamed chunks.", ("backend",)
+)
+GENERATION_SECONDS = Histogram(
+    "advice_generation_seconds", "Total time to stream a backend response.", ("backend",)
+)
+RESPONSE_TOKENS = Histogram(
+    "advice_response_tokens", "Streamed chunks (roughly tokens) per backend response.", ("backend",), TOKEN_BUCKETS
+)
+TOKENS = Counter("advice_tokens_total", "Streamed chunks (roughly tokens) produced by each backend.", ("backend",))
+MODEL_LOAD_SECONDS = Histogram(
+    "hf_model_load_seconds", "Time to load a Hugging Face model into the model pool.", ("model",)
+)
+HF_BATCH_SIZE = Histogram(
+    "hf_generation_batch_size", "Requests generated together in one batched local generation.", ("model",),
+    BATCH_SIZE_BUCKETS
+)
+PREFIX_CACHE_REQUESTS = Counter(
+    "hf_prefix_cache_requests_total", "Prompt prefix key/value cache lookups by result.", ("result",)
+)
+ADVICE_CACHE_REQUESTS = Counter("advice_cache_requests_total", "Advice cache lookups by result.", ("result",))
+ADVICE_COALESCED_REQUESTS = Counter(
+    "advice_coalesced_requests_total", "Advice requests served by joining an identical in-flight generation."
+)
+STATEMENT_CACHE_REQUESTS = Counter(
+    "statement_cache_requests_total", "Parsed bank statement upload cache lookups by result.", ("result",)
+)
+
+ALL_METRICS = [
+    PROMPT_BUILD_SECONDS, PROMPT_TOKENS, BACKEND_REQUESTS, BACKEND_WAIT_SECONDS, TIME_TO_FIRST_TOKEN_SECONDS,
+    INTER_TOKEN_SECONDS, GENERATION_SECONDS, RESPONSE_TOKENS, TOKENS, MODEL_LOAD_SECONDS, HF_BATCH_SIZE,
+    PREFIX_CACHE_REQUESTS, ADVICE_CACHE_REQUESTS, ADVICE_COALESCED_REQUESTS, STATEMENT_CACHE_REQUESTS,
+]
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(line for metric in ALL_METRICS for line in metric.render()) + "\n"
+
+def summarize() -> str:
+    """One-line digest of the latency histograms and counters, for application logs."""
+    parts = []
+    for metric in ALL_METRICS:
+        if isinstance(metric, Histogram):
+            for key, stats in sorted(metric.snapshot().items()):
+                label = f"[{','.join(key)}]" if key else ""
+                mean = stats["sum"] / stats["count"]
+                parts.append(f"{metric.name}{label} n={stats['count']} mean={mean:.3f} p95<={stats['p95']}")
+        else:
+            for key, value in sorted(metric.snapshot().items()):
+                parts.append(f"{metric.name}[{','.join(key)}]={_format_value(value)}")
+    return "; ".join(parts) if parts else "no observations yet"
+
+def reset_metrics() -> None:
+    for metric in ALL_METRICS:
+        metric.reset()
+
+def _stream_finished(backend: str, started: float, first: float, count: int, last_chunk: str, error_prefixes) -> None:
+    if first is None:
+        BACKEND_REQUESTS.inc(backend=backend, outcome="empty")
+        return
+    GENERATION_SECONDS.observe(time.perf_counter() - started, backend=backend)
+    RESPONSE_TOKENS.observe(count, backend=backend)
+    outcome = "error" if last_chunk.startswith(error_prefixes) else "ok"
+    BACKEND_REQUESTS.inc(backend=backend, outcome=outcome)
+
+def instrument_stream(backend: str, stream, error_prefixes: Tuple[str, ...] = ("Error",)):
+    """Pass a backend's chunk stream through while recording TTFT, inter-token latency and token counts."""
+    started = time.perf_counter()
+    first = previous = None
+    count = 0
+    chunk = ""
+    try:
+        for chunk in stream:
+            now = time.perf_counter()
+            if first is None:
+                first = now
+                TIME_TO_FIRST_TOKEN_SECONDS.observe(now - started, backend=backend)
+            else:
+                INTER_TOKEN_SECONDS.observe(now - previous, backend=backend)
+            previous = now
+            count += 1
+            TOKENS.inc(backend=backend)
+            yield chunk
+    finally:
+        _stream_finished(backend, started, first, count, chunk, error_prefixes)
+
+async def instrument_async_stream(backend: str, stream, error_prefixes: Tuple[str, ...] = ("Error",)):
+    """Async counterpart of instrument_stream."""
+    started = time.perf_counter()
+    first = previous = None
+    count = 0
+    chunk = ""
+    try:
+        async for chunk in stream:
+            now = time.perf_counter()
+            if first is None:
+                first = now
+                TIME_TO_FIRST_TOKEN_SECONDS.observe(now - started, backend=backend)
+            else:
+                INTER_TOKEN_SECONDS.observe(now - previous, backend=backend)
+            previous = now
+            count += 1
+            TOKENS.inc(backend=backend)
+            yield chunk
+    finally:
+        _stream_finished(backend, started, first, count, chunk, error_prefixes)
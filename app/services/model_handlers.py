@@ -1,36 +1,193 @@
 import os
+import json
+import asyncio
 import openai
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM, TextIteratorStreamer
-from threading import Thread
+from functools import lru_cache
+from threading import Event, Thread
 import queue
 import logging
+from app.core.config import get_hf_batch_settings, get_max_output_tokens
+from .backends import load_runtime, transformers_module
+from .hf_batching import micro_batcher
+from .model_registry import model_registry
+from .prefix_cache import prefix_cache, split_prompt
+from .http_client import backend_slot, get_http_client
 
 logger = logging.getLogger(__name__)
 
+GPT4_MODEL = "gpt-4"
+
+# Seconds to wait for the next token before giving up on a stalled generation thread
+HF_STREAM_TIMEOUT = 120
+
+@lru_cache(maxsize=None)
+def _stop_on_event_class():
+    # Defined on first use so importing this module does not import transformers
+    class _StopOnEvent(transformers_module().StoppingCriteria):
+        """Stops generation once the consumer of the stream has gone away."""
+
+        def __init__(self, stop_event: Event):
+            self.stop_event = stop_event
+
+        def __call__(self, input_ids, scores, **kwargs):
+            return self.stop_event.is_set()
+
+    return _StopOnEvent
+
+def _token_limits(model):
+    # At most half the context is reserved for output; the rest is available to the prompt
+    context = getattr(model.config, "n_positions", None) or getattr(model.config, "max_position_embeddings", 1024)
+    max_new_tokens = min(get_max_output_tokens("huggingface"), context // 2)
+    return context - max_new_tokens, max_new_tokens
+
+def encode_prompt(tokenizer, model, prompt):
+    """
+    Tokenize a prompt so that prompt plus output fit the model's context window.
+
+    Prompts are sized by the prompt builder; if one is still too long, the
+    instructions before PROMPT_PREFIX_END are kept and the start of the
+    client-specific rest is dropped (the start of the whole prompt when it
+    has no prefix). At most half the context is reserved for output.
+
+    Returns:
+        tuple: (model inputs, max_new_tokens)
+    """
+    max_input, max_new_tokens = _token_limits(model)
+    inputs = tokenizer(prompt, return_tensors="pt")
+    if inputs["input_ids"].shape[1] <= max_input:
+        return inputs, max_new_tokens
+
+    logger.warning(f"Prompt of {inputs['input_ids'].shape[1]} tokens truncated to {max_input}")
+    prefix, rest = split_prompt(prompt)
+    if not prefix:
+        return {key: value[:, -max_input:] for key, value in inputs.items()}, max_new_tokens
+
+    torch, _ = load_runtime("huggingface")
+    head = tokenizer(prefix, return_tensors="pt")
+    room = max_input - head["input_ids"].shape[1]
+    if room <= 0:
+        return {key: value[:, :max_input] for key, value in head.items()}, max_new_tokens
+    tail = tokenizer(rest, return_tensors="pt")
+    return {key: torch.cat([head[key], tail[key][:, -room:]], dim=1) for key in head}, max_new_tokens
+
+def encode_prompt_with_prefix(tokenizer, model, prompt):
+    """
+    Like encode_prompt, but reuse cached key/values for the prompt's invariant prefix.
+
+    The prefix (see prefix_cache.split_prompt) and the client-specific rest
+    are tokenized separately, so the prefix tokens are identical across
+    requests. If the prompt is too long, the start of the rest is dropped
+    and the prefix kept.
+
+    Returns:
+        tuple: (model inputs, max_new_tokens, PrefixEntry or None)
+    """
+    prefix, rest = split_prompt(prompt)
+    entry = prefix_cache.get(tokenizer, model, prefix)
+    max_input, max_new_tokens = _token_limits(model)
+    if entry is None or entry.length >= max_input:
+        inputs, max_new_tokens = encode_prompt(tokenizer, model, prompt)
+        return inputs, max_new_tokens, None
+
+    torch, _ = load_runtime("huggingface")
+    rest_ids = tokenizer(rest, return_tensors="pt")["input_ids"]
+    room = max_input - entry.length
+    if rest_ids.shape[1] > room:
+        logger.warning(f"Prompt of {entry.length + rest_ids.shape[1]} tokens truncated to {max_input}")
+        rest_ids = rest_ids[:, -room:]
+    if rest_ids.shape[1] == 0:
+        inputs, max_new_tokens = encode_prompt(tokenizer, model, prompt)
+        return inputs, max_new_tokens, None
+    input_ids = torch.cat([entry.input_ids, rest_ids], dim=1)
+    return {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}, max_new_tokens, entry
+
 def handle_huggingface_model(prompt, model_name):
     try:
-        tokenizer = AutoTokenizer.from_pretrained(model_name)
-        model = AutoModelForCausalLM.from_pretrained(model_name)
-        
-        inputs = tokenizer(prompt, return_tensors="pt", truncation=True, max_length=1024)
-        
-        output = model.generate(**inputs, max_new_tokens=500, do_sample=True, top_k=50, top_p=0.95)
+        tokenizer, model = model_registry.get(model_name)
+        inputs, max_new_tokens, prefix = encode_prompt_with_prefix(tokenizer, model, prompt)
+
+        torch, _ = load_runtime("huggingface")
+        with torch.inference_mode():
+            output = model.generate(
+                **inputs,
+                past_key_values=prefix.past_key_values if prefix else None,
+                max_new_tokens=max_new_tokens,
+                do_sample=True,
+                top_k=50,
+                top_p=0.95,
+            )
         
         return tokenizer.decode(output[0], skip_special_tokens=True)
             
     except Exception as e:
         raise RuntimeError(f"Error processing {model_name}: {str(e)}")
 
+def handle_huggingface_model_stream(prompt, model_name):
+    """
+    Generate with a local Hugging Face model, yielding decoded text as tokens are produced.
+
+    `model.generate` runs on a worker thread and pushes tokens through a
+    TextIteratorStreamer, so the first words reach the caller long before
+    generation finishes. Closing the generator stops the worker early.
+    Unless HF_BATCH_MAX_SIZE is 1, the prompt is handed to the micro-batcher
+    and generated together with concurrent requests for the same model.
+    """
+    tokenizer, model = model_registry.get(model_name)
+    inputs, max_new_tokens, prefix = encode_prompt_with_prefix(tokenizer, model, prompt)
+
+    if get_hf_batch_settings()["max_batch_size"] > 1:
+        request = micro_batcher.submit(model_name, tokenizer, model, inputs, max_new_tokens, prefix)
+        yield from request.stream(HF_STREAM_TIMEOUT)
+        return
+
+    torch, transformers = load_runtime("huggingface")
+    streamer = transformers.TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=HF_STREAM_TIMEOUT)
+    stop_event = Event()
+    errors = queue.Queue()
+
+    def generate():
+        try:
+            with torch.inference_mode():
+                model.generate(
+                    **inputs,
+                    past_key_values=prefix.past_key_values if prefix else None,
+                    streamer=streamer,
+                    max_new_tokens=max_new_tokens,
+                    do_sample=True,
+                    top_k=50,
+                    top_p=0.95,
+                    pad_token_id=tokenizer.eos_token_id,
+                    stopping_criteria=transformers.StoppingCriteriaList([_stop_on_event_class()(stop_event)]),
+                )
+        except Exception as e:
+            errors.put(e)
+            streamer.end()
+
+    thread = Thread(target=generate, daemon=True)
+    thread.start()
+    try:
+        for text in streamer:
+            if text:
+                yield text
+    except queue.Empty:
+        raise RuntimeError(f"no tokens received for {HF_STREAM_TIMEOUT}s")
+    finally:
+        stop_event.set()
+
+    thread.join()
+    if not errors.empty():
+        raise errors.get()
+
 def handle_gpt4(system_message: str, prompt: str):
     logger.info("Calling GPT-4 API")
     try:
         response = openai.ChatCompletion.create(
-            model="gpt-4",
+            model=GPT4_MODEL,
             messages=[
                 {"role": "system", "content": system_message},
                 {"role": "user", "content": prompt}
             ],
+            max_tokens=get_max_output_tokens("openai"),
             stream=True
         )
         
@@ -41,4 +198,93 @@ def handle_gpt4(system_message: str, prompt: str):
 
     except Exception as e:
         logger.exception(f"Error in GPT-4 API call: {str(e)}")
-        yield f"Error: {str(e)}"
\ No newline at end of file
+        yield f"Error: {str(e)}"
+
+async def handle_gpt4_async(system_message: str, prompt: str):
+    """
+    Stream a GPT-4 chat completion without blocking the event loop.
+
+    Talks to the OpenAI-compatible `openai.api_base` over the pooled
+    keep-alive client and parses the server-sent events directly.
+    """
+    logger.info("Calling GPT-4 API (async)")
+    try:
+        async with backend_slot("openai"):
+            client = get_http_client()
+            async with client.stream(
+                "POST",
+                f"{openai.api_base.rstrip('/')}/chat/completions",
+                headers={"Authorization": f"Bearer {openai.api_key or os.getenv('OPENAI_API_KEY', '')}"},
+                json={
+                    "model": GPT4_MODEL,
+                    "messages": [
+                        {"role": "system", "content": system_message},
+                        {"role": "user", "content": prompt}
+                    ],
+                    "max_tokens": get_max_output_tokens("openai"),
+                    "stream": True
+                },
+            ) as response:
+                if response.status_code != 200:
+                    body = (await response.aread()).decode(errors="replace")
+                    raise RuntimeError(f"OpenAI API returned {response.status_code}: {body}")
+
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    content = chunk["choices"][0].get("delta", {}).get("content")
+                    if content:
+                        yield content
+
+    except Exception as e:
+        logger.exception(f"Error in GPT-4 API call: {str(e)}")
+        yield f"Error: {str(e)}"
+
+async def handle_huggingface_model_async(prompt, model_name):
+    """
+    Async view of handle_huggingface_model_stream.
+
+    The blocking token stream is drained on a dedicated thread and handed
+    to the event loop through a queue, so waiting for the next token never
+    occupies the loop or a threadpool slot.
+    """
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue()
+    done = object()
+    cancelled = Event()
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(chunks.put_nowait, item)
+        except RuntimeError:
+            pass  # Event loop already closed; nobody is listening
+
+    def pump():
+        stream = handle_huggingface_model_stream(prompt, model_name)
+        try:
+            for text in stream:
+                if cancelled.is_set():
+                    break
+                put(text)
+        except Exception as e:
+            put(e)
+        finally:
+            stream.close()
+            put(done)
+
+    async with backend_slot("huggingface"):
+        Thread(target=pump, daemon=True).start()
+        try:
+            while True:
+                item = await chunks.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
@@ -0,0 +1,164 @@
+"""
+Process-wide Hugging Face model pool for the AI Budgeting Assistant.
+
+Tokenizers and model weights are loaded once per process and kept
+resident, so repeated requests for gpt2/distilgpt2 skip the disk I/O
+and allocations of `from_pretrained`. The pool evicts the least
+recently used model when it grows past its model count or memory cap.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from app.core.config import get_model_pool_memory_mb, get_model_pool_size, get_preload_models
+from app.services.backends import transformers_module
+from app.services.cpu_inference import prepare_model
+from app.services.metrics import MODEL_LOAD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+def load_pretrained(model_name: str) -> Tuple[Any, Any]:
+    transformers = transformers_module()
+    tokenizer = transformers.AutoTokenizer.from_pretrained(model_name)
+    model = prepare_model(transformers.AutoModelForCausalLM.from_pretrained(model_name))
+    return tokenizer, model
+
+def model_nbytes(model: Any) -> int:
+    """Size of a model's parameters and buffers in bytes, including dynamically quantized weights."""
+    tensors = list(model.parameters()) + list(model.buffers())
+    for module in model.modules():
+        # Dynamically quantized layers keep packed weights behind weight()/bias() methods, not parameters
+        if callable(getattr(module, "weight", None)):
+            tensors += [t for t in (module.weight(), module.bias()) if t is not None]
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+class ModelRegistry:
+    """
+    LRU pool of (tokenizer, model) pairs keyed by model name.
+
+    Args:
+        max_models (int): Maximum number of resident models.
+        max_memory_mb (float): Cap on resident weights in MB; 0 disables it.
+        loader (callable): Function mapping a model name to (tokenizer, model).
+    """
+
+    def __init__(self, max_models: int = 2, max_memory_mb: float = 0,
+                 loader: Callable[[str], Tuple[Any, Any]] = load_pretrained):
+        self.max_models = max_models
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self._loader = loader
+        self._models: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._load_seconds: Dict[str, float] = {}
+
+    def get(self, model_name: str) -> Tuple[Any, Any]:
+        """Return the resident (tokenizer, model) for model_name, loading it on a miss."""
+        with self._lock:
+            entry = self._lookup(model_name)
+            if entry is not None:
+                return entry["tokenizer"], entry["model"]
+            load_lock = self._load_locks.setdefault(model_name, threading.Lock())
+
+        # Serialize loads per model so concurrent misses load the weights only once
+        with load_lock:
+            with self._lock:
+                entry = self._lookup(model_name)
+                if entry is not None:
+                    return entry["tokenizer"], entry["model"]
+                self._misses += 1
+
+            logger.info(f"Loading {model_name} into the model pool")
+            start = time.perf_counter()
+            tokenizer, model = self._loader(model_name)
+            elapsed = time.perf_counter() - start
+            logger.info(f"Loaded {model_name} in {elapsed:.2f}s")
+            MODEL_LOAD_SECONDS.observe(elapsed, model=model_name)
+
+            with self._lock:
+                self._models[model_name] = {
+                    "tokenizer": tokenizer,
+                    "model": model,
+                    "nbytes": model_nbytes(model),
+                }
+                self._load_seconds[model_name] = self._load_seconds.get(model_name, 0.0) + elapsed
+                self._evict_if_needed(keep=model_name)
+        return tokenizer, model
+
+    def warm_up(self, model_names: Iterable[str]) -> None:
+        """Eagerly load the given models, logging (not raising) failures."""
+        for model_name in model_names:
+            try:
+                self.get(model_name)
+            except Exception as e:
+                logger.error(f"Failed to warm up {model_name}: {str(e)}")
+
+    def evict(self, model_name: str) -> bool:
+        with self._lock:
+            if self._models.pop(model_name, None) is None:
+                return False
+            self._evictions += 1
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._evictions += len(self._models)
+            self._models.clear()
+
+    def resident_tokenizer(self, model_name: str):
+        """The tokenizer of a model that is already loaded, without loading it or touching LRU order."""
+        with self._lock:
+            entry = self._models.get(model_name)
+            return entry["tokenizer"] if entry is not None else None
+
+    def __contains__(self, model_name: str) -> bool:
+        with self._lock:
+            return model_name in self._models
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "resident_models": list(self._models.keys()),
+                "resident_mb": round(self._resident_bytes() / (1024 * 1024), 2),
+                "load_seconds": dict(self._load_seconds),
+            }
+
+    def _lookup(self, model_name: str) -> Optional[Dict[str, Any]]:
+        entry = self._models.get(model_name)
+        if entry is not None:
+            self._models.move_to_end(model_name)
+            self._hits += 1
+        return entry
+
+    def _resident_bytes(self) -> int:
+        return sum(entry["nbytes"] for entry in self._models.values())
+
+    def _evict_if_needed(self, keep: str) -> None:
+        def over_limit():
+            if len(self._models) > max(self.max_models, 1):
+                return True
+            return bool(self.max_memory_bytes) and self._resident_bytes() > self.max_memory_bytes
+
+        # Never evict the model that was just loaded, even if it alone exceeds the cap
+        while len(self._models) > 1 and over_limit():
+            oldest = next(name for name in self._models if name != keep)
+            del self._models[oldest]
+            self._evictions += 1
+            logger.info(f"Evicted {oldest} from the model pool")
+
+model_registry = ModelRegistry(max_models=get_model_pool_size(), max_memory_mb=get_model_pool_memory_mb())
+
+def warm_up_models(model_names: Optional[Iterable[str]] = None) -> None:
+    """Load the configured HF_PRELOAD_MODELS (or the given names) into the shared pool."""
+    model_names = get_preload_models() if model_names is None else list(model_names)
+    if model_names:
+        model_registry.warm_up(model_names)
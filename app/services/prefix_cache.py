@@ -0,0 +1,102 @@
+"""
+Reuse of attention key/values for the invariant start of advice prompts.
+
+Advice prompts open with the same instruction scaffold for every client
+and end it with PROMPT_PREFIX_END, after which the client's own data
+follows. For local models the scaffold's past key/values are computed
+once per model and kept here, so each generation only prefills the
+client-specific part of the prompt. The same ordering lets remote
+providers that cache prompt prefixes reuse the scaffold across requests.
+"""
+
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from app.core.config import get_prefix_cache_size
+from .backends import load_runtime
+from .metrics import PREFIX_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Ends the invariant scaffold of every advice prompt; everything after it is client specific
+PROMPT_PREFIX_END = "\nClient Information:\n"
+
+def split_prompt(prompt: str) -> Tuple[str, str]:
+    """(invariant prefix, client-specific rest) of a prompt; the prefix is empty if the prompt has none."""
+    index = prompt.find(PROMPT_PREFIX_END)
+    if index < 0:
+        return "", prompt
+    cut = index + len(PROMPT_PREFIX_END)
+    return prompt[:cut], prompt[cut:]
+
+class PrefixEntry:
+    """Token ids of a prompt prefix and the model's past key/values for them."""
+
+    def __init__(self, input_ids, past_key_values):
+        self.input_ids = input_ids
+        self.past_key_values = past_key_values
+
+    @property
+    def length(self) -> int:
+        return self.input_ids.shape[1]
+
+    def expand(self, batch_size: int):
+        """Past key/values repeated (as views) for a batch of prompts sharing this prefix."""
+        return tuple(
+            tuple(tensor.expand(batch_size, *tensor.shape[1:]) for tensor in layer)
+            for layer in self.past_key_values
+        )
+
+class PrefixCache:
+    """
+    Per-model LRU of PrefixEntry objects keyed by prefix text.
+
+    Entries are held against the model object itself, so a model evicted
+    from the pool takes its cached prefixes with it.
+    """
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._entries: "weakref.WeakKeyDictionary[Any, OrderedDict[str, PrefixEntry]]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, tokenizer, model, prefix: str) -> Optional[PrefixEntry]:
+        """The cached entry for prefix on model, computing it on a miss; None when the cache is disabled."""
+        if self.max_entries <= 0 or not prefix:
+            return None
+        with self._lock:
+            entries = self._entries.setdefault(model, OrderedDict())
+            entry = entries.get(prefix)
+            if entry is not None:
+                entries.move_to_end(prefix)
+                PREFIX_CACHE_REQUESTS.inc(result="hit")
+                return entry
+        PREFIX_CACHE_REQUESTS.inc(result="miss")
+
+        entry = self._compute(tokenizer, model, prefix)
+        with self._lock:
+            entries = self._entries.setdefault(model, OrderedDict())
+            entries[prefix] = entry
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def _compute(tokenizer, model, prefix: str) -> PrefixEntry:
+        torch, _ = load_runtime("huggingface")
+        input_ids = tokenizer(prefix, return_tensors="pt")["input_ids"]
+        with torch.inference_mode():
+            past = model(input_ids=input_ids, use_cache=True).past_key_values
+        if hasattr(past, "to_legacy_cache"):
+            past = past.to_legacy_cache()  # Generation must never extend the shared entry in place
+        logger.info(f"Cached key/values for a {input_ids.shape[1]}-token prompt prefix")
+        return PrefixEntry(input_ids, past)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+prefix_cache = PrefixCache(max_entries=get_prefix_cache_size())
@@ -0,0 +1,121 @@
+"""
+Token budgeting for advice prompts.
+
+Counts prompt tokens the way each backend will see them and renders the
+bank statement section at a range of detail levels (per-category and
+per-month totals, largest transactions), so the prompt builder can pick
+the most detailed statement summary that still fits the backend's input
+budget while leaving room for the generated advice.
+"""
+
+import logging
+import math
+from typing import List, Optional
+
+from app.api.models import BankStatement
+from app.core.config import get_max_output_tokens, get_prompt_token_budget
+from .backends import backend_for_model
+from .model_registry import model_registry
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # Optional: GPT-4 prompts are estimated from their length without it
+    tiktoken = None
+
+# Context windows in tokens of the models the app can call
+CONTEXT_WINDOWS = {"GPT-4": 8192, "gpt2": 1024, "distilgpt2": 1024}
+
+# Conservative characters per token when no tokenizer is available (amounts and dates split into many tokens)
+CHARS_PER_TOKEN_ESTIMATE = 3
+
+# Chat formatting overhead per message for OpenAI chat models
+CHAT_MESSAGE_OVERHEAD = 4
+
+# Statement summaries from most to least detailed; the prompt builder uses the first that fits
+DETAIL_LEVELS = [
+    {"categories": None, "months": 6, "transactions": 10},
+    {"categories": None, "months": 3, "transactions": 5},
+    {"categories": 10, "months": 0, "transactions": 5},
+    {"categories": 5, "months": 0, "transactions": 0},
+    {"categories": 0, "months": 0, "transactions": 0},
+]
+
+# Categories listed per month in the month-by-month section
+CATEGORIES_PER_MONTH = 6
+
+_tiktoken_encoding = None
+
+def budget_backend(model_name: str) -> str:
+    # Unknown models are sized like the small local ones
+    return backend_for_model(model_name) or "huggingface"
+
+def count_tokens(text: str, model_name: str) -> int:
+    """
+    Count the tokens text occupies for model_name.
+
+    Uses the model's own tokenizer when it is resident in the model pool
+    (Hugging Face) or tiktoken is installed (GPT-4), and a conservative
+    length-based estimate otherwise.
+    """
+    global _tiktoken_encoding
+    if budget_backend(model_name) == "openai":
+        if tiktoken is not None:
+            if _tiktoken_encoding is None:
+                _tiktoken_encoding = tiktoken.encoding_for_model("gpt-4")
+            return len(_tiktoken_encoding.encode(text))
+    else:
+        tokenizer = model_registry.resident_tokenizer(model_name)
+        if tokenizer is not None:
+            return len(tokenizer(text)["input_ids"])
+    return math.ceil(len(text) / CHARS_PER_TOKEN_ESTIMATE)
+
+def count_prompt_tokens(system_message: str, prompt: str, model_name: str) -> int:
+    """Input tokens of a request: both chat messages for GPT-4, the bare prompt for local models."""
+    if budget_backend(model_name) == "openai":
+        return (count_tokens(system_message, model_name) + count_tokens(prompt, model_name)
+                + 2 * CHAT_MESSAGE_OVERHEAD)
+    return count_tokens(prompt, model_name)
+
+def input_token_budget(model_name: str) -> int:
+    """Tokens available to the prompt after reserving the backend's output tokens."""
+    backend = budget_backend(model_name)
+    available = CONTEXT_WINDOWS.get(model_name, 1024) - get_max_output_tokens(backend)
+    budget = get_prompt_token_budget(backend)
+    return min(budget, available) if budget > 0 else available
+
+class StatementDigest:
+    """Aggregates of a bank statement, computed once and rendered at any DETAIL_LEVELS entry."""
+
+    def __init__(self, bank_statement: BankStatement):
+        aggregates = bank_statement.aggregates()
+        self.total_withdrawals = aggregates.total('Withdrawals')
+        self.total_deposits = aggregates.total('Deposits')
+        expenses = aggregates.category_totals('Withdrawals')
+        self.category_totals = expenses[expenses > 0].sort_values(ascending=False, kind='stable')
+        self.monthly = aggregates.cube('Withdrawals')
+        self.largest = aggregates.largest
+
+    def _monthly_lines(self, months: int) -> List[str]:
+        lines = []
+        spent = self.monthly.columns[(self.monthly > 0).any(axis=0).to_numpy()]
+        for period in spent[-months:]:
+            totals = self.monthly[period]
+            totals = totals[totals > 0].sort_values(ascending=False, kind='stable').head(CATEGORIES_PER_MONTH)
+            lines.append(f"{period}: " + ", ".join(f"{category} ${amount:.2f}" for category, amount in totals.items()))
+        return lines
+
+    def render(self, categories: Optional[int], months: int, transactions: int) -> str:
+        lines = [f"Total Withdrawals: ${self.total_withdrawals:.2f}", f"Total Deposits: ${self.total_deposits:.2f}"]
+        if categories != 0:
+            top = self.category_totals if categories is None else self.category_totals.head(categories)
+            lines += ["", "Top Expense Categories:"]
+            lines += [f"{category}: ${amount:.2f}" for category, amount in top.items()]
+        if months:
+            lines += ["", f"Monthly Withdrawals by Category (last {months} months):"] + self._monthly_lines(months)
+        if transactions:
+            lines += ["", "Largest Transactions:"]
+            for row in self.largest.head(transactions).itertuples(index=False):
+                lines.append(f"{row.Date:%Y-%m-%d} {row.Description} ({row.Category}): ${row.Withdrawals:.2f}")
+        return "\n".join(lines)
@@ -1,12 +1,24 @@
-from typing import List, Dict, Tuple, Optional, Any
-from app.api.models import UserDataInput, BankStatementEntry
-from app.core.config import get_sources
+from typing import List, Dict, Tuple, Optional, Any, Union
+from app.api.models import UserDataInput, BankStatementEntry, BankStatement
+from app.core.config import get_max_output_tokens, get_sources
 from dotenv import load_dotenv
-import torch
+import asyncio
 import logging
+import threading
+import textwrap
 import time
 from concurrent.futures import ThreadPoolExecutor, TimeoutError
-from .model_handlers import handle_huggingface_model, handle_gpt4
+from .model_handlers import (
+    handle_huggingface_model_stream, handle_gpt4, handle_huggingface_model_async, handle_gpt4_async
+)
+from .advice_cache import AdviceCache, build_advice_cache, canonical_hash
+from .coalescing import AsyncSingleFlight, SingleFlight
+from .metrics import (
+    ADVICE_CACHE_REQUESTS, BACKEND_REQUESTS, PROMPT_BUILD_SECONDS, PROMPT_TOKENS, instrument_async_stream, instrument_stream
+)
+from .backends import backend_for_model
+from .prefix_cache import PROMPT_PREFIX_END
+from .prompt_budget import DETAIL_LEVELS, StatementDigest, budget_backend, count_prompt_tokens, input_token_budget
 import pandas as pd
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -14,6 +26,48 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+# Bump whenever create_gpt_prompt changes so cached advice from the old template is not replayed
+PROMPT_TEMPLATE_VERSION = "3"
+
+# Backends report failures as a final chunk with one of these prefixes; such responses are never cached
+ERROR_PREFIXES = ("Error", "Unsupported model")
+
+# Built on first use from the ADVICE_CACHE_* settings (see get_advice_cache)
+advice_cache: Optional[AdviceCache] = None
+_advice_cache_lock = threading.Lock()
+
+# In-flight generations by advice_cache_key, shared by identical concurrent requests
+advice_flights = SingleFlight()
+async_advice_flights = AsyncSingleFlight()
+
+def get_advice_cache() -> AdviceCache:
+    """The process-wide advice cache, created the first time advice is requested."""
+    global advice_cache
+    if advice_cache is None:
+        with _advice_cache_lock:
+            if advice_cache is None:
+                advice_cache = build_advice_cache()
+    return advice_cache
+
+def advice_cache_key(user_data: UserDataInput, sources: str, follow_up_question: str = None) -> str:
+    return canonical_hash({
+        "template_version": PROMPT_TEMPLATE_VERSION,
+        "user_data": user_data.dict(exclude={'bank_statement'}),
+        "bank_statement": user_data.bank_statement.fingerprint(),
+        "sources": sources,
+        "follow_up_question": follow_up_question,
+    })
+
+def is_cacheable_response(chunks: List[str]) -> bool:
+    return bool(chunks) and not chunks[-1].startswith(ERROR_PREFIXES)
+
+def _cached_response(cache_key: str) -> Optional[List[str]]:
+    return get_advice_cache().get(cache_key)
+
+def _cache_response(cache_key: str, chunks: List[str]) -> None:
+    if is_cacheable_response(chunks):
+        get_advice_cache().put(cache_key, chunks)
+
 def calculate_savings_rate(total_income: float, total_expenses: float) -> float:
     """
     Calculate the savings rate based on total income and expenses.
@@ -24,14 +78,13 @@ def calculate_savings_rate(total_income: float, total_expenses: float) -> float:
 
 def prepare_user_context(user_data: UserDataInput) -> Dict[str, Any]:
     try:
-        bank_statement_df = pd.DataFrame([entry.dict() for entry in user_data.bank_statement])
-        total_expenses = bank_statement_df['Withdrawals'].sum()
+        total_expenses = user_data.bank_statement.total('Withdrawals')
         savings_rate = calculate_savings_rate(user_data.current_income, total_expenses)
 
         return {
             "name": user_data.name,
             "age": user_data.age,
-            "address": user_data.address,
+            "state": user_data.state,
             "income": user_data.current_income,
             "current_savings": user_data.current_savings,
             "goals": user_data.goals,
@@ -43,33 +96,14 @@ def prepare_user_context(user_data: UserDataInput) -> Dict[str, Any]:
     except Exception as e:
         return {"error": str(e)}
 
-def create_gpt_prompt(user_data: UserDataInput, sources: List[str], follow_up_question: str = None) -> Tuple[str, str]:
-    system_message = """You are a friendly, empathetic professional budget advisor. Provide a detailed yet approachable financial analysis and budgeting advice for the following client. Use a warm, first-person perspective as if you're having a conversation with a friend. The client's monthly income is EXACTLY {income:.2f}. 
-    Always use this exact income figure in your analysis and advice. Do not assume or use any other income figure.""".format(income=user_data.current_income)
+# Identical for every client so that it, and the instruction scaffold opening each prompt, form a stable
+# prefix: local models reuse its cached key/values and remote providers can serve it from their prompt cache
+SYSTEM_MESSAGE = """You are a friendly, empathetic professional budget advisor. Provide a detailed yet approachable financial analysis and budgeting advice for the client described in the request. Use a warm, first-person perspective as if you're having a conversation with a friend. Always use the client's stated monthly income EXACTLY in your analysis and advice. Do not assume or use any other income figure."""
 
-    prompt = f"""
-    Based on the following user information and financial data, provide a comprehensive financial analysis and advice:
-
-    Name: {user_data.name}
-    Age: {user_data.age}
-    State: {user_data.state}
-    Monthly Income: ${user_data.current_income:.2f}
-    Current Savings: ${user_data.current_savings:.2f}
-    Financial Goals: {', '.join(user_data.goals)}
-    Timeline: {user_data.timeline_months} months
-
-    Budgeting Constraints:
-    {format_constraints(user_data.constraints)}
-
-    Bank Statement Summary:
-    Total Withdrawals: ${sum(entry.Withdrawals for entry in user_data.bank_statement):.2f}
-
-    Top Expense Categories:
-    {get_top_expenses(user_data.bank_statement)}
-
-    IMPORTANT: The client's monthly income is EXACTLY ${user_data.current_income:.2f}. Do not use any other income figure in your analysis or advice. This is the correct and only income figure to use.
-
-    CRITICAL: You MUST consider and address the provided budgeting constraints in your analysis and recommendations. Each constraint should be explicitly mentioned and factored into your advice.
+# Prompts open with instructions that depend only on the deployment's sources; the client's
+# data follows PROMPT_PREFIX_END so that everything before it is shared between requests
+FULL_PROMPT_TEMPLATE = textwrap.dedent("""
+    Based on the client information and financial data below, provide a comprehensive financial analysis and advice.
 
     Please provide the following:
     1. Income and Expense Analysis
@@ -89,61 +123,224 @@ def create_gpt_prompt(user_data: UserDataInput, sources: List[str], follow_up_qu
     }}
     ---BUDGET_JSON_END---
 
-    Ensure that the total proposed budget matches the monthly income of ${user_data.current_income:.2f}.
+    CRITICAL: You MUST consider and address the provided budgeting constraints in your analysis and recommendations. Each constraint should be explicitly mentioned and factored into your advice.
     Your recommendations and proposed budget MUST take into account the user's budgeting constraints.
+    Ensure that the total proposed budget matches the client's monthly income exactly.
+
+    Base your advice on best practices from reputable financial sources such as {sources}.
+    """) + PROMPT_PREFIX_END + textwrap.dedent("""\
+    Name: {name}
+    Age: {age}
+    State: {state}
+    Monthly Income: ${income:.2f}
+    Current Savings: ${savings:.2f}
+    Financial Goals: {goals}
+    Timeline: {timeline} months
+
+    Budgeting Constraints:
+    {constraints}
+
+    Bank Statement Summary:
+    {statement}
+
+    IMPORTANT: The client's monthly income is EXACTLY ${income:.2f}. Do not use any other income figure in your analysis or advice. This is the correct and only income figure to use.
+""")
 
-    Base your advice on best practices from reputable financial sources such as {', '.join(sources)}.
+# Same instructions in far fewer tokens, for backends with small context windows
+COMPACT_PROMPT_TEMPLATE = textwrap.dedent("""
+    Write for the client below: 1. Income and Expense Analysis 2. Savings Rate Evaluation 3. Goal Feasibility 4. Recommendations (respect the constraints) 5. Proposed Monthly Budget matching the income, as JSON:
+    ---BUDGET_JSON_START---
+    {{"Proposed Monthly Budget": {{"Category": {{"proposed_change": 0.00, "change_reason": "Reason"}}}}}}
+    ---BUDGET_JSON_END---
+    """) + PROMPT_PREFIX_END + textwrap.dedent("""\
+    Client: {name}, age {age}, {state}. Monthly income EXACTLY ${income:.2f}. Savings ${savings:.2f}.
+    Goals: {goals}. Timeline: {timeline} months.
+    Constraints:
+    {constraints}
+
+    {statement}
+""")
+
+FOLLOW_UP_TEMPLATE = """
+
+Follow-up Question from the user: {question}
+
+Please address this question in your response, providing additional advice or clarification as needed.
+IMPORTANT: Generate a new Proposed Monthly Budget that takes into account the follow-up question or comment.
+Ensure that this new budget is presented in the same JSON format as before, and that it still matches the monthly income exactly.
+Explain the changes made to the budget in response to the follow-up question.
+"""
+
+def build_prompt(user_data: UserDataInput, sources: Union[str, List[str]], follow_up_question: str = None) -> Dict[str, Any]:
     """
+    Build the advice prompt within the selected backend's input token budget.
 
-    if follow_up_question:
-        prompt += f"\n\nFollow-up Question from the user: {follow_up_question}\n"
-        prompt += """
-        Please address this question in your response, providing additional advice or clarification as needed.
-        IMPORTANT: Generate a new Proposed Monthly Budget that takes into account the follow-up question or comment.
-        Ensure that this new budget is presented in the same JSON format as before, and that it still matches the monthly income exactly.
-        Explain the changes made to the budget in response to the follow-up question.
-        """
-
-    return system_message, prompt
-
-def get_top_expenses(bank_statement: List[BankStatementEntry]) -> str:
-    expenses = {}
-    for entry in bank_statement:
-        if entry.Withdrawals > 0:
-            expenses[entry.Category] = expenses.get(entry.Category, 0) + entry.Withdrawals
-    
-    sorted_expenses = sorted(expenses.items(), key=lambda x: x[1], reverse=True)
-    top_5 = sorted_expenses[:5]
+    The statement summary is rendered from most to least detailed (see
+    prompt_budget.DETAIL_LEVELS), each with the full and then the compact
+    instructions, and the first prompt that fits the budget is used.
+
+    Returns:
+        dict: system_message, prompt, input_tokens, budget, reserved_output_tokens,
+        template ("full" or "compact") and detail_level (index into DETAIL_LEVELS).
+    """
+    model_name = user_data.selected_llm
+    backend = budget_backend(model_name)
+    budget = input_token_budget(model_name)
+    digest = StatementDigest(user_data.bank_statement)
+
+    system_message = SYSTEM_MESSAGE
+    fields = {
+        "name": user_data.name,
+        "age": user_data.age,
+        "state": user_data.state,
+        "income": user_data.current_income,
+        "savings": user_data.current_savings,
+        "goals": ', '.join(user_data.goals),
+        "timeline": user_data.timeline_months,
+        "constraints": format_constraints(user_data.constraints),
+        "sources": sources if isinstance(sources, str) else ', '.join(sources),
+    }
+    follow_up = FOLLOW_UP_TEMPLATE.format(question=follow_up_question) if follow_up_question else ""
+
+    plan = None
+    for detail_level, level in enumerate(DETAIL_LEVELS):
+        statement = digest.render(**level)
+        for template_name, template in (("full", FULL_PROMPT_TEMPLATE), ("compact", COMPACT_PROMPT_TEMPLATE)):
+            prompt = template.format(statement=statement, **fields) + follow_up
+            plan = {
+                "system_message": system_message,
+                "prompt": prompt,
+                "input_tokens": count_prompt_tokens(system_message, prompt, model_name),
+                "budget": budget,
+                "reserved_output_tokens": get_max_output_tokens(backend),
+                "template": template_name,
+                "detail_level": detail_level,
+            }
+            if plan["input_tokens"] <= budget:
+                break
+        else:
+            continue
+        break
+    else:
+        logger.warning(f"Prompt needs {plan['input_tokens']} tokens, over the {budget}-token budget for {model_name}")
+
+    PROMPT_TOKENS.observe(plan["input_tokens"], backend=backend)
+    logger.info(
+        f"Prompt for {model_name}: {plan['input_tokens']}/{budget} input tokens "
+        f"({plan['template']} template, detail level {plan['detail_level']}), "
+        f"{plan['reserved_output_tokens']} reserved for output"
+    )
+    return plan
+
+def create_gpt_prompt(user_data: UserDataInput, sources: Union[str, List[str]], follow_up_question: str = None) -> Tuple[str, str]:
+    plan = build_prompt(user_data, sources, follow_up_question)
+    return plan["system_message"], plan["prompt"]
+
+def get_top_expenses(bank_statement: Union[BankStatement, List[BankStatementEntry]], limit: int = 5) -> str:
+    if not isinstance(bank_statement, BankStatement):
+        bank_statement = BankStatement.from_entries(bank_statement)
+
+    expenses = bank_statement.category_totals('Withdrawals')
+    top = expenses[expenses > 0].sort_values(ascending=False, kind='stable').head(limit)
     
-    return "\n".join([f"{category}: ${amount:.2f}" for category, amount in top_5])
+    return "\n".join([f"{category}: ${amount:.2f}" for category, amount in top.items()])
 
 def generate_advice_stream(user_data: UserDataInput, follow_up_question: str = None):
-    print("generate_advice_stream function called")
-    print(f"Generating advice for user with income: ${user_data.current_income:.2f}")
+    logger.info(f"Generating advice for user with income: ${user_data.current_income:.2f}")
     try:
         sources = get_sources()
-        system_message, gpt_prompt = create_gpt_prompt(user_data, sources, follow_up_question)
-        
-        print(f"GPT prompt created. Income in prompt: ${user_data.current_income:.2f}")
-        print(f"Full GPT prompt: {gpt_prompt}")
+        cache_key = advice_cache_key(user_data, sources, follow_up_question)
+        cached_chunks = _cached_response(cache_key)
+        if cached_chunks is not None:
+            logger.info("Replaying cached advice")
+            ADVICE_CACHE_REQUESTS.inc(result="hit")
+            yield from get_advice_cache().replay(cached_chunks)
+            return
+        ADVICE_CACHE_REQUESTS.inc(result="miss")
+
+        def start_generation():
+            with PROMPT_BUILD_SECONDS.time():
+                system_message, gpt_prompt = create_gpt_prompt(user_data, sources, follow_up_question)
+            logger.debug(f"Full GPT prompt: {gpt_prompt}")
+            return call_llm_api(system_message, gpt_prompt, user_data.selected_llm)
 
-        yield from call_llm_api(system_message, gpt_prompt, user_data.selected_llm)
+        # Identical requests already generating share that generation instead of starting another
+        yield from advice_flights.stream(cache_key, start_generation, lambda chunks: _cache_response(cache_key, chunks))
 
     except Exception as e:
-        print(f"Error in generate_advice_stream: {str(e)}")
+        logger.exception(f"Error in generate_advice_stream: {str(e)}")
         yield f"Error generating advice: {str(e)}"
 
+def _huggingface_chunks(prompt: str, model_name: str):
+    try:
+        yield from handle_huggingface_model_stream(prompt, model_name)
+    except Exception as e:
+        yield f"Error processing {model_name}: {str(e)}"
+
 def call_llm_api(system_message: str, prompt: str, model_name: str):
-    if model_name == "GPT-4":
-        yield from handle_gpt4(system_message, prompt)
-    elif model_name in ["gpt2", "distilgpt2"]:
+    backend = backend_for_model(model_name)
+    if backend == "openai":
+        yield from instrument_stream("openai", handle_gpt4(system_message, prompt), ERROR_PREFIXES)
+    elif backend == "huggingface":
+        yield from instrument_stream("huggingface", _huggingface_chunks(prompt, model_name), ERROR_PREFIXES)
+    else:
+        BACKEND_REQUESTS.inc(backend="unsupported", outcome="error")
+        yield f"Unsupported model: {model_name}"
+
+async def generate_advice_stream_async(user_data: UserDataInput, follow_up_question: str = None):
+    """Async counterpart of generate_advice_stream used by the FastAPI app."""
+    logger.info(f"Generating advice for user with income: ${user_data.current_income:.2f}")
+    try:
+        sources = get_sources()
+        cache_key = advice_cache_key(user_data, sources, follow_up_question)
+        # The disk tier does blocking SQLite I/O, so it is read and written off the event loop
+        cached_chunks = await asyncio.to_thread(_cached_response, cache_key)
+        if cached_chunks is not None:
+            logger.info("Replaying cached advice")
+            ADVICE_CACHE_REQUESTS.inc(result="hit")
+            for chunk in get_advice_cache().replay(cached_chunks):
+                yield chunk
+            return
+        ADVICE_CACHE_REQUESTS.inc(result="miss")
+
+        def start_generation():
+            with PROMPT_BUILD_SECONDS.time():
+                system_message, gpt_prompt = create_gpt_prompt(user_data, sources, follow_up_question)
+            return call_llm_api_async(system_message, gpt_prompt, user_data.selected_llm)
+
+        stream = async_advice_flights.stream(
+            cache_key, start_generation, lambda chunks: asyncio.to_thread(_cache_response, cache_key, list(chunks))
+        )
         try:
-            response = handle_huggingface_model(prompt, model_name)
-            yield response
-        except Exception as e:
-            yield f"Error processing {model_name}: {str(e)}"
+            async for chunk in stream:
+                yield chunk
+        finally:
+            # Leave the flight promptly when the client goes away rather than when the generator is collected
+            await stream.aclose()
+
+    except Exception as e:
+        logger.exception(f"Error in generate_advice_stream_async: {str(e)}")
+        yield f"Error generating advice: {str(e)}"
+
+async def _huggingface_chunks_async(prompt: str, model_name: str):
+    try:
+        async for chunk in handle_huggingface_model_async(prompt, model_name):
+            yield chunk
+    except Exception as e:
+        yield f"Error processing {model_name}: {str(e)}"
+
+async def call_llm_api_async(system_message: str, prompt: str, model_name: str):
+    backend = backend_for_model(model_name)
+    if backend == "openai":
+        stream = instrument_async_stream("openai", handle_gpt4_async(system_message, prompt), ERROR_PREFIXES)
+    elif backend == "huggingface":
+        stream = instrument_async_stream("huggingface", _huggingface_chunks_async(prompt, model_name), ERROR_PREFIXES)
     else:
+        BACKEND_REQUESTS.inc(backend="unsupported", outcome="error")
         yield f"Unsupported model: {model_name}"
+        return
+    async for chunk in stream:
+        yield chunk
 
 def get_advice(user_data: UserDataInput):
     print("get_advice function called")
@@ -0,0 +1,162 @@
+"""
+Category x month aggregate index of a bank statement.
+
+Holds dense (category, month) arrays of withdrawals, deposits and
+transaction counts, per-category totals and the largest withdrawals,
+built in one bincount pass over the transactions. Analytics (the prompt's
+statement digest, top expenses, budget tables and charts) query these in
+O(categories x months) instead of rescanning every row, and appending
+transactions updates a copy of the index from the new rows alone.
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+AMOUNT_COLUMNS = ('Withdrawals', 'Deposits')
+
+# Largest withdrawals kept with the index; covers every prompt detail level
+LARGEST_TRANSACTIONS = 25
+
+TRANSACTION_COLUMNS = ['Date', 'Description', 'Category', 'Withdrawals', 'Deposits']
+
+def _month_numbers(dates: pd.Series) -> np.ndarray:
+    """Months since year 0 as floats, NaN for missing dates."""
+    return (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype=float)
+
+class StatementIndex:
+    """
+    Aggregates of a statement by category and calendar month.
+
+    Build one with from_frame; instances are not modified afterwards, so
+    they can be shared, and append returns a new index. Transactions
+    without a date count towards the category totals but not the cube.
+    """
+
+    def __init__(self):
+        self._categories = pd.Index([], dtype=object)
+        self._first_month: Optional[int] = None
+        self._cube = {column: np.zeros((0, 0)) for column in AMOUNT_COLUMNS}
+        self._counts = np.zeros((0, 0), dtype=np.int64)
+        self._totals = {column: np.zeros(0) for column in AMOUNT_COLUMNS}
+        self._largest = pd.DataFrame(columns=TRANSACTION_COLUMNS)
+        self._rolling: Dict[Tuple[str, int], pd.DataFrame] = {}
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "StatementIndex":
+        """Index of a frame in the BankStatement layout (Date, Description, Category, Withdrawals, Deposits)."""
+        index = cls()
+        index._add(frame)
+        return index
+
+    def append(self, frame: pd.DataFrame) -> "StatementIndex":
+        """A new index that also covers the transactions in frame; this one is left unchanged."""
+        index = StatementIndex()
+        index._categories = self._categories
+        index._first_month = self._first_month
+        index._cube = {column: cube.copy() for column, cube in self._cube.items()}
+        index._counts = self._counts.copy()
+        index._totals = {column: totals.copy() for column, totals in self._totals.items()}
+        index._largest = self._largest
+        index._add(frame)
+        return index
+
+    def _add(self, frame: pd.DataFrame) -> None:
+        categories = frame['Category'].astype('category').cat.remove_unused_categories()
+        new = categories.cat.categories.difference(self._categories, sort=False)
+        self._categories = self._categories.append(pd.Index(new.astype(object)))
+        category_codes = categories.cat.codes.to_numpy()
+        labelled = category_codes >= 0
+        codes = self._categories.get_indexer(categories.cat.categories)[category_codes[labelled]]
+
+        months = _month_numbers(frame['Date'])[labelled]
+        dated = ~np.isnan(months)
+        old_first, old_shape = self._first_month, self._counts.shape
+        first, last = old_first, None if old_first is None else old_first + old_shape[1] - 1
+        if dated.any():
+            low, high = int(months[dated].min()), int(months[dated].max())
+            first = low if first is None else min(first, low)
+            last = high if last is None else max(last, high)
+        self._first_month = first
+        shape = (len(self._categories), 0 if first is None else last - first + 1)
+
+        # Grow the cube to the new categories and month range, keeping the existing cells
+        def grow(array, dtype=float):
+            grown = np.zeros(shape, dtype=dtype)
+            if array.size:
+                offset = old_first - first
+                grown[:old_shape[0], offset:offset + old_shape[1]] = array
+            return grown
+
+        cells = codes[dated] * shape[1] + (months[dated] - (first or 0)).astype(np.int64)
+        size = shape[0] * shape[1]
+        self._counts = grow(self._counts, np.int64) + np.bincount(cells, minlength=size).reshape(shape)
+        for column in AMOUNT_COLUMNS:
+            amounts = np.nan_to_num(frame[column].to_numpy(dtype=float))[labelled]
+            self._cube[column] = grow(self._cube[column]) + \
+                np.bincount(cells, weights=amounts[dated], minlength=size).reshape(shape)
+            totals = np.zeros(shape[0])
+            totals[:old_shape[0]] = self._totals[column]
+            self._totals[column] = totals + np.bincount(codes, weights=amounts, minlength=shape[0])
+
+        spending = frame[frame['Withdrawals'] > 0]
+        if 'Summary' in spending.columns:
+            # Monthly totals of a summarized statement are not transactions
+            spending = spending[~spending['Summary']]
+        candidates = spending.nlargest(LARGEST_TRANSACTIONS, 'Withdrawals')[TRANSACTION_COLUMNS]
+        candidates = candidates.assign(Category=candidates['Category'].astype(object))
+        if not self._largest.empty:
+            candidates = pd.concat([self._largest, candidates], ignore_index=True)
+        self._largest = candidates.nlargest(LARGEST_TRANSACTIONS, 'Withdrawals').reset_index(drop=True)
+        self._rolling = {}
+
+    @property
+    def categories(self) -> pd.Index:
+        return self._categories
+
+    @property
+    def months(self) -> pd.PeriodIndex:
+        if self._first_month is None:
+            return pd.PeriodIndex([], freq='M')
+        first = pd.Period(year=self._first_month // 12, month=self._first_month % 12 + 1, freq='M')
+        return pd.period_range(first, periods=self._counts.shape[1], freq='M')
+
+    @property
+    def largest(self) -> pd.DataFrame:
+        """The LARGEST_TRANSACTIONS largest withdrawals, largest first (ties in statement order)."""
+        return self._largest
+
+    def total(self, column: str = 'Withdrawals') -> float:
+        return float(self._totals[column].sum())
+
+    def category_totals(self, column: str = 'Withdrawals') -> pd.Series:
+        """Totals per category, ordered by category name."""
+        return pd.Series(self._totals[column], index=self._categories, name=column).sort_index()
+
+    def cube(self, column: str = 'Withdrawals') -> pd.DataFrame:
+        """Categories (by name) x months frame of column totals; 'Count' gives transaction counts."""
+        values = self._counts if column == 'Count' else self._cube[column]
+        return pd.DataFrame(values, index=self._categories, columns=self.months).sort_index()
+
+    def monthly_totals(self, column: str = 'Withdrawals') -> pd.Series:
+        values = self._counts if column == 'Count' else self._cube[column]
+        return pd.Series(values.sum(axis=0), index=self.months, name=column)
+
+    def rolling_mean(self, months: int = 3, column: str = 'Withdrawals') -> pd.DataFrame:
+        """
+        Trailing mean over the last `months` calendar months for every category and month.
+
+        Months before a full window are averaged over the months available.
+        """
+        if months < 1:
+            raise ValueError("months must be at least 1")
+        key = (column, months)
+        if key not in self._rolling:
+            values = self._cube[column]
+            cumulative = np.cumsum(values, axis=1)
+            windowed = cumulative.copy()
+            windowed[:, months:] -= cumulative[:, :-months]
+            span = np.minimum(np.arange(1, values.shape[1] + 1), months)
+            self._rolling[key] = pd.DataFrame(windowed / span, index=self._categories, columns=self.months).sort_index()
+        return self._rolling[key]
@@ -0,0 +1,363 @@
+"""
+Bank statement ingestion for the AI Budgeting Assistant.
+
+Turns an uploaded statement DataFrame into clean, validated columns in a
+handful of vectorized passes: column layout mapping (Debit/Credit or
+Withdrawals/Deposits), currency string cleanup, date parsing and
+validation of the whole frame, instead of converting row by row.
+
+Parsed uploads are kept in a bounded cache keyed by the file's content
+hash, so Streamlit reruns (every widget interaction) and other sessions
+uploading the same file reuse the parsed statement instead of reading the
+CSV again.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import IO, Any, Dict, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from app.api.models import BankStatement
+from app.core.config import get_statement_cache_settings, get_statement_memory_limit_mb
+from .metrics import STATEMENT_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ['Date', 'Description', 'Category']
+AMOUNT_COLUMNS = ['Withdrawals', 'Deposits']
+
+# Alternative headers used by bank exports, mapped onto the names the app uses
+COLUMN_ALIASES = {
+    'debit': 'Withdrawals',
+    'debits': 'Withdrawals',
+    'withdrawal': 'Withdrawals',
+    'withdrawals': 'Withdrawals',
+    'credit': 'Deposits',
+    'credits': 'Deposits',
+    'deposit': 'Deposits',
+    'deposits': 'Deposits',
+    'date': 'Date',
+    'description': 'Description',
+    'category': 'Category',
+    'balance': 'Balance',
+}
+
+# Number of offending rows quoted in validation errors
+MAX_REPORTED_ROWS = 5
+
+# Rough in-memory size of one parsed statement row (object strings, floats, dates
+# and normalization temporaries) and of a parsed DataFrame relative to its CSV text
+BYTES_PER_PARSED_ROW = 2048
+CSV_MEMORY_EXPANSION = 8
+
+# Largest individual withdrawals kept as their own rows when a statement is aggregated
+TOP_TRANSACTIONS = 25
+
+def _describe_rows(mask: pd.Series) -> str:
+    # Index labels are CSV row numbers (also across read_csv chunks); +2 for the header and 1-based lines
+    labels = mask.index[mask.to_numpy().nonzero()[0][:MAX_REPORTED_ROWS]]
+    rows = [str(label + 2) if isinstance(label, (int, np.integer)) else str(label) for label in labels]
+    more = int(mask.sum()) - len(rows)
+    return ", ".join(rows) + (f" and {more} more" if more > 0 else "")
+
+def map_statement_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Rename known header variants (e.g. Debit/Credit) to the canonical column names."""
+    renames = {}
+    for column in df.columns:
+        canonical = COLUMN_ALIASES.get(str(column).strip().lower())
+        if canonical and canonical not in renames.values() and canonical not in df.columns:
+            renames[column] = canonical
+    return df.rename(columns=renames)
+
+def _parse_unique(series: pd.Series, parse) -> pd.Series:
+    """Apply a vectorized parser to the distinct values of a column and broadcast back."""
+    codes, uniques = pd.factorize(series)
+    parsed = parse(pd.Series(uniques, dtype=object))
+    values = parsed.to_numpy()[codes]
+    result = pd.Series(values, index=series.index, name=series.name)
+    result[codes == -1] = None  # factorize marks missing values with -1
+    return result
+
+def clean_currency(series: pd.Series) -> pd.Series:
+    """Parse values like "$1,234.50" or "(20.00)" to floats; blanks become NaN."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+
+    def parse(text):
+        text = text.astype(str).str.strip()
+        negative = text.str.startswith("(") & text.str.endswith(")")
+        values = pd.to_numeric(text.str.replace(r"[\$,()\s]", "", regex=True), errors="coerce")
+        return values.where(~negative, -values)
+
+    text = series.where(series.astype(str).str.strip() != "")
+    values = _parse_unique(text, parse).astype(float)
+
+    invalid = values.isna() & text.notna()
+    if invalid.any():
+        raise ValueError(f"Invalid amount in column '{series.name}' on line(s) {_describe_rows(invalid)}")
+    return values
+
+def parse_dates(series: pd.Series) -> pd.Series:
+    """Parse a date column, converting each distinct value once and retrying mixed formats per value."""
+    def parse(values):
+        dates = pd.to_datetime(values, errors="coerce")
+        retry = dates.isna() & values.notna()
+        if retry.any():
+            dates[retry] = pd.to_datetime(values[retry], errors="coerce", format="mixed")
+        return dates
+
+    dates = pd.to_datetime(_parse_unique(series, parse))
+    invalid = dates.isna()
+    if invalid.any():
+        raise ValueError(f"Invalid date on line(s) {_describe_rows(invalid)}")
+    return dates.dt.normalize()
+
+def normalize_statement(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Validate and normalize an uploaded bank statement in vectorized passes.
+
+    Args:
+        df (pd.DataFrame): The statement as read from the CSV upload.
+
+    Returns:
+        pd.DataFrame: Date (datetime64), Description, Category, Withdrawals and
+        Deposits (floats, missing amounts as 0), plus Balance when present.
+
+    Raises:
+        ValueError: If required columns are missing or dates/amounts cannot be parsed.
+    """
+    df = map_statement_columns(df)
+
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_columns:
+        raise ValueError(f"Bank statement is missing required columns: {', '.join(missing_columns)}")
+    if df.empty:
+        raise ValueError("Bank statement must not be empty")
+
+    normalized = pd.DataFrame({
+        'Date': parse_dates(df['Date']),
+        'Description': df['Description'].fillna("").astype(str),
+        'Category': df['Category'].fillna("Uncategorized").astype(str).str.strip(),
+    })
+    for col in AMOUNT_COLUMNS:
+        normalized[col] = clean_currency(df[col]).fillna(0.0) if col in df.columns else 0.0
+    if 'Balance' in df.columns:
+        normalized['Balance'] = clean_currency(df['Balance'])
+
+    return normalized
+
+def _source_size(source: Union[str, IO]) -> int:
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    if getattr(source, "size", None) is not None:  # Streamlit UploadedFile
+        return source.size
+    position = source.tell()
+    size = source.seek(0, os.SEEK_END)
+    source.seek(position)
+    return size
+
+def aggregate_statement_chunks(chunks, top_n: int = TOP_TRANSACTIONS) -> pd.DataFrame:
+    """
+    Reduce an iterable of raw statement chunks to per-category, per-month totals.
+
+    Each chunk is normalized and folded into running category x month sums, so
+    memory stays bounded by the chunk size plus the number of distinct
+    category-months. The top_n largest withdrawals are kept as individual rows
+    (and left out of their month's total), so statement-wide and per-category
+    totals are unchanged.
+
+    Returns:
+        pd.DataFrame: A statement in the normalize_statement layout with one
+        row per category-month (dated the first of the month) plus the largest
+        transactions, and a boolean Summary column marking the monthly totals.
+    """
+    totals = None
+    top = None
+    for chunk in chunks:
+        chunk = normalize_statement(chunk)
+        month = chunk['Date'].dt.to_period('M').dt.to_timestamp().rename('Month')
+        grouped = chunk.groupby(['Category', month]).agg(
+            Withdrawals=('Withdrawals', 'sum'), Deposits=('Deposits', 'sum'), Count=('Withdrawals', 'size')
+        )
+        totals = grouped if totals is None else totals.add(grouped, fill_value=0)
+
+        largest = chunk.nlargest(top_n, 'Withdrawals')[['Date', 'Description', 'Category', 'Withdrawals', 'Deposits']]
+        top = largest if top is None else pd.concat([top, largest]).nlargest(top_n, 'Withdrawals')
+
+    if totals is None:
+        raise ValueError("Bank statement must not be empty")
+
+    top = top[top['Withdrawals'] > 0]
+    if not top.empty:
+        month = top['Date'].dt.to_period('M').dt.to_timestamp().rename('Month')
+        kept = top.groupby(['Category', month]).agg(
+            Withdrawals=('Withdrawals', 'sum'), Deposits=('Deposits', 'sum'), Count=('Withdrawals', 'size')
+        )
+        totals = totals.sub(kept, fill_value=0)
+
+    totals = totals[totals['Count'] > 0].reset_index()
+    summary = pd.DataFrame({
+        'Date': totals['Month'],
+        'Description': totals['Count'].astype(int).map(lambda count: f"{count} transactions (monthly total)"),
+        'Category': totals['Category'],
+        'Withdrawals': totals['Withdrawals'].round(2),
+        'Deposits': totals['Deposits'].round(2),
+        'Summary': True,
+    })
+    top = top.assign(Summary=False)
+    return pd.concat([summary, top], ignore_index=True).sort_values('Date', kind='stable').reset_index(drop=True)
+
+def load_statement(source: Union[str, IO], memory_limit_mb: float = None) -> Tuple[pd.DataFrame, bool]:
+    """
+    Read and normalize a CSV statement within a memory ceiling.
+
+    Statements whose parsed size would fit under memory_limit_mb are loaded
+    whole. Larger ones are streamed in chunks sized to the ceiling (memory-mapped
+    when source is a path) and reduced by aggregate_statement_chunks.
+
+    Args:
+        source (str or file-like): CSV path or uploaded file.
+        memory_limit_mb (float): Ceiling in MB; defaults to STATEMENT_MEMORY_LIMIT_MB.
+
+    Returns:
+        tuple: (normalized statement DataFrame, True if it was aggregated).
+    """
+    if memory_limit_mb is None:
+        memory_limit_mb = get_statement_memory_limit_mb()
+    limit_bytes = memory_limit_mb * 1024 * 1024
+    read_options = {"memory_map": True} if isinstance(source, (str, os.PathLike)) else {}
+
+    if _source_size(source) * CSV_MEMORY_EXPANSION <= limit_bytes:
+        return normalize_statement(pd.read_csv(source, **read_options)), False
+
+    chunk_rows = max(int(limit_bytes // BYTES_PER_PARSED_ROW), 1000)
+    with pd.read_csv(source, chunksize=chunk_rows, **read_options) as reader:
+        return aggregate_statement_chunks(reader), True
+
+# Rows of a parsed upload kept for the preview shown under the uploader
+PREVIEW_ROWS = 5
+
+def content_hash(source: Union[str, IO]) -> str:
+    """SHA-256 of a CSV path or uploaded file's bytes, leaving a file's position unchanged."""
+    digest = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    elif hasattr(source, "getvalue"):  # Streamlit UploadedFile, BytesIO
+        digest.update(source.getvalue())
+    else:
+        position = source.tell()
+        source.seek(0)
+        data = source.read()
+        source.seek(position)
+        digest.update(data.encode() if isinstance(data, str) else data)
+    return digest.hexdigest()
+
+class LoadedStatement:
+    """
+    A parsed upload and what the UI derives from it.
+
+    Shared between every rerun and session that uploads the same file, so
+    treat it as read-only. The statement's fingerprint, which keys the chart
+    caches, and its aggregate index are computed up front.
+    """
+
+    def __init__(self, frame: pd.DataFrame, summarized: bool):
+        self.statement = BankStatement.from_frame(frame)
+        self.statement.fingerprint()
+        self.statement.aggregates()
+        self.summarized = summarized
+        self.rows = len(frame)
+        self.preview = frame.head(PREVIEW_ROWS)
+        self.nbytes = int(self.statement.to_frame().memory_usage(deep=True).sum())
+
+class StatementCache:
+    """
+    LRU of LoadedStatement objects keyed by upload content hash.
+
+    Args:
+        max_entries (int): Maximum number of cached statements; 0 disables the cache.
+        max_memory_mb (float): Cap on the cached statements' size in MB; 0 disables it.
+    """
+
+    def __init__(self, max_entries: int = 8, max_memory_mb: float = 0):
+        self.max_entries = max_entries
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self._entries: "OrderedDict[Tuple[str, float], LoadedStatement]" = OrderedDict()
+        self._load_locks: Dict[Tuple[str, float], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def load(self, source: Union[str, IO], memory_limit_mb: float = None) -> LoadedStatement:
+        """The parsed statement for source, reading it with load_statement on a miss."""
+        limit = get_statement_memory_limit_mb() if memory_limit_mb is None else memory_limit_mb
+        if self.max_entries <= 0:
+            return LoadedStatement(*load_statement(source, limit))
+
+        key = (content_hash(source), limit)
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Concurrent sessions uploading the same file parse it once
+        with load_lock:
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    return entry
+            STATEMENT_CACHE_REQUESTS.inc(result="miss")
+            try:
+                entry = LoadedStatement(*load_statement(source, limit))
+            except BaseException:
+                with self._lock:
+                    self._load_locks.pop(key, None)
+                raise
+            # Publish the entry and retire the load lock together, so no session can miss both
+            with self._lock:
+                self._entries[key] = entry
+                self._evict_if_needed()
+                self._load_locks.pop(key, None)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "cached_mb": round(self._cached_bytes() / (1024 * 1024), 2),
+            }
+
+    def _lookup(self, key: Tuple[str, float]) -> Optional[LoadedStatement]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            STATEMENT_CACHE_REQUESTS.inc(result="hit")
+        return entry
+
+    def _cached_bytes(self) -> int:
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    def _evict_if_needed(self) -> None:
+        # Oldest first; a statement larger than the whole memory cap is not kept at all
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_memory_bytes and self._cached_bytes() > self.max_memory_bytes)
+        ):
+            key, _ = self._entries.popitem(last=False)
+            logger.info(f"Evicted parsed statement {key[0][:12]} from the statement cache")
+
+statement_cache = StatementCache(**get_statement_cache_settings())
+
+def load_statement_cached(source: Union[str, IO], memory_limit_mb: float = None) -> LoadedStatement:
+    """load_statement through the shared statement_cache."""
+    return statement_cache.load(source, memory_limit_mb)
@@ -10,11 +10,14 @@ follow-up questions.
 
 import json
 import re
+import time
 import pandas as pd
 import streamlit as st
-from app.api.models import UserDataInput  
+from app.api.models import UserDataInput, BankStatement
 import logging
 from app.services.recommender import generate_advice_stream
+from app.services.budget_engine import budget_total, compute_budget, format_budget, parse_proposal
+from app.services.metrics import summarize as summarize_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -29,38 +32,233 @@ def clean_text(text):
     cleaned_lines = [line for line in cleaned_lines if line]
     return '\n\n'.join(cleaned_lines)
 
-def extract_budget_json(complete_advice):
-    start_marker = "---BUDGET_JSON_START---"
-    end_marker = "---BUDGET_JSON_END---"
-    
-    try:
-        start_index = complete_advice.index(start_marker) + len(start_marker)
-        end_index = complete_advice.index(end_marker, start_index)
-        budget_json_part = complete_advice[start_index:end_index].strip()
-        
+BUDGET_JSON_START = "---BUDGET_JSON_START---"
+
+class IncrementalAdviceRenderer:
+    """
+    Renders streamed advice without reprocessing the whole response per chunk.
+
+    Produces the same text as splitting off the budget JSON, inserting the
+    budgeting constraints after the "Financial Goals:" paragraph and applying
+    clean_text and escape_dollar_signs to the full response, but only the new
+    suffix of each chunk is processed: finished lines are cleaned and escaped
+    once and kept, and only the trailing partial line is re-examined.
+
+    Args:
+        constraints (list): The user's budgeting constraints.
+        flush_interval (float): Minimum seconds between placeholder updates.
+        flush_chars (int): Characters of new text that force an update sooner.
+    """
+
+    def __init__(self, constraints=None, flush_interval=0.05, flush_chars=2000):
+        self.constraints = constraints or []
+        self.flush_interval = flush_interval
+        self.flush_chars = flush_chars
+        self._lines = []
+        self._pending = ""
+        self._budget_reached = False
+        self._goals_seen = False
+        self._constraints_inserted = False
+        self._last_flush = 0.0
+        self._unflushed_chars = 0
+
+    def feed(self, chunk):
+        """Add a streamed chunk; text after the budget JSON marker is ignored."""
+        if self._budget_reached or not chunk:
+            return
+        self._unflushed_chars += len(chunk)
+        # The pending partial line is kept raw, so a marker split across chunks is still found
+        self._pending += chunk
+        marker_index = self._pending.find(BUDGET_JSON_START)
+        if marker_index != -1:
+            self._pending = self._pending[:marker_index]
+            self._budget_reached = True
+
+        *complete_lines, self._pending = self._pending.split('\n')
+        for line in complete_lines:
+            self._add_line(line)
+
+    def _add_line(self, line):
+        # An empty line ends the goals paragraph: that is where the constraints go
+        if line == "" and self._goals_seen and not self._constraints_inserted:
+            self._constraints_inserted = True
+            self._append("Budgeting Constraints:")
+            for constraint in self.constraints:
+                self._append(f"• {constraint}")
+        if not self._goals_seen and "Financial Goals:" in line:
+            self._goals_seen = True
+        self._append(line)
+
+    def _append(self, line):
+        cleaned = re.sub(r'\s+', ' ', line).strip()
+        if cleaned:
+            self._lines.append(escape_dollar_signs(cleaned))
+
+    @property
+    def budget_reached(self):
+        return self._budget_reached
+
+    def text(self):
+        """The cleaned, escaped markdown for everything received so far."""
+        pending = escape_dollar_signs(re.sub(r'\s+', ' ', self._pending).strip())
+        return '\n\n'.join(self._lines + [pending] if pending else self._lines)
+
+    def flush(self, placeholder, force=False):
+        """Render to the placeholder if the time/size budget has elapsed (or force is set)."""
+        now = time.monotonic()
+        if not force and self._unflushed_chars < self.flush_chars and now - self._last_flush < self.flush_interval:
+            return False
+        placeholder.markdown(self.text())
+        self._last_flush = now
+        self._unflushed_chars = 0
+        return True
+
+def render_advice_text(complete_advice, constraints=None):
+    """Display text for a complete advice response."""
+    renderer = IncrementalAdviceRenderer(constraints)
+    renderer.feed(complete_advice)
+    return renderer.text()
+
+class BudgetStreamParser:
+    """
+    Incrementally extracts the proposed budget while the advice is streaming.
+
+    Once BUDGET_JSON_START appears, the JSON that follows is scanned as it
+    arrives (each character once). Every category entry is parsed as soon
+    as its value closes, so the budget table can fill in progressively, and
+    structural problems (a missing opening brace, mismatched brackets, an
+    entry that is not valid JSON) are flagged immediately via `malformed`
+    instead of after the whole response has been generated. Both the
+    {"Proposed Monthly Budget": {...}} wrapper and a bare category object
+    are accepted, as are Markdown code fences around the JSON.
+    """
+
+    BUDGET_KEY = "Proposed Monthly Budget"
+
+    def __init__(self):
+        self.categories = {}
+        self.error = None
+        self.complete = False
+        self._marker_buffer = ""
+        self._json = None
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._container_depth = None
+        self._pair_start = None
+        self._after_fence = False
+
+    @property
+    def started(self):
+        return self._json is not None
+
+    @property
+    def malformed(self):
+        return self.error is not None
+
+    def feed(self, chunk):
+        """Consume a streamed chunk and return the categories completed by it as (name, details) pairs."""
+        if self.complete or self.malformed or not chunk:
+            return []
+        if self._json is None:
+            self._marker_buffer += chunk
+            marker_index = self._marker_buffer.find(BUDGET_JSON_START)
+            if marker_index == -1:
+                # Keep just enough text to recognise a marker split across chunks
+                self._marker_buffer = self._marker_buffer[-(len(BUDGET_JSON_START) - 1):]
+                return []
+            chunk = self._marker_buffer[marker_index + len(BUDGET_JSON_START):]
+            self._marker_buffer = ""
+            self._json = ""
+        self._json += chunk
+        return self._scan()
+
+    def _fail(self, message):
+        self.error = message
+        logger.error(f"Malformed budget JSON: {message}")
+
+    def _emit_pair(self, end, completed):
+        pair_text = self._json[self._pair_start:end].strip()
+        self._pair_start = end + 1
+        if not pair_text:
+            return
         try:
-            budget_data = json.loads(budget_json_part)
-            if "Proposed Monthly Budget" in budget_data:
-                return budget_data["Proposed Monthly Budget"]
-            else:
-                return budget_data
+            pair = json.loads("{" + pair_text + "}")
         except json.JSONDecodeError as e:
-            logger.error(f"Error parsing budget JSON: {e}")
-            logger.debug(f"Attempted to parse: {budget_json_part}")
-            return None
-    except ValueError:
-        logger.warning("Budget JSON markers not found in the advice")
-        return None
+            self._fail(f"invalid budget entry {pair_text[:80]!r}: {e.msg}")
+            return
+        for category, details in pair.items():
+            self.categories[category] = details
+            completed.append((category, details))
 
-def create_budget_dataframe(budget_data, bank_statement, current_income):
-    if not isinstance(budget_data, dict):
-        st.warning("Invalid budget data format. Expected a dictionary.")
-        return pd.DataFrame()
+    def _scan(self):
+        completed = []
+        text = self._json
+        for index in range(self._pos, len(text)):
+            if self.malformed or self.complete:
+                break
+            char = text[index]
+            depth = len(self._stack)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if depth == 1 and self._container_depth is None:
+                        # The first top-level key decides whether the categories are wrapped
+                        key = json.loads(text[self._string_start:index + 1])
+                        self._container_depth = 2 if key == self.BUDGET_KEY else 1
+                continue
+
+            if char.isspace():
+                continue
+            if depth == 0:
+                if char == '{':
+                    self._stack.append('}')
+                    self._pair_start = index + 1
+                elif char == '`' or (char.isalpha() and self._after_fence):
+                    self._after_fence = True
+                else:
+                    self._fail(f"expected '{{' after {BUDGET_JSON_START}, found {char!r}")
+                continue
 
-    # Convert bank_statement to DataFrame if it's a list
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char in '{[':
+                self._stack.append('}' if char == '{' else ']')
+                if len(self._stack) == 2 and self._container_depth == 2:
+                    if char != '{':
+                        self._fail(f"'{self.BUDGET_KEY}' must be an object")
+                    self._pair_start = index + 1
+            elif char in '}]':
+                if char != self._stack[-1]:
+                    self._fail(f"mismatched {char!r}")
+                    continue
+                if depth == self._container_depth:
+                    self._emit_pair(index, completed)
+                    self._container_depth = 0  # Later top-level keys are not categories
+                self._stack.pop()
+                if not self._stack:
+                    self.complete = True
+            elif char == ',' and depth == self._container_depth:
+                self._emit_pair(index, completed)
+        self._pos = len(text)
+        return completed
+
+def previous_spend_by_category(bank_statement):
+    """Withdrawals per category of a statement given as a DataFrame or a list of transaction dicts."""
     if isinstance(bank_statement, list):
         bank_statement = pd.DataFrame(bank_statement)
 
+    if 'Category' not in bank_statement.columns or 'Withdrawals' not in bank_statement.columns:
+        bank_statement = bank_statement.copy()
+
     # Check if 'Category' column exists, if not, use a default category
     if 'Category' not in bank_statement.columns:
         st.warning("'Category' column not found in bank statement. Using 'Uncategorized' for all entries.")
@@ -69,96 +267,44 @@ def create_budget_dataframe(budget_data, bank_statement, current_income):
     # Check if 'Withdrawals' column exists, if not, use 'Amount' or create a default
     if 'Withdrawals' not in bank_statement.columns:
         if 'Amount' in bank_statement.columns:
-            bank_statement['Withdrawals'] = bank_statement['Amount'].apply(lambda x: abs(float(x)) if x < 0 else 0)
+            bank_statement['Withdrawals'] = (-pd.to_numeric(bank_statement['Amount'], errors='coerce')).clip(lower=0).fillna(0)
         else:
             st.warning("'Withdrawals' or 'Amount' column not found. Using 0 for all entries.")
             bank_statement['Withdrawals'] = 0
 
-    previous_spend = bank_statement.groupby('Category')['Withdrawals'].sum().to_dict()
-
-    rows = []
-    total_proposed = 0
-    for category, details in budget_data.items():
-        if isinstance(details, dict):
-            try:
-                proposed_change = float(details.get('proposed_change', 0))
-            except ValueError:
-                st.warning(f"Invalid proposed change for {category}. Using 0.")
-                proposed_change = 0
-            change_reason = details.get('change_reason', '')
-        elif isinstance(details, (int, float)):
-            proposed_change = float(details)
-            change_reason = ''
-        else:
-            st.warning(f"Invalid data for {category}. Skipping this category.")
-            continue
-
-        previous = float(previous_spend.get(category, 0))
-        
-        # Calculate the new proposed amount
-        new_amount = previous + proposed_change
-        
-        # Calculate percentage change
-        if previous != 0:
-            percent_change = ((new_amount - previous) / previous) * 100
-        else:
-            percent_change = float('inf') if new_amount > 0 else 0
-        
-        rows.append({
-            'Category': category,
-            'Previous Spend': previous,
-            'Proposed Change': new_amount,
-            'Percent Change': percent_change,
-            'Change Reason': change_reason
-        })
-        total_proposed += new_amount
-
-    # Adjust proposed changes if they exceed current income
-    if total_proposed > current_income:
-        adjustment_factor = current_income / total_proposed
-        for row in rows:
-            row['Proposed Change'] *= adjustment_factor
-            row['Percent Change'] = ((row['Proposed Change'] - row['Previous Spend']) / row['Previous Spend']) * 100 if row['Previous Spend'] != 0 else float('inf')
-
-    # Add savings category if not present
-    if 'Savings' not in [row['Category'] for row in rows]:
-        savings_amount = current_income - sum(row['Proposed Change'] for row in rows)
-        previous_savings = float(previous_spend.get('Savings', 0))
-        percent_change = ((savings_amount - previous_savings) / previous_savings) * 100 if previous_savings != 0 else float('inf')
-        rows.append({
-            'Category': 'Savings',
-            'Previous Spend': previous_savings,
-            'Proposed Change': savings_amount,
-            'Percent Change': percent_change,
-            'Change Reason': 'Allocated remaining amount to savings'
-        })
-
-    df = pd.DataFrame(rows)
+    return bank_statement.groupby('Category', observed=True)['Withdrawals'].sum()
 
-    if df.empty:
-        st.warning("No valid budget data available to display.")
-        return df
-
-    for col in ['Previous Spend', 'Proposed Change']:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
+def create_budget_dataframe(budget_data, bank_statement, current_income):
+    if not isinstance(budget_data, dict):
+        st.warning("Invalid budget data format. Expected a dictionary.")
+        return pd.DataFrame()
 
-    df = df.sort_values('Percent Change', key=abs, ascending=False).reset_index(drop=True)
+    if isinstance(bank_statement, BankStatement):
+        # Per-category totals from the statement's aggregate index
+        previous_spend = bank_statement.category_totals('Withdrawals')
+    else:
+        previous_spend = previous_spend_by_category(bank_statement)
 
-    for col in ['Previous Spend', 'Proposed Change']:
-        df[col] = df[col].apply(lambda x: f"${x:,.2f}" if pd.notnull(x) else "$0.00")
-    
-    df['Percent Change'] = df['Percent Change'].apply(lambda x: f"{x:,.2f}%" if pd.notnull(x) else "N/A")
+    proposal, invalid, skipped = parse_proposal(budget_data)
+    for category in invalid:
+        st.warning(f"Invalid proposed change for {category}. Using 0.")
+    for category in skipped:
+        st.warning(f"Invalid data for {category}. Skipping this category.")
 
+    # Numeric frame; amounts and percentages are only formatted for display and export
+    df = compute_budget(proposal, previous_spend, current_income)
+    if df.empty:
+        st.warning("No valid budget data available to display.")
     return df
 
 def display_budget_table(df, current_income):
     st.subheader(f"Proposed Monthly Budget (Total Income: ${current_income:.2f})")
     
     # Calculate total proposed spend
-    total_proposed = df['Proposed Change'].apply(lambda x: float(x.replace('$', '').replace(',', ''))).sum()
+    total_proposed = budget_total(df)
     
     # Display the table
-    st.table(df[['Category', 'Previous Spend', 'Proposed Change', 'Percent Change', 'Change Reason']])
+    st.table(format_budget(df))
     
     # Display total proposed spend
     st.write(f"Total Proposed Spend: ${total_proposed:.2f}")
@@ -168,7 +314,7 @@ def display_budget_table(df, current_income):
     st.write(f"Remaining Budget: ${remaining_budget:.2f}")
 
 def create_budget_download(df):
-    csv = df.to_csv(index=False)
+    csv = format_budget(df).to_csv(index=False)
     st.download_button(
         label="Download Budget as CSV",
         data=csv,
@@ -181,6 +327,14 @@ def display_conclusion(complete_advice):
     if conclusion:
         st.markdown(escape_dollar_signs(conclusion.group()))
 
+def display_partial_budget(budget_placeholder, budget_data, inputs: UserDataInput):
+    """Show the categories received so far while the budget JSON is still streaming."""
+    with budget_placeholder.container():
+        st.subheader("Proposed Budget (in progress...)")
+        df = create_budget_dataframe(budget_data, inputs.bank_statement, inputs.current_income)
+        if not df.empty:
+            st.table(format_budget(df))
+
 def generate_advice_ui(inputs: UserDataInput):
     st.subheader("Financial Analysis and Proposed Budget")
     
@@ -200,7 +354,9 @@ def generate_advice_ui(inputs: UserDataInput):
     try:
         # Generate or display advice
         if not st.session_state.analysis_generated or st.session_state.regenerate:
-            complete_advice = ""
+            advice_chunks = []
+            renderer = IncrementalAdviceRenderer(inputs.constraints)
+            budget_parser = BudgetStreamParser()
             
             # Acknowledge the follow-up question if it exists
             if st.session_state.follow_up_question:
@@ -208,60 +364,48 @@ def generate_advice_ui(inputs: UserDataInput):
             
             with st.spinner("Generating personalized financial analysis and proposed budget..."):
                 for chunk in generate_advice_stream(inputs, st.session_state.follow_up_question):
-                    complete_advice += chunk
-                    display_text = complete_advice.split("---BUDGET_JSON_START---")[0]
-                    
-                    # Insert Budgeting Constraints after Financial Goals
-                    goals_index = display_text.find("Financial Goals:")
-                    if goals_index != -1:
-                        next_section_index = display_text.find("\n\n", goals_index)
-                        if next_section_index != -1:
-                            constraints_text = "\n\nBudgeting Constraints:\n"
-                            for constraint in inputs.constraints:
-                                constraints_text += f"• {constraint}\n"
-                            display_text = display_text[:next_section_index] + constraints_text + display_text[next_section_index:]
-                    
-                    advice_placeholder.markdown(escape_dollar_signs(clean_text(display_text)))
+                    advice_chunks.append(chunk)
+                    renderer.feed(chunk)
+                    renderer.flush(advice_placeholder)
+
+                    was_malformed = budget_parser.malformed
+                    if budget_parser.feed(chunk) and not budget_parser.complete:
+                        display_partial_budget(budget_placeholder, budget_parser.categories, inputs)
+                    if budget_parser.malformed and not was_malformed:
+                        # The parser ignores the rest of the JSON; keep streaming for the narrative that follows it
+                        logger.warning(f"Malformed budget JSON in the advice: {budget_parser.error}")
+                        budget_placeholder.empty()
+                renderer.flush(advice_placeholder, force=True)
+            logger.info(f"Advice pipeline metrics: {summarize_metrics()}")
             
+            complete_advice = "".join(advice_chunks)
             st.session_state.complete_advice = complete_advice
             st.session_state.regenerate = False
             st.session_state.analysis_generated = True
         else:
             complete_advice = st.session_state.complete_advice
-            display_text = complete_advice.split("---BUDGET_JSON_START---")[0]
-            
-            # Insert Budgeting Constraints after Financial Goals
-            goals_index = display_text.find("Financial Goals:")
-            if goals_index != -1:
-                next_section_index = display_text.find("\n\n", goals_index)
-                if next_section_index != -1:
-                    constraints_text = "\n\nBudgeting Constraints:\n"
-                    for constraint in inputs.constraints:
-                        constraints_text += f"• {constraint}\n"
-                    display_text = display_text[:next_section_index] + constraints_text + display_text[next_section_index:]
-            
-            advice_placeholder.markdown(escape_dollar_signs(clean_text(display_text)))
+            advice_placeholder.markdown(render_advice_text(complete_advice, inputs.constraints))
+            budget_parser = BudgetStreamParser()
+            budget_parser.feed(complete_advice)
 
         # Display budget
-        budget_data = extract_budget_json(complete_advice)
-        if budget_data:
-            budget_data = budget_data.get("Proposed Monthly Budget", budget_data)
-            if isinstance(budget_data, dict):
-                bank_statement = pd.DataFrame([entry.dict() for entry in inputs.bank_statement])
-                df = create_budget_dataframe(budget_data, bank_statement, inputs.current_income)
-                if not df.empty:
-                    budget_placeholder.empty()
-                    with budget_placeholder.container():
-                        if st.session_state.regenerated_once:
-                            st.subheader("Updated Proposed Budget")
-                        else:
-                            st.subheader("Proposed Budget")
-                        display_budget_table(df, inputs.current_income)
-                        create_budget_download(df)
-                else:
-                    st.warning("Unable to create budget table from the provided data.")
+        if budget_parser.malformed:
+            budget_placeholder.empty()
+            st.warning(f"The proposed budget in the AI response was malformed ({budget_parser.error}). Please try generating the analysis again.")
+        elif budget_parser.complete and budget_parser.categories:
+            budget_data = budget_parser.categories
+            df = create_budget_dataframe(budget_data, inputs.bank_statement, inputs.current_income)
+            if not df.empty:
+                budget_placeholder.empty()
+                with budget_placeholder.container():
+                    if st.session_state.regenerated_once:
+                        st.subheader("Updated Proposed Budget")
+                    else:
+                        st.subheader("Proposed Budget")
+                    display_budget_table(df, inputs.current_income)
+                    create_budget_download(df)
             else:
-                st.warning("Invalid budget data structure.")
+                st.warning("Unable to create budget table from the provided data.")
         else:
             st.warning("No budget data found in the advice. This might be due to an incomplete AI response or formatting issue.")
             logger.warning(f"Complete advice without budget data: {complete_advice}")
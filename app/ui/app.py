@@ -27,6 +27,7 @@ from app.ui.input_handlers import handle_inputs
 from app.ui.advice import generate_advice_ui
 from app.api.models import UserDataInput
 from app.services.recommender import generate_advice_stream
+from app.services.model_registry import warm_up_models
 
 # Set page config as the first Streamlit command
 st.set_page_config(page_title="AI Budgeting Assistant", page_icon="💰", layout="wide")
@@ -81,6 +82,14 @@ if openai_api_key:
 else:
     logger.error("OpenAI API key is not set.")
 
+# Load HF_PRELOAD_MODELS once per Streamlit process rather than on the first request
+@st.cache_resource
+def warm_up_local_models():
+    warm_up_models()
+    return True
+
+warm_up_local_models()
+
 # Custom CSS (updated for dark mode)
 def load_css(file_name):
     with open(file_name) as f:
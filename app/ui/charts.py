@@ -2,31 +2,102 @@
 Chart generation module for the AI Budgeting Assistant.
 
 This module contains functions for creating various financial charts
-using Plotly, including expense breakdown pie charts and income vs
-expenses bar charts.
+using Plotly, including expense breakdown pie charts, income vs
+expenses bar charts and savings projections.
+
+Statement aggregates and figures are cached across reruns with
+st.cache_resource, keyed on the statement's content fingerprint and the
+chart inputs, so a rerun with the same data only re-sends the figures.
+The pie chart groups the long tail of categories into "Other", and
+projection lines are drawn on a bounded number of months, with WebGL
+traces for lines over long timelines (see get_chart_settings).
 """
 
+from typing import Any, Dict
+
+import pandas as pd
 import streamlit as st
 import plotly.graph_objects as go
 import plotly.express as px
+from app.api.models import BankStatement
+from app.core.config import get_chart_settings
+from app.services.projection import PERCENTILES, project_savings
 
-# Chart generation functions
-def generate_expense_chart(categorized_expenses):
+CHART_SETTINGS = get_chart_settings()
+
+OTHER_CATEGORY = "Other"
+
+def collapse_categories(totals: pd.Series, max_categories: int) -> pd.Series:
+    """The largest max_categories - 1 totals, with the rest summed into "Other" when there are more."""
+    totals = totals.dropna().sort_values(ascending=False)
+    if max_categories <= 0 or len(totals) <= max_categories:
+        return totals
+    head = totals.iloc[:max_categories - 1]
+    return pd.concat([head, pd.Series({OTHER_CATEGORY: totals.iloc[max_categories - 1:].sum()})])
+
+def line_trace(points: int):
+    """The Plotly trace type for a line with this many points."""
+    return go.Scattergl if points > CHART_SETTINGS["webgl_points"] else go.Scatter
+
+@st.cache_resource(max_entries=CHART_SETTINGS["cache_entries"], show_spinner=False)
+def _statement_aggregates(fingerprint: str, _statement: BankStatement) -> Dict[str, Any]:
+    categorized = _statement.category_totals('Withdrawals').dropna()
+    categorized.index = categorized.index.astype(str)
+    return {
+        "total_expenses": _statement.total('Withdrawals'),
+        "total_deposits": _statement.total('Deposits'),
+        "categorized_expenses": categorized.sort_values(ascending=False),
+    }
+
+def statement_aggregates(statement: BankStatement) -> Dict[str, Any]:
     """
-    Generates and display a pie chart showing expense breakdown by category.
+    Totals for the analysis page, computed once per statement content.
 
-    Args:
-        categorized_expenses (dict): A dictionary where keys are expense categories
-        and values are the total expenses for each category.
+    Returns:
+        dict: total_expenses, total_deposits and categorized_expenses (a
+        Series of withdrawals per category, largest first). Treat as read-only.
     """
+    return _statement_aggregates(statement.fingerprint(), statement)
+
+def expense_figure(categorized_expenses, max_categories: int = None) -> go.Figure:
+    totals = collapse_categories(pd.Series(categorized_expenses, dtype=float),
+                                 CHART_SETTINGS["max_categories"] if max_categories is None else max_categories)
     fig = px.pie(
-        values=list(categorized_expenses.values()),
-        names=list(categorized_expenses.keys()),
+        values=totals.to_numpy(),
+        names=totals.index.astype(str),
         title="Expense Breakdown by Category"
     )
     fig.update_traces(textposition='inside', textinfo='percent+label')
+    return fig
+
+@st.cache_resource(max_entries=CHART_SETTINGS["cache_entries"], show_spinner=False)
+def _statement_expense_figure(fingerprint: str, _statement: BankStatement, max_categories: int) -> go.Figure:
+    return expense_figure(_statement_aggregates(fingerprint, _statement)["categorized_expenses"], max_categories)
+
+# Chart generation functions
+def generate_expense_chart(categorized_expenses):
+    """
+    Generates and display a pie chart showing expense breakdown by category.
+
+    Args:
+        categorized_expenses (dict | BankStatement): Total expenses per category,
+        or a bank statement whose cached per-category totals are used.
+    """
+    if isinstance(categorized_expenses, BankStatement):
+        fig = _statement_expense_figure(categorized_expenses.fingerprint(), categorized_expenses,
+                                        CHART_SETTINGS["max_categories"])
+    else:
+        fig = expense_figure(categorized_expenses)
     st.plotly_chart(fig)
 
+@st.cache_resource(max_entries=CHART_SETTINGS["cache_entries"], show_spinner=False)
+def _income_vs_expenses_figure(total_income: float, total_expenses: float) -> go.Figure:
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=["Income"], y=[total_income], name="Income"))
+    fig.add_trace(go.Bar(x=["Expenses"], y=[total_expenses], name="Expenses"))
+    fig.update_layout(title="Income vs Expenses", barmode='group')
+    return fig
+
 def generate_income_vs_expenses_chart(total_income, total_expenses):
     """
     Generates and display a bar chart comparing total income to total expenses.
@@ -35,28 +106,52 @@ def generate_income_vs_expenses_chart(total_income, total_expenses):
         total_income (float): The user's total income.
         total_expenses (float): The user's total expenses.
     """
+    st.plotly_chart(_income_vs_expenses_figure(total_income, total_expenses))
+
+@st.cache_resource(max_entries=CHART_SETTINGS["cache_entries"], show_spinner=False)
+def _savings_projection(key, _scenarios, _goals, current_savings, monthly_savings, timeline_months, max_points):
+    projection = project_savings(current_savings, monthly_savings, timeline_months, _scenarios, _goals,
+                                 max_points=max_points)
+    months = projection.months
+    # Judged on the full timeline: the downsampled lines never exceed max_points
+    trace = line_trace(timeline_months + 1)
+
     fig = go.Figure()
-    fig.add_trace(go.Bar(x=["Income"], y=[total_income], name="Income"))
-    fig.add_trace(go.Bar(x=["Expenses"], y=[total_expenses], name="Expenses"))
-    fig.update_layout(title="Income vs Expenses", barmode='group')
-    st.plotly_chart(fig)
+    for index, scenario in enumerate(projection.scenarios):
+        low, median, high = (projection.band(index, p) for p in PERCENTILES)
+        if scenario.return_volatility > 0:
+            fig.add_trace(trace(x=months, y=high, mode="lines", line=dict(width=0),
+                                showlegend=False, hoverinfo="skip"))
+            fig.add_trace(trace(x=months, y=low, mode="lines", line=dict(width=0), fill="tonexty",
+                                name=f"{scenario.name} (10th-90th percentile)"))
+        fig.add_trace(trace(x=months, y=median, mode="lines", name=scenario.name))
+    fig.update_layout(title="Savings Projection", xaxis_title="Months", yaxis_title="Savings ($)")
+    return fig, projection
 
-def generate_savings_projection(current_savings, monthly_savings, timeline_months):
+def generate_savings_projection(current_savings, monthly_savings, timeline_months, scenarios=None, goals=()):
     """
     Generates and display a line chart projecting savings growth over time.
 
+    Scenarios with return volatility are drawn as a median line inside a
+    shaded 10th-90th percentile band of their Monte Carlo paths.
+
     Args:
         current_savings (float): The user's current savings amount.
         monthly_savings (float): The estimated monthly savings amount.
         timeline_months (int): The number of months to project into the future.
+        scenarios (list): Scenario assumptions to compare; a flat projection by default.
+        goals (list): SavingsGoal targets to estimate the chance of reaching.
+
+    Returns:
+        Projection: The projected bands and goal probabilities.
     """
-    months = list(range(timeline_months + 1))
-    savings = [current_savings + (monthly_savings * i) for i in months]
-    
-    fig = px.line(
-        x=months,
-        y=savings,
-        title="Savings Projection",
-        labels={"x": "Months", "y": "Savings ($)"}
+    scenarios = list(scenarios or [])
+    goals = list(goals)
+    key = (
+        tuple(tuple(vars(scenario).items()) for scenario in scenarios),
+        tuple(tuple(vars(goal).items()) for goal in goals),
     )
-    st.plotly_chart(fig)
\ No newline at end of file
+    fig, projection = _savings_projection(key, scenarios, goals, current_savings, monthly_savings,
+                                          timeline_months, CHART_SETTINGS["max_points"])
+    st.plotly_chart(fig)
+    return projection
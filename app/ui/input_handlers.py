@@ -18,6 +18,8 @@ from app.ui.layout import display_sample_bank_statement
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from app.api import models
+from app.services.backends import DEFAULT_MODEL, supported_models
+from app.services.statement_ingestion import load_statement_cached
 
 def handle_inputs():
     """
@@ -41,15 +43,19 @@ def handle_inputs():
         st.warning("Please upload your bank statement.")
         return None
 
-    df = pd.read_csv(uploaded_file)
+    try:
+        # Parsed once per file content; reruns and other sessions reuse the cached statement
+        loaded = load_statement_cached(uploaded_file)
+    except ValueError as e:
+        st.error(f"Could not read bank statement: {str(e)}")
+        return None
     st.write("Bank statement uploaded successfully!")
-    
-    for col in ['Withdrawals', 'Deposits', 'Balance']:
-        if col in df.columns:
-            df[col] = df[col].replace('[\$,]', '', regex=True).astype(float)
+    if loaded.summarized:
+        st.info(f"Large statement detected: transactions were summarized into {loaded.rows} monthly category totals "
+                "and largest expenses to stay within memory limits.")
             
     st.subheader("Bank Statement Preview")
-    st.write(df.head())
+    st.write(loaded.preview)
 
     name = st.text_input("Name", max_chars=100, placeholder="e.g., Janet")
     age = st.number_input("Age", min_value=18, max_value=120, step=1, value=23, help="Enter your current age")
@@ -64,25 +70,17 @@ def handle_inputs():
                                placeholder="e.g.,\nI do not want roommates\nMinimum savings: 20% of income")
     constraints_list = [constraint.strip() for constraint in constraints.split('\n') if constraint.strip()]
 
-    llm_options = ["GPT-4 (Default)", "distilgpt2", "gpt2"]
-    selected_llm = st.selectbox("Select LLM Model", llm_options, help="Choose the AI model for generating your financial advice")
+    selected_llm = st.selectbox(
+        "Select LLM Model", supported_models(),
+        format_func=lambda model: f"{model} (Default)" if model == DEFAULT_MODEL else model,
+        help="Choose the AI model for generating your financial advice"
+    )
 
     if st.button("Generate Analysis"):
         try:
             goals_list = [goal.strip() for goal in goals.split(',') if goal.strip()]
             
-            bank_statement_entries = [
-                models.BankStatementEntry(
-                    Date=pd.to_datetime(row['Date']).date(),
-                    Description=row['Description'],
-                    Category=row['Category'],
-                    Withdrawals=float(row.get('Withdrawals', 0)),
-                    Deposits=float(row.get('Deposits', 0))
-                ) for _, row in df.iterrows()
-            ]
-
-            # Remove "(Default)" from the selected model name if present
-            selected_model = selected_llm.split(" ")[0] if "(Default)" in selected_llm else selected_llm
+            bank_statement = loaded.statement
 
             user_data = models.UserDataInput(
                 name=name,
@@ -92,8 +90,8 @@ def handle_inputs():
                 current_savings=current_savings,
                 goals=goals_list,
                 timeline_months=timeline_months,
-                bank_statement=bank_statement_entries,
-                selected_llm=selected_model, 
+                bank_statement=bank_statement,
+                selected_llm=selected_llm, 
                 constraints=constraints_list
             )
             return user_data
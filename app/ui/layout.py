@@ -12,9 +12,11 @@ import pandas as pd
 from app.ui.charts import (
     generate_expense_chart,
     generate_income_vs_expenses_chart,
-    generate_savings_projection
+    generate_savings_projection,
+    statement_aggregates
 )
 from app.api.models import UserDataInput
+from app.services.projection import SavingsGoal, Scenario
 from app.ui.advice import escape_dollar_signs
 
 def display_sample_bank_statement(key_suffix=""):
@@ -48,27 +50,58 @@ def display_home_page():
     Use the navigation menu to explore the features.
     """)
 
+def projection_scenarios(annual_return, volatility, inflation, income_growth):
+    """
+    Saving only, and investing the savings, from percentage inputs.
+
+    Both share the inflation and income growth, so they are in the same
+    (today's) dollars and differ only in the return on the savings.
+    """
+    return [
+        Scenario("Saving only", inflation=inflation / 100, income_growth=income_growth / 100),
+        Scenario("Investing savings", annual_return / 100, volatility / 100, inflation / 100, income_growth / 100),
+    ]
+
+def projection_assumptions(timeline_months):
+    """Scenario and goal inputs for the savings projection: saving only, and investing the savings."""
+    with st.expander("Projection assumptions"):
+        annual_return = st.number_input("Expected annual return (%)", value=5.0, step=0.5)
+        volatility = st.number_input("Annual return volatility (%)", min_value=0.0, value=10.0, step=1.0)
+        inflation = st.number_input("Inflation (%)", value=2.5, step=0.5)
+        income_growth = st.number_input("Annual income growth (%)", value=2.0, step=0.5)
+        target = st.number_input("Savings target ($, in today's dollars)", min_value=0.0, value=0.0, step=1000.0)
+
+    scenarios = projection_scenarios(annual_return, volatility, inflation, income_growth)
+    goals = [SavingsGoal("Savings target", target, timeline_months)] if target > 0 else []
+    return scenarios, goals
+
 def display_analysis_page(inputs: UserDataInput):
     st.header("Financial Analysis")
         
     try:
         if inputs.bank_statement:
-            bank_statement = pd.DataFrame([entry.dict() for entry in inputs.bank_statement])
+            bank_statement = inputs.bank_statement
             
-            # Calculate total expenses and deposits
-            total_expenses = bank_statement['Withdrawals'].sum()
-            total_deposits = bank_statement['Deposits'].sum()
+            # Totals and per-category expenses, cached per statement content
+            aggregates = statement_aggregates(bank_statement)
+            total_expenses = aggregates["total_expenses"]
             total_income = inputs.current_income
 
-            # Create categorized expenses dictionary
-            categorized_expenses = bank_statement.groupby('Category')['Withdrawals'].sum().dropna().to_dict()
-
             # Generate charts
-            generate_expense_chart(categorized_expenses)
+            generate_expense_chart(bank_statement)
             generate_income_vs_expenses_chart(total_income, total_expenses)
 
             monthly_savings = total_income - total_expenses
-            generate_savings_projection(inputs.current_savings, monthly_savings, inputs.timeline_months)
+            scenarios, goals = projection_assumptions(inputs.timeline_months)
+            projection = generate_savings_projection(
+                inputs.current_savings, monthly_savings, inputs.timeline_months, scenarios, goals
+            )
+            for goal_index, goal in enumerate(projection.goals):
+                for scenario_index, scenario in enumerate(projection.scenarios):
+                    probability = projection.goal_probability[scenario_index, goal_index]
+                    st.write(escape_dollar_signs(
+                        f"Chance of reaching ${goal.target:,.2f} by month {goal.month} ({scenario.name}): {probability:.0%}"
+                    ))
 
             # Display financial goals
             if inputs.goals:
@@ -0,0 +1,108 @@
+"""
+Benchmark of CPU inference modes for local models.
+
+Generates a fixed number of tokens from a fixed-length prompt in each mode
+and reports decode throughput and weight memory:
+
+    baseline         fp32 weights, plain model.generate (the path before inference modes)
+    inference_mode   fp32 weights, generation under torch.inference_mode
+    int8             dynamic int8 linear layers, under torch.inference_mode (HF_INFERENCE_MODE=int8)
+
+By default the model is a randomly initialised GPT-2 with distilgpt2's
+architecture, so the benchmark runs offline; pass --model distilgpt2 (or
+gpt2) to load the published weights instead. Each --threads value is run
+separately. Run from the project root:
+
+    python -m benchmarks.bench_cpu_inference --threads 1 2 4
+"""
+
+import argparse
+import copy
+import logging
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional
+
+from app.services.backends import load_runtime
+from app.services.cpu_inference import prepare_model
+from app.services.model_registry import model_nbytes
+
+MODES = ["baseline", "inference_mode", "int8"]
+
+def build_model(model_name: str) -> Any:
+    torch, transformers = load_runtime("huggingface")
+    if model_name == "random":
+        torch.manual_seed(0)
+        return transformers.GPT2LMHeadModel(transformers.GPT2Config(n_layer=6)).eval()
+    return transformers.AutoModelForCausalLM.from_pretrained(model_name).eval()
+
+def prepare(model: Any, mode: str) -> Any:
+    return prepare_model(copy.deepcopy(model), "int8" if mode == "int8" else "fp32")
+
+def measure(model: Any, mode: str, prompt_tokens: int, new_tokens: int, batch_size: int, repeat: int) -> float:
+    """Best wall time of `repeat` greedy generations of exactly new_tokens tokens."""
+    torch, _ = load_runtime("huggingface")
+    generator = torch.Generator().manual_seed(0)
+    input_ids = torch.randint(0, model.config.vocab_size, (batch_size, prompt_tokens), generator=generator)
+    context = nullcontext() if mode == "baseline" else torch.inference_mode()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with context:
+            model.generate(
+                input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                max_new_tokens=new_tokens,
+                min_new_tokens=new_tokens,
+                do_sample=False,
+                pad_token_id=0,
+            )
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run_suite(model_name: str = "random", modes: Optional[List[str]] = None, threads: Optional[List[int]] = None,
+              prompt_tokens: int = 128, new_tokens: int = 64, batch_size: int = 1, repeat: int = 3,
+              model: Any = None) -> List[Dict[str, Any]]:
+    torch, _ = load_runtime("huggingface")
+    base = model if model is not None else build_model(model_name)
+    threads = threads or [torch.get_num_threads()]
+    results = []
+    for mode in modes or MODES:
+        prepared = prepare(base, mode)
+        # Warm up kernels and caches before timing
+        measure(prepared, mode, prompt_tokens, 2, batch_size, 1)
+        for thread_count in threads:
+            torch.set_num_threads(thread_count)
+            seconds = measure(prepared, mode, prompt_tokens, new_tokens, batch_size, repeat)
+            results.append({
+                "mode": mode,
+                "threads": thread_count,
+                "seconds": seconds,
+                "tokens_per_second": new_tokens * batch_size / seconds,
+                "weights_mb": model_nbytes(prepared) / (1024 * 1024),
+            })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="random", help='"random" or a Hugging Face model name')
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--threads", type=int, nargs="+", help="torch intra-op thread counts to try")
+    parser.add_argument("--prompt-tokens", type=int, default=128)
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger("transformers").setLevel(logging.ERROR)
+    results = run_suite(args.model, args.modes, args.threads, args.prompt_tokens, args.new_tokens,
+                        args.batch_size, args.repeat)
+    baseline = {result["threads"]: result["tokens_per_second"] for result in results if result["mode"] == "baseline"}
+    print(f"{'mode':<16} {'threads':>7} {'seconds':>9} {'tokens/s':>10} {'speedup':>8} {'weights MB':>11}")
+    for result in results:
+        speedup = result["tokens_per_second"] / baseline[result["threads"]] if result["threads"] in baseline else 1.0
+        print(f"{result['mode']:<16} {result['threads']:>7} {result['seconds']:>9.3f} "
+              f"{result['tokens_per_second']:>10.1f} {speedup:>7.2f}x {result['weights_mb']:>11.1f}")
+
+if __name__ == "__main__":
+    main()
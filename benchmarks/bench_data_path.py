@@ -0,0 +1,189 @@
+"""
+Benchmark suite for the statement data path, from upload to budget table.
+
+Times each stage a statement goes through on synthetic statements of
+increasing size, with a stub LLM so it runs offline:
+
+    ingest_csv               load_statement + BankStatement, parsing the upload
+    ingest_csv_rerun         load_statement_cached on a cache hit, as in handle_inputs on a rerun
+    validate_json            UserDataInput from a JSON request body, as in the API
+    validate_statement       UserDataInput around an ingested BankStatement, as in the UI
+    prepare_user_context
+    get_top_expenses
+    create_gpt_prompt
+    advice_stream            generate_advice_stream with the stub LLM (advice cache bypassed)
+    create_budget_dataframe  for the stub LLM's proposed budget
+    analysis_page            display_analysis_page aggregation and chart figures
+
+For every stage and size it reports the best wall time, throughput in rows
+per second and peak traced memory. Results can be saved as a baseline and
+later runs compared against it; timings are machine specific, so keep
+baselines per machine. Run from the project root:
+
+    python -m benchmarks.bench_data_path --rows 1000 10000 100000 1000000 --save-baseline
+    python -m benchmarks.bench_data_path --rows 1000 10000 100000 1000000
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+from unittest.mock import patch
+
+from app.api.models import BankStatement, UserDataInput
+from app.core.config import get_sources
+from app.services import recommender
+from app.services.advice_cache import AdviceCache
+from app.services.statement_ingestion import load_statement, load_statement_cached
+from app.ui.advice import BudgetStreamParser, create_budget_dataframe
+from app.ui.layout import display_analysis_page
+from benchmarks.synthetic import stub_advice, stub_llm, synthetic_csv, synthetic_user_data
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "data_path.json")
+
+# Stage timings shorter than this are too noisy to call a regression
+MIN_REGRESSION_SECONDS = 0.005
+
+def build_context(rows: int, seed: int = 0) -> Dict[str, Any]:
+    """Everything the stages need for one statement size, prepared outside the timed region."""
+    data = synthetic_csv(rows, seed)
+    # Also warms the statement cache for ingest_csv_rerun
+    statement = load_statement_cached(io.BytesIO(data)).statement
+    user_data = synthetic_user_data(statement)
+    budget_parser = BudgetStreamParser()
+    budget_parser.feed(stub_advice())
+    return {
+        "csv": data,
+        "statement": statement,
+        "json_body": user_data.model_dump_json().encode(),
+        "user_data": user_data,
+        "sources": get_sources(),
+        "budget": budget_parser.categories,
+    }
+
+def ingest_csv(context):
+    frame, _ = load_statement(io.BytesIO(context["csv"]))
+    return BankStatement.from_frame(frame)
+
+def advice_stream(context):
+    # A fresh uncached run every time
+    with patch.object(recommender, "call_llm_api", stub_llm), \
+            patch.object(recommender, "advice_cache", AdviceCache(max_memory_entries=0)):
+        return "".join(recommender.generate_advice_stream(context["user_data"]))
+
+STAGES: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "ingest_csv": ingest_csv,
+    "ingest_csv_rerun": lambda context: load_statement_cached(io.BytesIO(context["csv"])).statement,
+    "validate_json": lambda context: UserDataInput.model_validate_json(context["json_body"]),
+    "validate_statement": lambda context: synthetic_user_data(context["statement"]),
+    "prepare_user_context": lambda context: recommender.prepare_user_context(context["user_data"]),
+    "get_top_expenses": lambda context: recommender.get_top_expenses(context["statement"]),
+    "create_gpt_prompt": lambda context: recommender.create_gpt_prompt(context["user_data"], context["sources"]),
+    "advice_stream": advice_stream,
+    "create_budget_dataframe": lambda context: create_budget_dataframe(
+        context["budget"], context["statement"], context["user_data"].current_income
+    ),
+    "analysis_page": lambda context: display_analysis_page(context["user_data"]),
+}
+
+def measure(func: Callable, context: Dict[str, Any], repeat: int) -> Dict[str, float]:
+    """Best wall time over repeat runs, plus peak traced memory of one extra run."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(context)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(context)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": min(timings), "peak_mb": peak / (1024 * 1024)}
+
+def run_suite(row_counts: List[int], repeat: int = 3, stages: List[str] = None) -> List[Dict[str, Any]]:
+    results = []
+    for rows in row_counts:
+        context = build_context(rows)
+        for stage in stages or STAGES:
+            result = measure(STAGES[stage], context, repeat)
+            result.update(stage=stage, rows=rows, rows_per_second=rows / max(result["seconds"], 1e-9))
+            results.append(result)
+    return results
+
+def load_baseline(path: str) -> Dict[str, Dict[str, float]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)["results"]
+
+def save_baseline(path: str, results: List[Dict[str, Any]]) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    baseline = load_baseline(path)
+    for result in results:
+        baseline[f"{result['stage']}/{result['rows']}"] = {
+            "seconds": result["seconds"], "peak_mb": result["peak_mb"]
+        }
+    with open(path, "w") as f:
+        json.dump({"version": 1, "results": baseline}, f, indent=2, sort_keys=True)
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """Describe every stage that got slower or used more memory than its baseline by more than tolerance."""
+    regressions = []
+    for result in results:
+        previous = baseline.get(f"{result['stage']}/{result['rows']}")
+        if previous is None:
+            continue
+        slower = result["seconds"] - previous["seconds"]
+        if slower > MIN_REGRESSION_SECONDS and result["seconds"] > previous["seconds"] * (1 + tolerance):
+            regressions.append(
+                f"{result['stage']} @ {result['rows']} rows: {result['seconds']:.4f}s vs {previous['seconds']:.4f}s"
+            )
+        if result["peak_mb"] > max(previous["peak_mb"] * (1 + tolerance), previous["peak_mb"] + 1):
+            regressions.append(
+                f"{result['stage']} @ {result['rows']} rows: {result['peak_mb']:.1f} MB vs {previous['peak_mb']:.1f} MB"
+            )
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Record this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown or memory growth over the baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    # Streamlit warns about running outside `streamlit run` on every call made by analysis_page
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    results = run_suite(args.rows, args.repeat, args.stages)
+    print(f"{'stage':<24} {'rows':>9} {'seconds':>10} {'rows/s':>12} {'peak MB':>9}")
+    for result in results:
+        print(f"{result['stage']:<24} {result['rows']:>9} {result['seconds']:>10.4f} "
+              f"{result['rows_per_second']:>12,.0f} {result['peak_mb']:>9.1f}")
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    baseline = load_baseline(args.baseline)
+    if not baseline:
+        print("No baseline to compare against; run with --save-baseline first")
+        return
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+    print("No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
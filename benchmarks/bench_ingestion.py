@@ -0,0 +1,90 @@
+"""
+Benchmark of bank statement ingestion.
+
+Compares the original per-row `iterrows` conversion used by handle_inputs
+with the vectorized normalize_statement path producing a columnar
+BankStatement, in time and in memory retained by the parsed statement.
+Run from the project root:
+
+    python -m benchmarks.bench_ingestion --rows 1000 10000 100000
+"""
+
+import argparse
+import gc
+import io
+import time
+import tracemalloc
+
+import pandas as pd
+
+from app.api import models
+from app.services.statement_ingestion import normalize_statement
+from benchmarks.synthetic import synthetic_csv
+
+def legacy_ingest(data: bytes):
+    """The pre-vectorization handle_inputs conversion, kept for comparison."""
+    df = pd.read_csv(io.BytesIO(data))
+    for col in ['Withdrawals', 'Deposits', 'Balance']:
+        if col in df.columns:
+            df[col] = df[col].replace(r'[\$,]', '', regex=True).astype(float)
+    return [
+        models.BankStatementEntry(
+            Date=pd.to_datetime(row['Date']).date(),
+            Description=row['Description'],
+            Category=row['Category'],
+            Withdrawals=float(row.get('Withdrawals', 0)),
+            Deposits=float(row.get('Deposits', 0))
+        ) for _, row in df.iterrows()
+    ]
+
+def vectorized_ingest(data: bytes):
+    return models.BankStatement.from_frame(normalize_statement(pd.read_csv(io.BytesIO(data))))
+
+def retained_mb(func, data):
+    """
+    Memory still held by the result of func(data) once temporaries are freed.
+
+    Arrow-backed columns live outside the Python allocator, so a DataFrame-backed
+    result is measured with memory_usage(deep=True) when that is larger.
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = func(data)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    if isinstance(result, models.BankStatement):
+        retained = max(retained, int(result.to_frame().memory_usage(deep=True).sum()))
+    del result
+    return retained / (1024 * 1024)
+
+def best_of(func, data, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-legacy-above", type=int, default=100000,
+                        help="Skip the slow legacy path for larger statements")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'legacy (s)':>12} {'vectorized (s)':>15} {'speedup':>9} {'legacy MB':>10} {'columnar MB':>12}")
+    for rows in args.rows:
+        data = synthetic_csv(rows)
+        vectorized = best_of(vectorized_ingest, data, args.repeat)
+        columnar_mb = retained_mb(vectorized_ingest, data)
+        if rows <= args.skip_legacy_above:
+            legacy = best_of(legacy_ingest, data, 1)
+            legacy_mb = retained_mb(legacy_ingest, data)
+            print(f"{rows:>10} {legacy:>12.3f} {vectorized:>15.3f} {legacy / vectorized:>8.1f}x {legacy_mb:>10.1f} {columnar_mb:>12.1f}")
+        else:
+            print(f"{rows:>10} {'-':>12} {vectorized:>15.3f} {'-':>9} {'-':>10} {columnar_mb:>12.1f}")
+
+if __name__ == "__main__":
+    main()
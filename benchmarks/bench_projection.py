@@ -0,0 +1,52 @@
+"""
+Benchmark of the savings projection engine.
+
+Times project_savings for a mix of deterministic and Monte Carlo
+scenarios over a range of path counts and timelines, the work done on
+every rerun of the analysis page. Run from the project root:
+
+    python -m benchmarks.bench_projection --paths 1000 2000 5000 --months 60 600
+"""
+
+import argparse
+import time
+from typing import Any, Dict, List, Optional
+
+from app.services.projection import SavingsGoal, Scenario, project_savings
+
+SCENARIOS = [
+    Scenario("Saving only"),
+    Scenario("Cash", 0.03, inflation=0.025),
+    Scenario("Balanced", 0.06, 0.10, 0.025, 0.02),
+    Scenario("Growth", 0.08, 0.16, 0.025, 0.02),
+]
+
+def run_suite(paths: Optional[List[int]] = None, months: Optional[List[int]] = None,
+              scenarios: Optional[List[Scenario]] = None, repeat: int = 5) -> List[Dict[str, Any]]:
+    scenarios = scenarios or SCENARIOS
+    results = []
+    for timeline_months in months or [60, 600]:
+        goals = [SavingsGoal("Target", 100000, timeline_months)]
+        for path_count in paths or [1000, 2000, 5000]:
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                project_savings(10000, 500, timeline_months, scenarios, goals, paths=path_count)
+                best = min(best, time.perf_counter() - start)
+            results.append({"months": timeline_months, "paths": path_count, "scenarios": len(scenarios), "seconds": best})
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paths", type=int, nargs="+", default=[1000, 2000, 5000])
+    parser.add_argument("--months", type=int, nargs="+", default=[60, 600])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = run_suite(args.paths, args.months, repeat=args.repeat)
+    print(f"{'months':>6} {'paths':>6} {'scenarios':>9} {'ms':>8}")
+    for result in results:
+        print(f"{result['months']:>6} {result['paths']:>6} {result['scenarios']:>9} {result['seconds'] * 1000:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Load generator for the advice API.
+
+Keeps a target number of `/get_advice` requests in flight against a
+running app and reports time to first byte, end-to-end latency
+percentiles, streamed tokens per second and error rates. Pair it with
+benchmarks.stub_openai to capacity-plan without calling OpenAI:
+
+    python -m benchmarks.stub_openai --port 8001 --ttft-ms 300 --tokens-per-second 40 &
+    OPENAI_API_BASE=http://127.0.0.1:8001/v1 uvicorn app.api.main:app --port 8000 &
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --concurrency 64 --requests 1000
+
+Every request carries a distinct user name so the advice cache does not
+serve it, unless --allow-cache is given.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from app.api.models import BankStatement
+from app.services.recommender import ERROR_PREFIXES
+from app.services.statement_ingestion import normalize_statement
+from benchmarks.stub_openai import tokenize
+from benchmarks.synthetic import synthetic_statement, synthetic_user_data
+
+def build_payloads(rows: int, unique: bool = True):
+    """Yield request bodies for /get_advice; distinct per request when unique is set."""
+    base = synthetic_user_data(BankStatement.from_frame(normalize_statement(synthetic_statement(rows))))
+    payload = base.model_dump(mode="json")
+    index = 0
+    while True:
+        if unique:
+            payload = {**payload, "name": f"Load User {index}"}
+        yield payload
+        index += 1
+
+def is_error_response(status_code: int, text: str, last_chunk: str = "") -> bool:
+    # The app reports backend failures in-band, as the whole response or as its final chunk
+    return status_code != 200 or not text or text.startswith(ERROR_PREFIXES) or last_chunk.startswith(ERROR_PREFIXES)
+
+async def timed_request(client: httpx.AsyncClient, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    first_byte = None
+    parts = []
+    try:
+        async with client.stream("POST", url, json=payload) as response:
+            async for text in response.aiter_text():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - start
+                parts.append(text)
+            status_code = response.status_code
+    except Exception as e:
+        return {"ok": False, "status": type(e).__name__, "latency": time.perf_counter() - start,
+                "ttfb": first_byte, "tokens": 0}
+
+    latency = time.perf_counter() - start
+    text = "".join(parts)
+    return {
+        "ok": not is_error_response(status_code, text, parts[-1] if parts else ""),
+        "status": status_code,
+        "latency": latency,
+        "ttfb": first_byte,
+        "tokens": len(tokenize(text)),
+    }
+
+async def run_load(client: httpx.AsyncClient, url: str, payloads, concurrency: int,
+                   total_requests: Optional[int] = None, duration: Optional[float] = None):
+    """
+    Send requests with `concurrency` in flight until total_requests were sent or duration elapsed.
+
+    Returns:
+        tuple: (list of per-request results, wall-clock seconds)
+    """
+    if total_requests is None and duration is None:
+        raise ValueError("Give total_requests or duration")
+    results: List[Dict[str, Any]] = []
+    sent = 0
+    start = time.perf_counter()
+
+    async def worker():
+        nonlocal sent
+        while True:
+            if total_requests is not None and sent >= total_requests:
+                return
+            if duration is not None and time.perf_counter() - start >= duration:
+                return
+            sent += 1
+            results.append(await timed_request(client, url, next(payloads)))
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results, time.perf_counter() - start
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(np.array(values) * 1000, [50, 95, 99])
+    return {"p50": round(p50, 1), "p95": round(p95, 1), "p99": round(p99, 1)}
+
+def summarize(results: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    """Aggregate per-request results into latency percentiles (ms), throughput and error rates."""
+    ok = [result for result in results if result["ok"]]
+    statuses: Dict[str, int] = {}
+    for result in results:
+        statuses[str(result["status"])] = statuses.get(str(result["status"]), 0) + 1
+    stream_rates = [
+        result["tokens"] / (result["latency"] - result["ttfb"])
+        for result in ok if result["ttfb"] is not None and result["latency"] > result["ttfb"]
+    ]
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "error_rate": (len(results) - len(ok)) / len(results) if results else 0.0,
+        "statuses": statuses,
+        "requests_per_second": len(results) / wall_seconds if wall_seconds else 0.0,
+        "ttfb_ms": _percentiles([result["ttfb"] for result in ok if result["ttfb"] is not None]),
+        "latency_ms": _percentiles([result["latency"] for result in ok]),
+        "tokens_per_second_per_stream": float(np.mean(stream_rates)) if stream_rates else 0.0,
+        "tokens_per_second_total": sum(result["tokens"] for result in ok) / wall_seconds if wall_seconds else 0.0,
+    }
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    print(f"requests        {summary['requests']} ({summary['requests_per_second']:.1f}/s)")
+    print(f"errors          {summary['errors']} ({summary['error_rate']:.1%})  statuses {summary['statuses']}")
+    for name in ("ttfb_ms", "latency_ms"):
+        values = summary[name]
+        print(f"{name:<15} " + "  ".join(f"{key} {value}" for key, value in values.items()))
+    print(f"tokens/s        {summary['tokens_per_second_per_stream']:.1f} per stream, "
+          f"{summary['tokens_per_second_total']:.1f} total")
+
+async def _main(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(args.timeout)) as client:
+        results, wall = await run_load(
+            client, args.url.rstrip("/") + args.endpoint, build_payloads(args.rows, not args.allow_cache),
+            args.concurrency, args.requests, args.duration,
+        )
+    return summarize(results, wall)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoint", default="/get_advice")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, help="Total requests to send (default 200 unless --duration)")
+    parser.add_argument("--duration", type=float, help="Seconds to keep sending requests")
+    parser.add_argument("--rows", type=int, default=200, help="Statement rows per request")
+    parser.add_argument("--allow-cache", action="store_true", help="Send identical requests")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+    if args.requests is None and args.duration is None:
+        args.requests = 200
+    # The app's logging setup (pulled in via recommender) would log every request httpx makes
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    summary = asyncio.run(_main(args))
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+
+if __name__ == "__main__":
+    main()
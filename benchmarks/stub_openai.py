@@ -0,0 +1,224 @@
+"""
+Local stand-in for the OpenAI streaming ChatCompletion endpoint.
+
+Serves `POST /v1/chat/completions` with the same server-sent events that
+handle_gpt4 and handle_gpt4_async consume, so the app can be load tested
+without calling OpenAI. Responses are either synthetic (the benchmark stub
+advice) or cassettes: real responses recorded once through the stub and
+replayed with their original token timing.
+
+    # Synthetic responses: 300 ms to first token, then 40 tokens/s, 2% failures
+    python -m benchmarks.stub_openai --port 8001 --ttft-ms 300 --tokens-per-second 40 --error-rate 0.02
+
+    # Record real responses, then replay them
+    python -m benchmarks.stub_openai --port 8001 --cassettes cassettes --record https://api.openai.com/v1
+    python -m benchmarks.stub_openai --port 8001 --cassettes cassettes
+
+Point the app at it with OPENAI_API_BASE=http://127.0.0.1:8001/v1.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.services.advice_cache import canonical_hash
+from benchmarks.synthetic import stub_advice
+
+@dataclass
+class StubConfig:
+    ttft_ms: float = 0.0
+    tokens_per_second: float = 0.0  # 0 streams as fast as possible
+    error_rate: float = 0.0  # fraction of requests rejected with error_status
+    error_status: int = 500
+    midstream_error_rate: float = 0.0  # fraction of streams cut off halfway through
+    cassette_dir: Optional[str] = None
+    record_upstream: Optional[str] = None  # OpenAI-compatible base URL to record from
+    replay_speed: float = 1.0  # >1 replays cassettes faster than recorded
+    seed: Optional[int] = None
+
+def tokenize(text: str) -> List[str]:
+    """Split text into word-sized pieces that concatenate back to the original."""
+    return re.findall(r"\s*\S+|\s+", text)
+
+def request_key(body: Dict[str, Any]) -> str:
+    return canonical_hash({"model": body.get("model"), "messages": body.get("messages")})
+
+def sse_event(model: str, content: Optional[str] = None, finish_reason: Optional[str] = None) -> str:
+    delta = {"content": content} if content is not None else {}
+    chunk = {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
+
+class CassetteStore:
+    """Recorded responses on disk, one JSON file per request key."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._cassettes = {}
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".json"):
+                with open(os.path.join(directory, name)) as f:
+                    cassette = json.load(f)
+                self._cassettes[cassette["key"]] = cassette
+        self._cycle = None
+
+    def __len__(self):
+        return len(self._cassettes)
+
+    def find(self, key: str) -> Optional[Dict[str, Any]]:
+        """The cassette recorded for key, or the next one round-robin when there is no exact match."""
+        if key in self._cassettes:
+            return self._cassettes[key]
+        if not self._cassettes:
+            return None
+        if self._cycle is None:
+            self._cycle = itertools.cycle(list(self._cassettes.values()))
+        return next(self._cycle)
+
+    def save(self, key: str, tokens: List[str], offsets: List[float]) -> None:
+        cassette = {"key": key, "tokens": tokens, "offsets": offsets}
+        with open(os.path.join(self.directory, f"{key}.json"), "w") as f:
+            json.dump(cassette, f)
+        self._cassettes[key] = cassette
+        self._cycle = None
+
+def create_stub_app(config: StubConfig = None) -> FastAPI:
+    config = config or StubConfig()
+    rng = random.Random(config.seed)
+    cassettes = CassetteStore(config.cassette_dir) if config.cassette_dir else None
+    synthetic_tokens = tokenize(stub_advice())
+    app = FastAPI()
+    app.state.stats = {"requests": 0, "errors_injected": 0, "streams_cut": 0, "recorded": 0, "replayed": 0}
+
+    async def paced(tokens: List[str], offsets: Optional[List[float]], model: str, cut_at: Optional[int]):
+        start = time.perf_counter()
+        for index, token in enumerate(tokens):
+            if index == cut_at:
+                app.state.stats["streams_cut"] += 1
+                raise RuntimeError("Injected mid-stream failure")
+            if offsets is not None:
+                target = offsets[index] / config.replay_speed
+            else:
+                target = config.ttft_ms / 1000 + (index / config.tokens_per_second if config.tokens_per_second else 0)
+            delay = target - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield sse_event(model, token)
+        yield sse_event(model, finish_reason="stop")
+        yield "data: [DONE]\n\n"
+
+    async def record(body: Dict[str, Any], headers: Dict[str, str], key: str, model: str):
+        tokens, offsets = [], []
+        start = time.perf_counter()
+        async with httpx.AsyncClient(timeout=httpx.Timeout(120.0, connect=10.0)) as client:
+            async with client.stream(
+                "POST", f"{config.record_upstream.rstrip('/')}/chat/completions", headers=headers, json=body
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:") or line[len("data:"):].strip() == "[DONE]":
+                        continue
+                    content = json.loads(line[len("data:"):])["choices"][0].get("delta", {}).get("content")
+                    if content:
+                        tokens.append(content)
+                        offsets.append(time.perf_counter() - start)
+                        yield sse_event(model, content)
+        cassettes.save(key, tokens, offsets)
+        app.state.stats["recorded"] += 1
+        yield sse_event(model, finish_reason="stop")
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/chat/completions")
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "gpt-4")
+        app.state.stats["requests"] += 1
+
+        if config.error_rate and rng.random() < config.error_rate:
+            app.state.stats["errors_injected"] += 1
+            return JSONResponse(
+                {"error": {"message": "Injected failure", "type": "server_error"}}, status_code=config.error_status
+            )
+
+        key = request_key(body)
+        if config.record_upstream and cassettes is not None:
+            headers = {"Authorization": request.headers.get("authorization", "")}
+            return StreamingResponse(record(body, headers, key, model), media_type="text/event-stream")
+
+        cassette = cassettes.find(key) if cassettes is not None else None
+        if cassette is not None:
+            app.state.stats["replayed"] += 1
+            tokens, offsets = cassette["tokens"], cassette["offsets"]
+        else:
+            tokens, offsets = synthetic_tokens, None
+
+        if not body.get("stream"):
+            await asyncio.sleep(config.ttft_ms / 1000)
+            return {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                             "finish_reason": "stop"}],
+            }
+
+        cut_at = None
+        if config.midstream_error_rate and rng.random() < config.midstream_error_rate:
+            cut_at = len(tokens) // 2
+        return StreamingResponse(paced(tokens, offsets, model, cut_at), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.stats
+
+    return app
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft-ms", type=float, default=0.0, help="Delay before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Token rate (0 = unthrottled)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests rejected")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of rejected requests")
+    parser.add_argument("--midstream-error-rate", type=float, default=0.0,
+                        help="Fraction of streams cut off halfway through")
+    parser.add_argument("--cassettes", help="Directory of recorded responses to replay (or record into)")
+    parser.add_argument("--record", metavar="UPSTREAM", help="Record responses from this OpenAI-compatible base URL")
+    parser.add_argument("--replay-speed", type=float, default=1.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    if args.record and not args.cassettes:
+        parser.error("--record needs --cassettes")
+
+    config = StubConfig(
+        ttft_ms=args.ttft_ms, tokens_per_second=args.tokens_per_second, error_rate=args.error_rate,
+        error_status=args.error_status, midstream_error_rate=args.midstream_error_rate,
+        cassette_dir=args.cassettes, record_upstream=args.record, replay_speed=args.replay_speed, seed=args.seed,
+    )
+    uvicorn.run(create_stub_app(config), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
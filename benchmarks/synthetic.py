@@ -0,0 +1,62 @@
+"""
+Synthetic inputs shared by the benchmarks.
+
+Statements are generated deterministically from a seed so timings are
+comparable run to run, and the stub LLM returns a fixed advice text with a
+budget block covering the generated categories, so nothing leaves the machine.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from app.api.models import BankStatement, UserDataInput
+
+CATEGORIES = ["Rent", "Groceries", "Utilities", "Dining", "Transport", "Shopping", "Health", "Travel"]
+
+def synthetic_statement(rows: int, seed: int = 0) -> pd.DataFrame:
+    """A raw statement as a bank export would provide it: formatted dates and currency strings."""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 4 * 365, rows), unit="D")
+    amounts = rng.gamma(2.0, 40.0, rows).round(2)
+    is_deposit = rng.random(rows) < 0.1
+    return pd.DataFrame({
+        "Date": dates.strftime("%m/%d/%Y"),
+        "Description": [f"Transaction {i}" for i in range(rows)],
+        "Withdrawals": np.where(is_deposit, "", [f"${a:,.2f}" for a in amounts]),
+        "Deposits": np.where(is_deposit, [f"${a * 20:,.2f}" for a in amounts], ""),
+        "Category": np.where(is_deposit, "Income", rng.choice(CATEGORIES, rows)),
+    })
+
+def synthetic_csv(rows: int, seed: int = 0) -> bytes:
+    return synthetic_statement(rows, seed).to_csv(index=False).encode()
+
+def synthetic_user_data(bank_statement: BankStatement, selected_llm: str = "GPT-4") -> UserDataInput:
+    return UserDataInput(
+        name="Benchmark User", age=35, state="Texas", current_income=6000, current_savings=15000,
+        goals=["Build an emergency fund", "Save for a house"], timeline_months=36,
+        bank_statement=bank_statement, selected_llm=selected_llm,
+        constraints=["No roommates", "Save at least $500 a month"],
+    )
+
+def stub_advice(categories=CATEGORIES) -> str:
+    budget = {
+        category: {"proposed_change": -10 * (index + 1), "change_reason": f"Trim {category.lower()} spending"}
+        for index, category in enumerate(categories)
+    }
+    return (
+        "Hi there! Let's look at your finances.\n\n"
+        "1. Income and Expense Analysis\nYour monthly income is $6,000.00.\n\n"
+        "Financial Goals: Build an emergency fund, Save for a house\n\n"
+        "2. Savings Rate Evaluation\nYou are on track.\n"
+        "---BUDGET_JSON_START---\n"
+        + json.dumps({"Proposed Monthly Budget": budget}) +
+        "\n---BUDGET_JSON_END---\nYou've got this!"
+    )
+
+def stub_llm(system_message: str, prompt: str, model_name: str, chunk_size: int = 16):
+    """Drop-in for recommender.call_llm_api that streams stub_advice in small chunks."""
+    advice = stub_advice()
+    for start in range(0, len(advice), chunk_size):
+        yield advice[start:start + chunk_size]
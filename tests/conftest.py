@@ -0,0 +1,40 @@
+import pytest
+from unittest.mock import patch
+import torch
+from tokenizers import Tokenizer, decoders, models, pre_tokenizers
+from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+TINY_VOCAB = ["<|endoftext|>", "budget", "save", "rent", "food", "income", "$"] + [f"w{i}" for i in range(57)]
+
+def build_tiny_gpt2():
+    """A randomly initialised two-layer GPT-2 with a word-level tokenizer, built offline."""
+    vocab = {word: index for index, word in enumerate(TINY_VOCAB)}
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="<|endoftext|>"))
+    backend.pre_tokenizer = pre_tokenizers.Whitespace()
+    backend.decoder = decoders.WordPiece()
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend,
+        eos_token="<|endoftext|>",
+        bos_token="<|endoftext|>",
+        unk_token="<|endoftext|>",
+        clean_up_tokenization_spaces=False,
+    )
+
+    torch.manual_seed(0)
+    config = GPT2Config(vocab_size=len(TINY_VOCAB), n_positions=256, n_embd=16, n_layer=2, n_head=2,
+                        bos_token_id=0, eos_token_id=0)
+    model = GPT2LMHeadModel(config).eval()
+    return tokenizer, model
+
+@pytest.fixture(scope="session")
+def tiny_gpt2():
+    return build_tiny_gpt2()
+
+@pytest.fixture(autouse=True)
+def isolated_advice_cache():
+    """Give every test an empty, memory-only advice cache."""
+    from app.services import recommender
+    from app.services.advice_cache import AdviceCache
+
+    with patch.object(recommender, "advice_cache", AdviceCache()):
+        yield recommender.advice_cache
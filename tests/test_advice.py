@@ -0,0 +1,147 @@
+import random
+import pytest
+from streamlit.testing.v1 import AppTest
+from app.ui.advice import (
+    BudgetStreamParser, IncrementalAdviceRenderer, clean_text, escape_dollar_signs, render_advice_text
+)
+
+ADVICE = """Hi Jane! Let's look at your finances.
+
+1. Income and Expense Analysis
+Your   monthly income is $6,000.00 and you spent $2,120.50.
+
+Financial Goals: Save for a vacation,
+buy a house
+
+2. Savings Rate Evaluation
+You are saving   65% of your income.
+---BUDGET_JSON_START---
+{"Proposed Monthly Budget": {"Food": {"proposed_change": -50, "change_reason": "Cook more"}}}
+---BUDGET_JSON_END---
+I'm excited to support you on this journey!"""
+
+def reference_render(complete_advice, constraints):
+    """The whole-text rendering generate_advice_ui used to redo for every chunk."""
+    display_text = complete_advice.split("---BUDGET_JSON_START---")[0]
+    goals_index = display_text.find("Financial Goals:")
+    if goals_index != -1:
+        next_section_index = display_text.find("\n\n", goals_index)
+        if next_section_index != -1:
+            constraints_text = "\n\nBudgeting Constraints:\n"
+            for constraint in constraints:
+                constraints_text += f"• {constraint}\n"
+            display_text = display_text[:next_section_index] + constraints_text + display_text[next_section_index:]
+    return escape_dollar_signs(clean_text(display_text))
+
+def random_chunks(text, seed):
+    rng = random.Random(seed)
+    chunks, position = [], 0
+    while position < len(text):
+        size = rng.randint(1, 12)
+        chunks.append(text[position:position + size])
+        position += size
+    return chunks
+
+@pytest.mark.parametrize("seed", range(20))
+def test_incremental_render_matches_full_render_at_every_step(seed):
+    constraints = ["No roommates", "Save $500 a month"]
+    renderer = IncrementalAdviceRenderer(constraints)
+    received = ""
+    for chunk in random_chunks(ADVICE, seed):
+        received += chunk
+        renderer.feed(chunk)
+        assert renderer.text() == reference_render(received, constraints)
+    assert renderer.budget_reached
+
+def test_render_advice_text_without_constraints():
+    assert render_advice_text(ADVICE) == reference_render(ADVICE, [])
+    assert "Cook more" not in render_advice_text(ADVICE)
+
+class FakePlaceholder:
+    def __init__(self):
+        self.renders = []
+
+    def markdown(self, text):
+        self.renders.append(text)
+
+def test_flush_is_throttled():
+    renderer = IncrementalAdviceRenderer(flush_interval=60, flush_chars=50)
+    placeholder = FakePlaceholder()
+
+    assert renderer.flush(placeholder)  # the first flush always renders
+    for chunk in random_chunks(ADVICE[:40], seed=1):
+        renderer.feed(chunk)
+        renderer.flush(placeholder)
+    assert len(placeholder.renders) == 1
+
+    renderer.feed(ADVICE[40:120])
+    assert renderer.flush(placeholder)
+    assert renderer.flush(placeholder, force=True)
+    assert placeholder.renders[-1] == renderer.text()
+
+@pytest.mark.parametrize("seed", range(10))
+def test_budget_parser_emits_categories_as_they_complete(seed):
+    advice = ADVICE.replace(
+        '{"Proposed Monthly Budget": {"Food": {"proposed_change": -50, "change_reason": "Cook more"}}}',
+        '{"Proposed Monthly Budget": {"Food": {"proposed_change": -50, "change_reason": "Cook, more {}"}, '
+        '"Rent": 0, "Fun": {"proposed_change": 20.5, "change_reason": "Say \\"hi\\""}}, "Notes": {"x": 1}}'
+    )
+    parser = BudgetStreamParser()
+    received = ""
+    completed = []
+    for chunk in random_chunks(advice, seed):
+        received += chunk
+        for category, _ in parser.feed(chunk):
+            completed.append((category, len(received)))
+
+    assert [category for category, _ in completed] == ["Food", "Rent", "Fun"]
+    # Each category is available before the response (and the JSON) is finished
+    assert completed[0][1] < advice.index('"Rent"') + 10
+    assert parser.complete and not parser.malformed
+    assert parser.categories == {
+        "Food": {"proposed_change": -50, "change_reason": "Cook, more {}"},
+        "Rent": 0,
+        "Fun": {"proposed_change": 20.5, "change_reason": 'Say "hi"'},
+    }
+
+def test_budget_parser_accepts_bare_object_in_code_fence():
+    parser = BudgetStreamParser()
+    parser.feed('---BUDGET_JSON_START---\n```json\n{"Food": 100, "Rent": {"proposed_change": 0}}\n```\n---BUDGET_JSON_END---')
+    assert parser.complete
+    assert parser.categories == {"Food": 100, "Rent": {"proposed_change": 0}}
+
+@pytest.mark.parametrize("budget, error", [
+    ("Here is your budget: {", "expected '{'"),
+    ('{"Proposed Monthly Budget": {"Food": {"proposed_change": 1]', "mismatched"),
+    ('{"Proposed Monthly Budget": {"Food": {"proposed_change": -50}, "Rent": {"proposed_change": lots}}', "invalid budget entry"),
+    ('{"Proposed Monthly Budget": ["Food"]}', "must be an object"),
+])
+def test_budget_parser_flags_malformed_json_early(budget, error):
+    parser = BudgetStreamParser()
+    parser.feed("Analysis...\n---BUDGET_JSON_START---\n" + budget)
+    assert parser.malformed
+    assert error in parser.error
+    assert parser.feed('"more": 1}') == []
+
+def test_malformed_budget_keeps_streaming_the_rest_of_the_advice():
+    def app():
+        from unittest.mock import patch
+        from app.api.models import UserDataInput
+        from app.ui import advice
+
+        chunks = ["Analysis...\n---BUDGET_JSON_START---\n", '{"Proposed Monthly Budget": ["Food"]}',
+                  "\n---BUDGET_JSON_END---\n", "More advice. ", "I'm excited to support you!"]
+        inputs = UserDataInput(
+            name="Jane", age=35, state="Texas", current_income=6000, current_savings=1000,
+            goals=["Save"], timeline_months=12, selected_llm="GPT-4",
+            bank_statement=[{"Date": "2023-05-02", "Description": "Groceries", "Deposits": 0,
+                             "Withdrawals": 500, "Category": "Food"}],
+        )
+        with patch.object(advice, "generate_advice_stream", lambda *args: iter(chunks)):
+            advice.generate_advice_ui(inputs)
+
+    at = AppTest.from_function(app)
+    at.run()
+    assert at.session_state.complete_advice.endswith("I'm excited to support you!")
+    assert any("malformed" in warning.value for warning in at.warning)
+    assert any("excited to support you" in markdown.value for markdown in at.markdown)
@@ -0,0 +1,152 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+import pytest
+from app.api.models import UserDataInput
+from app.services import recommender
+from app.services.advice_cache import AdviceCache, canonical_hash
+
+@pytest.fixture
+def user_data():
+    return UserDataInput(
+        name="Jane Doe",
+        age=35,
+        state="Texas",
+        current_income=6000,
+        current_savings=15000,
+        goals=["Save for a vacation"],
+        timeline_months=36,
+        bank_statement=[
+            {"Date": "2023-05-01", "Description": "Salary", "Deposits": 6000, "Withdrawals": 0, "Category": "Income"},
+            {"Date": "2023-05-02", "Description": "Groceries", "Deposits": 0, "Withdrawals": 500, "Category": "Food"},
+        ],
+        selected_llm="GPT-4",
+        constraints=["No roommates"],
+    )
+
+def counting_llm(chunks):
+    calls = []
+
+    def fake_call_llm_api(system_message, prompt, model_name):
+        calls.append(prompt)
+        yield from chunks
+
+    return fake_call_llm_api, calls
+
+def test_canonical_hash_ignores_key_order():
+    assert canonical_hash({"a": 1, "b": [1, 2]}) == canonical_hash({"b": [1, 2], "a": 1})
+    assert canonical_hash({"a": 1}) != canonical_hash({"a": 2})
+
+def test_memory_tier_lru():
+    cache = AdviceCache(max_memory_entries=2)
+    cache.put("a", ["1"])
+    cache.put("b", ["2"])
+    cache.get("a")
+    cache.put("c", ["3"])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == ["1"]
+    assert cache.get("c") == ["3"]
+
+def test_disk_tier_survives_restart(tmp_path):
+    db_path = str(tmp_path / "advice.sqlite3")
+    AdviceCache(db_path=db_path).put("key", ["Hello", " world"])
+
+    cache = AdviceCache(db_path=db_path)
+    assert cache.get("key") == ["Hello", " world"]
+    assert cache.get_stats()["disk_hits"] == 1
+    assert cache.get("key") == ["Hello", " world"]
+    assert cache.get_stats()["memory_hits"] == 1
+
+def test_ttl_expiry(tmp_path):
+    cache = AdviceCache(db_path=str(tmp_path / "advice.sqlite3"), ttl_seconds=60)
+    cache.put("key", ["stale"])
+
+    with patch("app.services.advice_cache.time.time", return_value=time.time() + 120):
+        assert cache.get("key") is None
+
+def test_disk_size_eviction(tmp_path):
+    chunk = "x" * 600
+    cache = AdviceCache(db_path=str(tmp_path / "advice.sqlite3"), max_memory_entries=0, max_disk_mb=1000 / (1024 * 1024))
+    cache.put("old", [chunk])
+    cache.put("new", [chunk])
+
+    assert cache.get("old") is None
+    assert cache.get("new") == [chunk]
+
+def test_generate_advice_stream_replays_cached_chunks(user_data):
+    fake_llm, calls = counting_llm(["Your ", "budget ", "looks good."])
+    with patch.object(recommender, "call_llm_api", fake_llm):
+        first = list(recommender.generate_advice_stream(user_data))
+        second = list(recommender.generate_advice_stream(user_data))
+
+    assert first == second == ["Your ", "budget ", "looks good."]
+    assert len(calls) == 1
+
+def test_follow_up_question_changes_key(user_data):
+    fake_llm, calls = counting_llm(["ok"])
+    with patch.object(recommender, "call_llm_api", fake_llm):
+        list(recommender.generate_advice_stream(user_data))
+        list(recommender.generate_advice_stream(user_data, "What about rent?"))
+
+    assert len(calls) == 2
+
+def test_error_responses_are_not_cached(user_data):
+    fake_llm, calls = counting_llm(["Partial ", "Error: rate limited"])
+    with patch.object(recommender, "call_llm_api", fake_llm):
+        list(recommender.generate_advice_stream(user_data))
+        list(recommender.generate_advice_stream(user_data))
+
+    assert len(calls) == 2
+
+def test_async_stream_shares_cache(user_data):
+    fake_llm, calls = counting_llm(["cached"])
+
+    async def collect():
+        return [chunk async for chunk in recommender.generate_advice_stream_async(user_data)]
+
+    with patch.object(recommender, "call_llm_api", fake_llm):
+        list(recommender.generate_advice_stream(user_data))
+
+    assert asyncio.run(collect()) == ["cached"]
+    assert len(calls) == 1
+
+def test_cache_is_built_lazily_and_memory_only_by_default(monkeypatch, tmp_path):
+    monkeypatch.delenv("ADVICE_CACHE_PATH", raising=False)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(recommender, "advice_cache", None)
+
+    cache = recommender.get_advice_cache()
+    assert recommender.get_advice_cache() is cache
+    assert cache._db is None
+    assert list(tmp_path.iterdir()) == []
+
+def test_async_stream_reads_and_writes_cache_off_the_event_loop(user_data, isolated_advice_cache):
+    calls = []
+    threads = []
+
+    async def fake_llm(system_message, prompt, model_name):
+        calls.append(prompt)
+        yield "fresh"
+
+    get, put = isolated_advice_cache.get, isolated_advice_cache.put
+
+    def record(method):
+        def wrapper(*args):
+            threads.append(threading.get_ident())
+            return method(*args)
+        return wrapper
+
+    async def collect():
+        return [chunk async for chunk in recommender.generate_advice_stream_async(user_data)]
+
+    with patch.object(recommender, "call_llm_api_async", fake_llm), \
+            patch.object(isolated_advice_cache, "get", record(get)), \
+            patch.object(isolated_advice_cache, "put", record(put)):
+        assert asyncio.run(collect()) == ["fresh"]
+        assert asyncio.run(collect()) == ["fresh"]
+
+    assert len(calls) == 1
+    assert len(threads) == 3
+    assert threading.get_ident() not in threads
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import httpx
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.api.main import app
+from app.services import batch_advice, http_client, model_handlers
+from app.services.batch_advice import BatchItemCounter
+from app.services.model_registry import ModelRegistry
+from app.services.recommender import call_llm_api_async
+
+def sse_body(tokens):
+    events = [
+        "data: " + json.dumps({"choices": [{"delta": {"content": token}}]})
+        for token in tokens
+    ]
+    return "\n\n".join(events + ["data: [DONE]"]) + "\n\n"
+
+def mock_openai(tokens, status_code=200):
+    requests = []
+
+    def handler(request):
+        requests.append(json.loads(request.content))
+        if status_code != 200:
+            return httpx.Response(status_code, text="rate limited")
+        return httpx.Response(200, text=sse_body(tokens), headers={"content-type": "text/event-stream"})
+
+    def create_client():
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    return patch.object(http_client, "create_client", create_client), requests
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+def sample_user_payload():
+    return {
+        "name": "Janet Audu",
+        "age": 30,
+        "state": "New York",
+        "current_income": 5000,
+        "current_savings": 10000,
+        "goals": ["Buy a house"],
+        "timeline_months": 60,
+        "bank_statement": [
+            {"Date": "2023-05-01", "Description": "Salary", "Deposits": 5000, "Withdrawals": 0, "Category": "Income"},
+            {"Date": "2023-05-02", "Description": "Rent", "Deposits": 0, "Withdrawals": 1500, "Category": "Housing"}
+        ],
+        "selected_llm": "GPT-4",
+    }
+
+def test_gpt4_async_parses_event_stream():
+    client_patch, requests = mock_openai(["Hello", " there", "!"])
+    with client_patch:
+        chunks = asyncio.run(collect(call_llm_api_async("system", "prompt", "GPT-4")))
+
+    assert chunks == ["Hello", " there", "!"]
+    assert requests[0]["stream"] is True
+    assert requests[0]["messages"][1] == {"role": "user", "content": "prompt"}
+
+def test_gpt4_async_reports_http_errors():
+    client_patch, _ = mock_openai([], status_code=429)
+    with client_patch:
+        chunks = asyncio.run(collect(call_llm_api_async("system", "prompt", "GPT-4")))
+
+    assert len(chunks) == 1
+    assert chunks[0].startswith("Error: OpenAI API returned 429")
+
+def test_backend_slot_bounds_concurrency(monkeypatch):
+    monkeypatch.setenv("LLM_CONCURRENCY_OPENAI", "2")
+    active = 0
+    peak = 0
+
+    async def worker():
+        nonlocal active, peak
+        async with http_client.backend_slot("openai"):
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    async def main():
+        await asyncio.gather(*(worker() for _ in range(10)))
+
+    asyncio.run(main())
+    assert peak == 2
+
+def test_huggingface_async_streams_tokens(tiny_gpt2):
+    registry = ModelRegistry(loader=lambda model_name: tiny_gpt2)
+    with patch.object(model_handlers, "model_registry", registry):
+        chunks = asyncio.run(collect(call_llm_api_async("system", "budget save", "gpt2")))
+    assert len(chunks) > 1
+
+def test_unsupported_model_async():
+    chunks = asyncio.run(collect(call_llm_api_async("system", "prompt", "llama")))
+    assert chunks == ["Unsupported model: llama"]
+
+def test_get_advice_endpoint_streams_async():
+    client_patch, requests = mock_openai(["Your", " budget"])
+    with client_patch, TestClient(app) as client:
+        response = client.post("/get_advice", json=sample_user_payload())
+
+    assert response.status_code == 200
+    assert response.text == "Your budget"
+    assert "Janet Audu" in requests[0]["messages"][1]["content"]
+
+def slow_advice_stream(delays, calls):
+    """Stand-in for generate_advice_stream_async: sleeps per user name and records concurrency."""
+    active = 0
+
+    async def stream(user_data, follow_up_question=None):
+        nonlocal active
+        active += 1
+        calls.append((user_data.name, active))
+        await asyncio.sleep(delays.get(user_data.name, 0))
+        active -= 1
+        if user_data.name == "Broken":
+            yield "Error: OpenAI API returned 500"
+            return
+        yield f"Advice for {user_data.name}"
+
+    return stream
+
+def batch_payload(names, **kwargs):
+    items = []
+    for name in names:
+        item = sample_user_payload()
+        item["name"] = name
+        items.append(item)
+    return {"items": items, **kwargs}
+
+def test_batch_advice_streams_ndjson_in_completion_order():
+    calls = []
+    stream = slow_advice_stream({"Slow": 0.2, "Fast": 0.0, "Broken": 0.05}, calls)
+    with patch.object(batch_advice, "generate_advice_stream_async", stream), TestClient(app) as client:
+        response = client.post("/batch_advice", json=batch_payload(["Slow", "Fast", "Slow", "Broken"]))
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = [json.loads(line) for line in response.text.splitlines()]
+
+    assert [result["index"] for result in results] == [1, 3, 0, 2]
+    assert results[0]["status"] == "ok" and results[0]["advice"] == "Advice for Fast"
+    assert results[1]["status"] == "error" and results[1]["error"].startswith("Error: OpenAI")
+    # The duplicate Slow record is generated once and shares the result
+    assert sorted(name for name, _ in calls) == ["Broken", "Fast", "Slow"]
+    assert results[2]["deduplicated"] is False and results[3]["deduplicated"] is True
+    assert results[3]["advice"] == "Advice for Slow"
+    assert results[2]["elapsed_seconds"] >= 0.2
+
+def test_batch_advice_bounds_concurrency():
+    calls = []
+    stream = slow_advice_stream({f"User {i}": 0.02 for i in range(8)}, calls)
+    with patch.object(batch_advice, "generate_advice_stream_async", stream), TestClient(app) as client:
+        response = client.post("/batch_advice", json=batch_payload([f"User {i}" for i in range(8)], max_concurrency=3))
+
+    assert len(response.text.splitlines()) == 8
+    assert max(active for _, active in calls) == 3
+
+def test_batch_advice_rejects_oversized_batches(monkeypatch):
+    monkeypatch.setenv("BATCH_ADVICE_MAX_ITEMS", "2")
+    with TestClient(app) as client:
+        assert client.post("/batch_advice", json=batch_payload(["A", "B", "C"])).status_code == 413
+        assert client.post("/batch_advice", json={"items": []}).status_code == 422
+        # Refused on the count alone, before the (invalid) records are validated
+        invalid = {"items": [{"name": "A"}] * 3}
+        assert client.post("/batch_advice", json=invalid).status_code == 413
+        assert client.post("/batch_advice", json={"items": [{"name": "A"}]}).status_code == 422
+        assert "/batch_advice" in client.get("/openapi.json").json()["paths"]
+
+def test_batch_item_counter_counts_streamed_records():
+    body = json.dumps({
+        "max_concurrency": 2,
+        "note": 'not "items": [1, 2]',
+        "items": [{"name": 'A ], [ "B'}, {"goals": ["x", "y"]}, {}],
+        "other": [1, 2, 3],
+    }, indent=1).encode()
+    for split in range(0, len(body), 7):
+        counter = BatchItemCounter()
+        counter.feed(body[:split])
+        assert counter.feed(body[split:]) == 3
+
+def test_batch_advice_deduplicates_backend_calls():
+    client_patch, requests = mock_openai(["Your", " budget"])
+    with client_patch, TestClient(app) as client:
+        response = client.post("/batch_advice", json=batch_payload(["Janet Audu", "Janet Audu"]))
+
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [result["advice"] for result in results] == ["Your budget", "Your budget"]
+    assert len(requests) == 1
@@ -0,0 +1,51 @@
+from benchmarks.bench_data_path import STAGES, compare, load_baseline, run_suite, save_baseline
+from benchmarks.bench_cpu_inference import MODES as CPU_MODES, run_suite as run_cpu_suite
+from benchmarks.bench_projection import run_suite as run_projection_suite
+from benchmarks.synthetic import CATEGORIES, stub_advice
+from app.ui.advice import BudgetStreamParser
+
+def test_stub_advice_proposes_a_budget_for_every_category():
+    parser = BudgetStreamParser()
+    parser.feed(stub_advice())
+    assert parser.complete
+    assert set(parser.categories) == set(CATEGORIES)
+
+def test_suite_runs_every_stage_offline(tmp_path):
+    results = run_suite([200], repeat=1)
+
+    assert [result["stage"] for result in results] == list(STAGES)
+    assert all(result["seconds"] > 0 and result["rows_per_second"] > 0 for result in results)
+
+    path = str(tmp_path / "baseline.json")
+    save_baseline(path, results)
+    assert set(load_baseline(path)) == {f"{stage}/200" for stage in STAGES}
+
+def test_compare_flags_slowdowns_and_memory_growth():
+    baseline = {
+        "ingest_csv/1000": {"seconds": 0.10, "peak_mb": 10.0},
+        "get_top_expenses/1000": {"seconds": 0.0001, "peak_mb": 1.0},
+    }
+    results = [
+        {"stage": "ingest_csv", "rows": 1000, "seconds": 0.20, "peak_mb": 30.0},
+        # Too fast to be a meaningful regression
+        {"stage": "get_top_expenses", "rows": 1000, "seconds": 0.0003, "peak_mb": 1.0},
+        {"stage": "analysis_page", "rows": 1000, "seconds": 1.0, "peak_mb": 1.0},
+    ]
+
+    regressions = compare(results, baseline, tolerance=0.25)
+    assert len(regressions) == 2
+    assert all(regression.startswith("ingest_csv @ 1000 rows") for regression in regressions)
+
+def test_cpu_inference_suite_covers_every_mode(tiny_gpt2):
+    results = run_cpu_suite(model=tiny_gpt2[1], prompt_tokens=8, new_tokens=4, repeat=1)
+
+    assert [result["mode"] for result in results] == CPU_MODES
+    assert all(result["tokens_per_second"] > 0 for result in results)
+    weights = {result["mode"]: result["weights_mb"] for result in results}
+    assert weights["int8"] < weights["baseline"] == weights["inference_mode"]
+
+def test_projection_suite_times_every_combination():
+    results = run_projection_suite(paths=[10, 20], months=[12], repeat=1)
+
+    assert [(result["months"], result["paths"]) for result in results] == [(12, 10), (12, 20)]
+    assert all(result["seconds"] > 0 for result in results)
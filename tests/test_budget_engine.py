@@ -0,0 +1,80 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from app.services.budget_engine import (
+    DISPLAY_COLUMNS, allocate, budget_total, compute_budget, format_budget, parse_proposal, percent_change,
+)
+
+PREVIOUS = pd.Series({"Rent": 1000.0, "Food": 400.0, "Fun": 200.0})
+
+def budget(data, income, previous=PREVIOUS):
+    proposal, _, _ = parse_proposal(data)
+    return compute_budget(proposal, previous, income).set_index("Category")
+
+def test_parse_proposal_collects_invalid_and_skipped_entries():
+    proposal, invalid, skipped = parse_proposal({
+        "Rent": {"proposed_change": "-100", "change_reason": "Move"},
+        "Food": {"proposed_change": "a lot"},
+        "Fun": 25,
+        "Income": 5000,
+        "Other": "n/a",
+    })
+    assert proposal["Category"].tolist() == ["Rent", "Food", "Fun"]
+    assert proposal["Change"].tolist() == [-100.0, 0.0, 25.0]
+    assert proposal["Change Reason"].tolist() == ["Move", "", ""]
+    assert invalid == ["Food"]
+    assert skipped == ["Other"]
+
+def test_compute_budget_keeps_numbers_and_adds_savings():
+    df = budget({"Rent": {"proposed_change": -100}, "Food": 50, "Travel": 100}, income=3000)
+    assert df["Proposed Change"].dtype == float
+    assert df.loc["Rent", "Proposed Change"] == 900.0
+    assert df.loc["Rent", "Amount Change"] == -100.0
+    assert df.loc["Food", "Percent Change"] == 12.5
+    assert math.isinf(df.loc["Travel", "Percent Change"])
+    assert df.loc["Savings", "Proposed Change"] == 3000 - 900 - 450 - 100
+    assert budget_total(df.reset_index()) == 3000
+
+def test_compute_budget_caps_spending_at_income():
+    df = budget({"Rent": {"proposed_change": 1000}, "Food": 0}, income=1200)
+    assert df.loc["Rent", "Proposed Change"] + df.loc["Food", "Proposed Change"] == 1200
+    assert df.loc["Rent", "Proposed Change"] / df.loc["Food", "Proposed Change"] == 2000 / 400
+    assert df.loc["Savings", "Proposed Change"] == 0
+
+def test_compute_budget_sorts_by_size_of_change():
+    df = compute_budget(parse_proposal({"Rent": -500, "Food": 40, "Fun": -10, "Savings": 0})[0], PREVIOUS, 10000)
+    assert df["Category"].tolist() == ["Rent", "Food", "Fun", "Savings"]
+
+def test_compute_budget_accepts_categorical_index():
+    previous = pd.Series([1000.0, 400.0], index=pd.CategoricalIndex(["Rent", "Food"]))
+    df = budget({"Rent": -100, "Gym": 30}, income=2000, previous=previous)
+    assert df.loc["Rent", "Previous Spend"] == 1000.0
+    assert df.loc["Gym", "Previous Spend"] == 0.0
+
+def test_allocate_evaluates_scenarios_like_single_budgets():
+    previous = np.array([1000.0, 400.0, 200.0])
+    rng = np.random.default_rng(0)
+    changes = rng.normal(0, 300, size=(50, 3))
+    incomes = rng.uniform(1000, 3000, size=50)
+    proposed, savings = allocate(previous, changes, incomes)
+    for row in range(50):
+        single, saved = allocate(previous, changes[row], incomes[row])
+        np.testing.assert_allclose(proposed[row], single)
+        assert savings[row] == saved
+    assert (proposed.sum(axis=1) <= incomes + 1e-9).all()
+
+def test_percent_change_rules():
+    result = percent_change(np.array([100.0, 0.0, 0.0]), np.array([150.0, 10.0, 0.0]))
+    assert result[0] == 50.0
+    assert math.isinf(result[1])
+    assert result[2] == 0.0
+
+def test_format_budget_renders_display_strings():
+    df = budget({"Rent": {"proposed_change": 234.5, "change_reason": "Lease"}}, income=5000).reset_index()
+    formatted = format_budget(df).set_index("Category")
+    assert list(format_budget(df).columns) == DISPLAY_COLUMNS
+    assert formatted.loc["Rent", "Proposed Change"] == "$1,234.50"
+    assert formatted.loc["Rent", "Percent Change"] == "23.45%"
+    assert formatted.loc["Savings", "Percent Change"] == "inf%"
@@ -0,0 +1,64 @@
+import pandas as pd
+import plotly.graph_objects as go
+
+from app.api.models import BankStatement
+from app.core.config import get_chart_settings
+from app.services.projection import Scenario
+from app.ui import charts
+from app.ui.charts import OTHER_CATEGORY, collapse_categories, expense_figure, line_trace, statement_aggregates
+
+def make_statement(categories=40, rows=2000):
+    return BankStatement(pd.DataFrame({
+        'Date': pd.date_range('2024-01-01', periods=rows, freq='h'),
+        'Description': ['Purchase'] * rows,
+        'Category': [f"Category {i % categories}" for i in range(rows)],
+        'Withdrawals': [float(i % 97) for i in range(rows)],
+        'Deposits': 0.0,
+    }))
+
+def test_collapse_categories_groups_the_long_tail():
+    totals = pd.Series({"Rent": 1000.0, "Food": 400.0, "Fun": 50.0, "Gym": 30.0, "Books": 20.0})
+    collapsed = collapse_categories(totals, 3)
+    assert list(collapsed.index) == ["Rent", "Food", OTHER_CATEGORY]
+    assert collapsed[OTHER_CATEGORY] == 100.0
+    assert collapsed.sum() == totals.sum()
+    assert list(collapse_categories(totals, 5).index) == ["Rent", "Food", "Fun", "Gym", "Books"]
+
+def test_expense_figure_is_capped_at_max_categories():
+    statement = make_statement(categories=300)
+    aggregates = statement_aggregates(statement)
+    fig = expense_figure(aggregates["categorized_expenses"], max_categories=12)
+    assert len(fig.data[0].labels) == 12
+    assert OTHER_CATEGORY in fig.data[0].labels
+    assert abs(sum(fig.data[0].values) - aggregates["total_expenses"]) < 1e-6
+
+def test_statement_aggregates_are_sorted_totals():
+    statement = make_statement()
+    aggregates = statement_aggregates(statement)
+    categorized = aggregates["categorized_expenses"]
+    assert aggregates["total_expenses"] == statement.total('Withdrawals')
+    assert categorized.is_monotonic_decreasing
+    assert categorized.sum() == aggregates["total_expenses"]
+    assert all(isinstance(name, str) for name in categorized.index)
+
+def test_long_lines_use_webgl(monkeypatch):
+    monkeypatch.setitem(charts.CHART_SETTINGS, "webgl_points", 100)
+    assert line_trace(100) is go.Scatter
+    assert line_trace(101) is go.Scattergl
+
+def test_savings_projection_is_downsampled(monkeypatch):
+    monkeypatch.setitem(charts.CHART_SETTINGS, "max_points", 50)
+    projection = charts.generate_savings_projection(1000, 100, 600, [Scenario("Invested", 0.05, 0.1)])
+    assert len(projection.months) == 50
+    assert projection.months[-1] == 600
+
+def test_long_timelines_use_webgl_with_default_settings():
+    settings = get_chart_settings()
+    assert settings["webgl_points"] <= settings["max_points"]
+    scenarios = [Scenario("Invested", 0.05, 0.1)]
+    for months, trace in ((60, go.Scatter), (600, go.Scattergl)):
+        fig, projection = charts._savings_projection(
+            ("webgl", months), scenarios, [], 1000, 100, months, settings["max_points"]
+        )
+        assert len(projection.months) <= settings["max_points"]
+        assert {type(data) for data in fig.data} == {trace}
@@ -0,0 +1,197 @@
+import asyncio
+import threading
+import pytest
+from unittest.mock import patch
+from app.api.models import UserDataInput
+from app.services import metrics, recommender
+from app.services.coalescing import AsyncSingleFlight, SingleFlight
+from app.services.recommender import generate_advice_stream, generate_advice_stream_async
+from tests.test_async_pipeline import sample_user_payload
+
+def gated_llm(tokens, calls, gate=None):
+    """Stand-in for call_llm_api that records each upstream call and waits on gate after the first chunk."""
+    def stream(system_message, prompt, model_name):
+        calls.append(model_name)
+        for index, token in enumerate(tokens):
+            yield token
+            if index == 0 and gate is not None:
+                gate.wait(5)
+    return stream
+
+def async_gated_llm(tokens, calls, gate):
+    async def stream(system_message, prompt, model_name):
+        calls.append(model_name)
+        for index, token in enumerate(tokens):
+            yield token
+            if index == 0:
+                await gate.wait()
+    return stream
+
+def test_identical_sync_requests_share_one_generation():
+    metrics.reset_metrics()
+    calls, gate = [], threading.Event()
+    user_data = UserDataInput(**sample_user_payload())
+    with patch.object(recommender, "call_llm_api", gated_llm(["Your", " budget", "!"], calls, gate)):
+        leader = generate_advice_stream(user_data)
+        assert next(leader) == "Your"
+        # A late joiner first receives the prefix buffered so far
+        follower = generate_advice_stream(user_data)
+        assert next(follower) == "Your"
+        gate.set()
+        assert "".join(leader) == " budget!"
+        assert "".join(follower) == " budget!"
+
+    assert calls == ["GPT-4"]
+    assert metrics.ADVICE_COALESCED_REQUESTS.value() == 1
+    assert recommender.advice_flights.in_flight() == 0
+    # The shared response was cached once, so the next identical request is a cache hit
+    assert "".join(generate_advice_stream(user_data)) == "Your budget!"
+    assert calls == ["GPT-4"]
+    metrics.reset_metrics()
+
+def test_different_requests_are_not_coalesced():
+    calls = []
+    first = UserDataInput(**sample_user_payload())
+    second = UserDataInput(**{**sample_user_payload(), "name": "Someone Else"})
+    with patch.object(recommender, "call_llm_api", gated_llm(["Advice"], calls)):
+        assert "".join(generate_advice_stream(first)) == "Advice"
+        assert "".join(generate_advice_stream(second)) == "Advice"
+    assert len(calls) == 2
+
+def test_identical_async_requests_share_one_generation():
+    calls = []
+    user_data = UserDataInput(**sample_user_payload())
+
+    async def main():
+        gate = asyncio.Event()
+        llm = async_gated_llm(["Your", " budget", "!"], calls, gate)
+        with patch.object(recommender, "call_llm_api_async", llm):
+            leader = generate_advice_stream_async(user_data)
+            assert await leader.__anext__() == "Your"
+            followers = [asyncio.create_task(collect(user_data)) for _ in range(3)]
+            await asyncio.sleep(0)
+            gate.set()
+            rest = "".join([chunk async for chunk in leader])
+            return rest, await asyncio.gather(*followers)
+
+    async def collect(user_data):
+        return "".join([chunk async for chunk in generate_advice_stream_async(user_data)])
+
+    rest, followers = asyncio.run(main())
+    assert rest == " budget!"
+    assert followers == ["Your budget!"] * 3
+    assert calls == ["GPT-4"]
+
+def test_errors_reach_every_subscriber_and_are_not_cached():
+    calls = []
+    user_data = UserDataInput(**sample_user_payload())
+    error = ["Error: OpenAI API returned 500"]
+    with patch.object(recommender, "call_llm_api", gated_llm(error, calls)):
+        assert "".join(generate_advice_stream(user_data)) == error[0]
+        assert "".join(generate_advice_stream(user_data)) == error[0]
+    assert len(calls) == 2
+
+def test_abandoned_flight_stops_upstream():
+    flights = SingleFlight()
+    produced, closed, stopped = [], threading.Event(), threading.Event()
+
+    def upstream():
+        try:
+            for index in range(1000):
+                produced.append(index)
+                yield str(index)
+                closed.wait(5)
+        finally:
+            stopped.set()
+
+    subscriber = flights.stream("key", upstream)
+    assert next(subscriber) == "0"
+    subscriber.close()
+    assert flights.in_flight() == 0
+    closed.set()
+
+    assert stopped.wait(5)
+    assert produced == [0, 1]
+
+def test_unread_streams_do_not_keep_a_flight_alive():
+    flights = SingleFlight()
+    calls, stopped = [], threading.Event()
+
+    def upstream():
+        calls.append(True)
+        try:
+            for index in range(1000):
+                yield str(index)
+                stopped.wait(0.01)
+        finally:
+            stopped.set()
+
+    flights.stream("key", upstream)  # Dropped without being read
+    assert flights.in_flight() == 0 and calls == []
+
+    unread = flights.stream("key", upstream)
+    subscriber = flights.stream("key", upstream)
+    assert next(subscriber) == "0"
+    subscriber.close()
+    assert stopped.wait(5)
+    assert flights.in_flight() == 0
+    assert calls == [True]
+    del unread
+
+def test_async_unread_streams_do_not_keep_a_flight_alive():
+    flights = AsyncSingleFlight()
+    stopped = []
+
+    async def upstream():
+        try:
+            yield "first"
+            await asyncio.sleep(10)
+        finally:
+            stopped.append(True)
+
+    async def main():
+        unread = flights.stream("key", upstream)
+        subscriber = flights.stream("key", upstream)
+        assert await subscriber.__anext__() == "first"
+        await subscriber.aclose()
+        await asyncio.sleep(0.01)
+        del unread
+        return flights.in_flight()
+
+    assert asyncio.run(main()) == 0
+    assert stopped == [True]
+
+def test_async_flight_is_cancelled_when_all_subscribers_leave():
+    flights = AsyncSingleFlight()
+    stopped = []
+
+    async def upstream():
+        try:
+            yield "first"
+            await asyncio.sleep(10)
+            yield "never"
+        finally:
+            stopped.append(True)
+
+    async def main():
+        subscriber = flights.stream("key", upstream)
+        assert await subscriber.__anext__() == "first"
+        await subscriber.aclose()
+        await asyncio.sleep(0.01)
+        return flights.in_flight()
+
+    assert asyncio.run(main()) == 0
+    assert stopped == [True]
+
+def test_upstream_exceptions_are_raised_to_subscribers():
+    flights = SingleFlight()
+
+    def upstream():
+        yield "partial"
+        raise RuntimeError("connection reset")
+
+    chunks = []
+    with pytest.raises(RuntimeError, match="connection reset"):
+        for chunk in flights.stream("key", upstream):
+            chunks.append(chunk)
+    assert chunks == ["partial"]
@@ -0,0 +1,42 @@
+import copy
+import pytest
+import torch
+from app.core.config import get_hf_inference_settings
+from app.services.cpu_inference import conv1d_to_linear, prepare_model
+from app.services.model_registry import model_nbytes
+
+def test_conv1d_conversion_preserves_outputs(tiny_gpt2):
+    _, model = tiny_gpt2
+    input_ids = torch.tensor([[1, 2, 3, 4]])
+    converted = conv1d_to_linear(copy.deepcopy(model))
+
+    assert isinstance(converted.transformer.h[0].attn.c_attn, torch.nn.Linear)
+    with torch.inference_mode():
+        assert torch.allclose(model(input_ids).logits, converted(input_ids).logits, atol=1e-5)
+
+def test_int8_mode_shrinks_linear_layers_and_still_generates(tiny_gpt2):
+    _, model = tiny_gpt2
+    quantized = prepare_model(copy.deepcopy(model), "int8")
+
+    assert type(quantized.transformer.h[0].mlp.c_fc).__module__.startswith("torch.ao.nn.quantized.dynamic")
+    assert model_nbytes(quantized) < model_nbytes(model)
+    with torch.inference_mode():
+        output = quantized.generate(torch.tensor([[1, 2, 3]]), max_new_tokens=4, min_new_tokens=4,
+                                    do_sample=False, pad_token_id=0)
+    assert output.shape == (1, 7)
+
+def test_unknown_mode_is_rejected(tiny_gpt2):
+    with pytest.raises(ValueError, match="HF_INFERENCE_MODE"):
+        prepare_model(tiny_gpt2[1], "fp8")
+
+def test_threads_are_shared_between_workers(monkeypatch):
+    monkeypatch.setattr("os.cpu_count", lambda: 16)
+    monkeypatch.delenv("HF_TORCH_THREADS", raising=False)
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    assert get_hf_inference_settings()["threads"] == 0
+
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert get_hf_inference_settings()["threads"] == 4
+
+    monkeypatch.setenv("HF_TORCH_THREADS", "2")
+    assert get_hf_inference_settings()["threads"] == 2
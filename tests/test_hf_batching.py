@@ -0,0 +1,97 @@
+import threading
+import pytest
+import torch
+from unittest.mock import patch
+from app.services import metrics, model_handlers
+from app.services.hf_batching import MicroBatcher
+from app.services.model_registry import ModelRegistry
+
+class ScriptedModel:
+    """Stands in for model.generate: streams a fixed token per row and step, honouring per-row stopping."""
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.calls = []
+
+    def generate(self, input_ids, attention_mask, streamer, stopping_criteria, **kwargs):
+        self.calls.append((input_ids.tolist(), attention_mask.tolist()))
+        streamer.put(input_ids)
+        for step in self.steps:
+            streamer.put(torch.tensor(step))
+            if all(stopping_criteria(input_ids, None)):
+                break
+        streamer.end()
+
+def submit(batcher, tokenizer, model, prompt, max_new_tokens=10):
+    return batcher.submit("gpt2", tokenizer, model, tokenizer(prompt, return_tensors="pt"), max_new_tokens)
+
+@pytest.fixture
+def wide_window(monkeypatch):
+    monkeypatch.setenv("HF_BATCH_WINDOW_MS", "200")
+
+def test_concurrent_requests_share_one_padded_generation(tiny_gpt2, wide_window):
+    tokenizer, _ = tiny_gpt2
+    ids = {word: tokenizer.convert_tokens_to_ids(word) for word in ["budget", "save", "rent", "food"]}
+    eos = tokenizer.eos_token_id
+    model = ScriptedModel([[ids["save"], ids["rent"]], [eos, ids["food"]], [eos, eos]])
+    batcher = MicroBatcher()
+
+    first = submit(batcher, tokenizer, model, "budget")
+    second = submit(batcher, tokenizer, model, "budget save rent")
+
+    assert "".join(first.stream(5)) == "save"
+    assert "".join(second.stream(5)) == "rent food"
+    [(input_ids, attention_mask)] = model.calls
+    # The shorter prompt is padded on the left
+    assert input_ids[0] == [eos, eos, ids["budget"]]
+    assert attention_mask == [[0, 0, 1], [1, 1, 1]]
+
+def test_rows_stop_at_their_token_limit(tiny_gpt2, wide_window):
+    tokenizer, _ = tiny_gpt2
+    token = tokenizer.convert_tokens_to_ids("save")
+    model = ScriptedModel([[token]] * 10)
+
+    request = submit(MicroBatcher(), tokenizer, model, "budget", max_new_tokens=3)
+
+    assert "".join(request.stream(5)) == "save save save"
+
+def test_abandoned_request_does_not_stop_the_batch(tiny_gpt2, wide_window):
+    tokenizer, _ = tiny_gpt2
+    token = tokenizer.convert_tokens_to_ids("save")
+    gate = threading.Event()
+
+    class GatedModel(ScriptedModel):
+        def generate(self, input_ids, attention_mask, streamer, stopping_criteria, **kwargs):
+            gate.wait(5)
+            return super().generate(input_ids, attention_mask, streamer, stopping_criteria, **kwargs)
+
+    model = GatedModel([[token, token]] * 4)
+    batcher = MicroBatcher()
+    leaving = submit(batcher, tokenizer, model, "budget")
+    staying = submit(batcher, tokenizer, model, "rent")
+    leaving.cancel()
+    gate.set()
+
+    assert "".join(staying.stream(5)) == "save save save save"
+    assert leaving.generated == []
+
+def test_tiny_gpt2_batches_concurrent_streams(tiny_gpt2, wide_window):
+    metrics.reset_metrics()
+    registry = ModelRegistry(loader=lambda model_name: tiny_gpt2)
+    results = {}
+
+    def generate(prompt):
+        results[prompt] = list(model_handlers.handle_huggingface_model_stream(prompt, "gpt2"))
+
+    with patch.object(model_handlers, "model_registry", registry):
+        registry.get("gpt2")
+        threads = [threading.Thread(target=generate, args=(prompt,)) for prompt in ["budget", "save rent", "food"]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+
+    assert all(isinstance(chunk, str) and chunk for chunks in results.values() for chunk in chunks)
+    assert len(results) == 3
+    assert metrics.HF_BATCH_SIZE.snapshot()[("gpt2",)]["sum"] == 3
+    metrics.reset_metrics()
@@ -0,0 +1,84 @@
+import asyncio
+import json
+import time
+import httpx
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.api.main import app
+from app.services import http_client
+from app.services.recommender import call_llm_api_async
+from benchmarks.load_test import build_payloads, is_error_response, run_load, summarize
+from benchmarks.stub_openai import CassetteStore, StubConfig, create_stub_app, request_key, tokenize
+from benchmarks.synthetic import stub_advice
+
+def stub_transport(stub_app):
+    def create_client():
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=stub_app), base_url="http://stub")
+    return patch.object(http_client, "create_client", create_client)
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+def test_stub_speaks_the_streaming_protocol():
+    with stub_transport(create_stub_app()):
+        chunks = asyncio.run(collect(call_llm_api_async("system", "prompt", "GPT-4")))
+    assert "".join(chunks) == stub_advice()
+    assert chunks == tokenize(stub_advice())
+
+def test_stub_paces_tokens():
+    stub = create_stub_app(StubConfig(ttft_ms=50, tokens_per_second=2000))
+    start = time.perf_counter()
+    with TestClient(stub) as client:
+        response = client.post("/v1/chat/completions", json={"model": "gpt-4", "messages": [], "stream": True})
+    elapsed = time.perf_counter() - start
+
+    events = [line for line in response.text.splitlines() if line.startswith("data:")]
+    assert events[-1] == "data: [DONE]"
+    assert elapsed >= 0.05 + (len(tokenize(stub_advice())) - 1) / 2000
+
+def test_stub_injects_errors():
+    stub = create_stub_app(StubConfig(error_rate=1.0, error_status=429))
+    with TestClient(stub) as client:
+        response = client.post("/v1/chat/completions", json={"messages": [], "stream": True})
+        assert response.status_code == 429
+        assert client.get("/stats").json()["errors_injected"] == 1
+
+def test_stub_replays_cassettes(tmp_path):
+    body = {"model": "gpt-4", "messages": [{"role": "user", "content": "hi"}], "stream": True}
+    CassetteStore(str(tmp_path)).save(request_key(body), ["Recorded", " answer"], [0.01, 0.02])
+
+    stub = create_stub_app(StubConfig(cassette_dir=str(tmp_path)))
+    with TestClient(stub) as client:
+        response = client.post("/v1/chat/completions", json=body)
+        # Unknown requests fall back to the recorded responses round-robin
+        other = client.post("/v1/chat/completions", json={**body, "messages": []})
+
+    contents = [
+        json.loads(line[len("data:"):])["choices"][0]["delta"].get("content")
+        for line in response.text.splitlines() if line.startswith("data:") and "[DONE]" not in line
+    ]
+    assert contents == ["Recorded", " answer", None]
+    assert "Recorded" in other.text
+
+def test_only_in_band_error_chunks_count_as_errors():
+    assert not is_error_response(200, "Avoid the Error: overdraft fees add up.", "add up.")
+    assert is_error_response(200, "Error generating advice: boom", "Error generating advice: boom")
+    assert is_error_response(200, "Your budget Error: rate limited", "Error: rate limited")
+    assert is_error_response(500, "ok", "ok")
+    assert is_error_response(200, "", "")
+
+def test_load_generator_drives_the_app_end_to_end():
+    async def drive():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            return await run_load(client, "/get_advice", build_payloads(rows=50), concurrency=4, total_requests=12)
+
+    with stub_transport(create_stub_app(StubConfig(error_rate=0.25, seed=3))):
+        results, wall = asyncio.run(drive())
+
+    summary = summarize(results, wall)
+    assert summary["requests"] == 12
+    assert 0 < summary["errors"] < 12
+    assert summary["latency_ms"]["p50"] is not None
+    assert summary["latency_ms"]["p50"] <= summary["latency_ms"]["p99"]
+    assert summary["tokens_per_second_total"] > 0
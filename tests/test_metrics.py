@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from app.api.main import app
+from app.services import metrics
+from app.services.metrics import Counter, Histogram, instrument_async_stream, instrument_stream
+from app.services.model_registry import ModelRegistry
+from app.services.recommender import call_llm_api, generate_advice_stream_async
+from tests.test_async_pipeline import mock_openai, sample_user_payload
+from tests.test_models import make_user_data
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    metrics.reset_metrics()
+    yield
+    metrics.reset_metrics()
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("demo_seconds", "Demo.", ("backend",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value, backend="openai")
+
+    lines = histogram.render()
+    assert 'demo_seconds_bucket{backend="openai",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{backend="openai",le="1"} 3' in lines
+    assert 'demo_seconds_bucket{backend="openai",le="+Inf"} 4' in lines
+    assert 'demo_seconds_count{backend="openai"} 4' in lines
+    assert histogram.snapshot()[("openai",)]["p50"] == 1.0
+
+def test_counter_accumulates_per_label_set():
+    counter = Counter("demo_total", "Demo.", ("result",))
+    counter.inc(result="hit")
+    counter.inc(2, result="hit")
+    counter.inc(result="miss")
+    assert counter.value(result="hit") == 3
+    assert 'demo_total{result="miss"} 1' in counter.render()
+
+def test_snapshots_are_copies_safe_to_iterate_during_updates():
+    counter = Counter("demo_total", "Demo.", ("result",))
+    histogram = Histogram("demo_seconds", "Demo.", ("backend",))
+    counter.inc(result="0")
+    histogram.observe(0.1, backend="0")
+    snapshot, series = counter.snapshot(), histogram.series()
+    for key in snapshot:
+        counter.inc(result=f"new {key}")
+    for key in series:
+        histogram.observe(0.2, backend=f"new {key}")
+    histogram.observe(0.3, backend="0")
+    assert snapshot == {("0",): 1}
+    assert series[("0",)][2] == 1
+
+    # New label sets appear while the metrics are summarized and rendered
+    def update():
+        for index in range(20000):
+            metrics.TOKENS.inc(backend=str(index))
+            metrics.PROMPT_TOKENS.observe(1, backend=str(index % 50))
+
+    writer = threading.Thread(target=update)
+    writer.start()
+    while writer.is_alive():
+        metrics.summarize()
+        metrics.render_metrics()
+    writer.join()
+
+def test_instrumented_stream_records_latency_and_tokens():
+    chunks = list(instrument_stream("openai", iter(["a", "b", "c"])))
+
+    assert chunks == ["a", "b", "c"]
+    assert metrics.TIME_TO_FIRST_TOKEN_SECONDS.snapshot()[("openai",)]["count"] == 1
+    assert metrics.INTER_TOKEN_SECONDS.snapshot()[("openai",)]["count"] == 2
+    assert metrics.TOKENS.value(backend="openai") == 3
+    assert metrics.BACKEND_REQUESTS.value(backend="openai", outcome="ok") == 1
+
+    async def failing():
+        yield "partial"
+        yield "Error: upstream failed"
+
+    async def collect():
+        return [chunk async for chunk in instrument_async_stream("openai", failing())]
+
+    asyncio.run(collect())
+    assert metrics.BACKEND_REQUESTS.value(backend="openai", outcome="error") == 1
+
+def test_advice_stream_records_prompt_and_cache():
+    user_data = make_user_data()
+    client_patch, requests = mock_openai(["Your", " budget"])
+
+    async def collect():
+        first = [chunk async for chunk in generate_advice_stream_async(user_data)]
+        second = [chunk async for chunk in generate_advice_stream_async(user_data)]
+        return first, second
+
+    with client_patch:
+        first, second = asyncio.run(collect())
+
+    assert first == second == ["Your", " budget"]
+    assert len(requests) == 1
+    assert metrics.PROMPT_BUILD_SECONDS.snapshot()[()]["count"] == 1
+    assert metrics.ADVICE_CACHE_REQUESTS.value(result="miss") == 1
+    assert metrics.ADVICE_CACHE_REQUESTS.value(result="hit") == 1
+    assert metrics.BACKEND_REQUESTS.value(backend="openai", outcome="ok") == 1
+    assert "advice_time_to_first_token_seconds[openai] n=1" in metrics.summarize()
+
+def test_model_loads_are_timed(tiny_gpt2):
+    registry = ModelRegistry(loader=lambda model_name: tiny_gpt2)
+    registry.get("gpt2")
+    registry.get("gpt2")
+    assert metrics.MODEL_LOAD_SECONDS.snapshot()[("gpt2",)]["count"] == 1
+
+def test_unsupported_model_is_counted():
+    assert list(call_llm_api("system", "prompt", "llama")) == ["Unsupported model: llama"]
+    assert metrics.BACKEND_REQUESTS.value(backend="unsupported", outcome="error") == 1
+
+def test_metrics_endpoint_exports_backend_latency():
+    client_patch, _ = mock_openai(["Your", " budget"])
+    with client_patch, TestClient(app) as client:
+        client.post("/get_advice", json=sample_user_payload())
+        response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE advice_time_to_first_token_seconds histogram" in response.text
+    assert 'advice_tokens_total{backend="openai"} 2' in response.text
+    assert 'advice_backend_wait_seconds_count{backend="openai"} 1' in response.text
+    assert 'advice_cache_requests_total{result="miss"} 1' in response.text
@@ -0,0 +1,41 @@
+import threading
+import pytest
+from unittest.mock import patch
+from app.services import model_handlers
+from app.services.model_registry import ModelRegistry
+from app.services.recommender import call_llm_api
+
+@pytest.fixture
+def tiny_registry(tiny_gpt2):
+    registry = ModelRegistry(loader=lambda model_name: tiny_gpt2)
+    with patch.object(model_handlers, "model_registry", registry):
+        yield registry
+
+def test_stream_yields_tokens_incrementally(tiny_registry):
+    chunks = list(model_handlers.handle_huggingface_model_stream("budget save rent", "gpt2"))
+
+    assert len(chunks) > 1
+    assert all(isinstance(chunk, str) and chunk for chunk in chunks)
+    # The prompt is not echoed back
+    assert not "".join(chunks).startswith("budget save rent")
+
+def test_call_llm_api_streams_hf_models(tiny_registry):
+    chunks = list(call_llm_api("system", "budget save rent", "distilgpt2"))
+    assert len(chunks) > 1
+
+def test_closing_stream_stops_generation(tiny_registry):
+    stream = model_handlers.handle_huggingface_model_stream("budget save rent", "gpt2")
+    next(stream)
+    stream.close()
+
+    # Only the main thread should remain once the worker notices the stop signal
+    for thread in threading.enumerate():
+        if thread is not threading.main_thread() and thread.daemon:
+            thread.join(timeout=10)
+            assert not thread.is_alive()
+
+def test_generation_errors_are_reported(tiny_registry, tiny_gpt2):
+    _, model = tiny_gpt2
+    with patch.object(model, "generate", side_effect=ValueError("boom")):
+        chunks = list(call_llm_api("system", "budget", "gpt2"))
+    assert chunks == ["Error processing gpt2: boom"]
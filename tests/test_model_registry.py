@@ -0,0 +1,77 @@
+import threading
+import pytest
+import torch
+from app.services.model_registry import ModelRegistry, model_nbytes
+
+def make_loader(sizes=None):
+    calls = []
+
+    def loader(model_name):
+        calls.append(model_name)
+        features = (sizes or {}).get(model_name, 4)
+        return f"tokenizer-{model_name}", torch.nn.Linear(features, features)
+
+    return loader, calls
+
+def test_get_loads_once_and_counts_hits():
+    loader, calls = make_loader()
+    registry = ModelRegistry(max_models=2, loader=loader)
+
+    first = registry.get("gpt2")
+    second = registry.get("gpt2")
+
+    assert first is not None and first[1] is second[1]
+    assert calls == ["gpt2"]
+    stats = registry.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert "gpt2" in stats["load_seconds"]
+
+def test_lru_eviction_by_model_count():
+    loader, calls = make_loader()
+    registry = ModelRegistry(max_models=2, loader=loader)
+
+    registry.get("gpt2")
+    registry.get("distilgpt2")
+    registry.get("gpt2")  # distilgpt2 is now least recently used
+    registry.get("tiny")
+
+    assert "gpt2" in registry
+    assert "tiny" in registry
+    assert "distilgpt2" not in registry
+    assert registry.get_stats()["evictions"] == 1
+
+def test_memory_cap_evicts_oldest():
+    loader, _ = make_loader({"small": 8, "large": 256})
+    large_mb = model_nbytes(torch.nn.Linear(256, 256)) / (1024 * 1024)
+    registry = ModelRegistry(max_models=5, max_memory_mb=large_mb, loader=loader)
+
+    registry.get("small")
+    registry.get("large")
+
+    assert registry.get_stats()["resident_models"] == ["large"]
+
+def test_concurrent_misses_load_once():
+    loader, calls = make_loader()
+    registry = ModelRegistry(loader=loader)
+    threads = [threading.Thread(target=registry.get, args=("gpt2",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["gpt2"]
+    assert registry.get_stats()["hits"] == 7
+
+def test_warm_up_logs_failures():
+    def loader(model_name):
+        if model_name == "missing":
+            raise OSError("not found")
+        return "tokenizer", torch.nn.Linear(2, 2)
+
+    registry = ModelRegistry(loader=loader)
+    registry.warm_up(["missing", "gpt2"])
+    assert registry.get_stats()["resident_models"] == ["gpt2"]
+
+    with pytest.raises(OSError):
+        registry.get("missing")
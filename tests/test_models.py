@@ -0,0 +1,77 @@
+import datetime
+import pandas as pd
+import pytest
+from pydantic import ValidationError
+from app.api.models import BankStatement, BankStatementEntry, UserDataInput
+from app.services.recommender import get_top_expenses, prepare_user_context
+
+ENTRIES = [
+    {"Date": "2023-05-01", "Description": "Salary", "Deposits": 6000, "Withdrawals": 0, "Category": "Income"},
+    {"Date": "2023-05-02", "Description": "Groceries", "Deposits": 0, "Withdrawals": 500, "Category": "Food"},
+    {"Date": "2023-05-03", "Description": "Rent", "Deposits": 0, "Withdrawals": 1500, "Category": "Housing"},
+    {"Date": "2023-05-04", "Description": "Market", "Deposits": 0, "Withdrawals": 120.5, "Category": "Food"},
+]
+
+def make_user_data(bank_statement=ENTRIES):
+    return UserDataInput(
+        name="Jane Doe", age=35, state="Texas", current_income=6000, current_savings=15000,
+        goals=["Save for a vacation"], timeline_months=36, bank_statement=bank_statement, selected_llm="GPT-4",
+    )
+
+def test_json_entries_become_columnar_statement():
+    user_data = make_user_data()
+    statement = user_data.bank_statement
+
+    assert isinstance(statement, BankStatement)
+    assert len(statement) == 4
+    frame = statement.to_frame()
+    assert str(frame['Category'].dtype) == 'category'
+    assert frame['Withdrawals'].sum() == pytest.approx(2120.5)
+
+def test_entry_views_are_compatible():
+    statement = make_user_data().bank_statement
+
+    first = statement[0]
+    assert isinstance(first, BankStatementEntry)
+    assert first.Date == datetime.date(2023, 5, 1)
+    assert [entry.Category for entry in statement] == ["Income", "Food", "Housing", "Food"]
+    assert statement[-1].Withdrawals == 120.5
+    assert [entry.Description for entry in statement[1:3]] == ["Groceries", "Rent"]
+
+def test_dataframe_and_statement_inputs_skip_revalidation():
+    frame = pd.DataFrame(ENTRIES)
+    frame['Date'] = pd.to_datetime(frame['Date'])
+    from_frame = make_user_data(frame).bank_statement
+    assert from_frame.fingerprint() == make_user_data().bank_statement.fingerprint()
+
+    statement = BankStatement.from_frame(frame)
+    assert make_user_data(statement).bank_statement is statement
+
+def test_serialization_round_trip():
+    user_data = make_user_data()
+    dumped = user_data.to_dict()
+
+    assert dumped['bank_statement'][2] == {
+        "Date": datetime.date(2023, 5, 3), "Description": "Rent", "Category": "Housing",
+        "Withdrawals": 1500.0, "Deposits": 0.0,
+    }
+    assert UserDataInput.model_validate_json(user_data.model_dump_json()).bank_statement.fingerprint() == \
+        user_data.bank_statement.fingerprint()
+
+def test_empty_statement_rejected():
+    with pytest.raises(ValidationError):
+        make_user_data([])
+
+def test_fingerprint_changes_with_content():
+    changed = [dict(entry) for entry in ENTRIES]
+    changed[1]["Withdrawals"] = 501
+    assert make_user_data(changed).bank_statement.fingerprint() != make_user_data().bank_statement.fingerprint()
+
+def test_analytics_use_columnar_statement():
+    user_data = make_user_data()
+
+    assert get_top_expenses(user_data.bank_statement) == "Housing: $1500.00\nFood: $620.50"
+    assert get_top_expenses(list(user_data.bank_statement)) == "Housing: $1500.00\nFood: $620.50"
+    context = prepare_user_context(user_data)
+    assert context["expenses"] == pytest.approx(2120.5)
+    assert context["state"] == "Texas"
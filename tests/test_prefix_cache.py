@@ -0,0 +1,118 @@
+import pytest
+import torch
+from unittest.mock import patch
+from app.services import metrics, model_handlers
+from app.services.hf_batching import MicroBatcher
+from app.services.model_handlers import encode_prompt_with_prefix
+from app.services.prefix_cache import PROMPT_PREFIX_END, PrefixCache, split_prompt
+from app.services.recommender import build_prompt
+from tests.test_async_pipeline import sample_user_payload
+from app.api.models import UserDataInput
+
+PROMPT = "budget save rent food " * 4 + PROMPT_PREFIX_END + "income w1 w2 w3"
+
+@pytest.fixture
+def fresh_prefix_cache():
+    cache = PrefixCache(max_entries=2)
+    with patch.object(model_handlers, "prefix_cache", cache):
+        yield cache
+
+def last_logits(model, **kwargs):
+    with torch.inference_mode():
+        return model(**kwargs).logits[:, -1]
+
+def test_prompts_share_their_instruction_prefix():
+    prefixes = set()
+    for name, llm in [("Janet Audu", "GPT-4"), ("Someone Else", "GPT-4"), ("Janet Audu", "gpt2")]:
+        user_data = UserDataInput(**{**sample_user_payload(), "name": name, "selected_llm": llm})
+        plan = build_prompt(user_data, "Investopedia.com")
+        prefix, rest = split_prompt(plan["prompt"])
+        assert "---BUDGET_JSON_END---" in prefix and name in rest and name not in prefix
+        prefixes.add((plan["template"], prefix, plan["system_message"]))
+    # One prefix per template, independent of the client
+    assert len(prefixes) == 2
+
+def test_cached_prefix_gives_the_same_next_token_distribution(tiny_gpt2, fresh_prefix_cache):
+    tokenizer, model = tiny_gpt2
+    inputs, _, entry = encode_prompt_with_prefix(tokenizer, model, PROMPT)
+
+    assert entry is not None
+    full = last_logits(model, **inputs)
+    rest = inputs["input_ids"][:, entry.length:]
+    reused = last_logits(model, input_ids=rest, past_key_values=entry.past_key_values,
+                         attention_mask=inputs["attention_mask"])
+    assert torch.allclose(full, reused, atol=1e-5)
+
+def test_prefix_is_computed_once_per_model(tiny_gpt2, fresh_prefix_cache):
+    tokenizer, model = tiny_gpt2
+    metrics.reset_metrics()
+    first = encode_prompt_with_prefix(tokenizer, model, PROMPT)[2]
+    second = encode_prompt_with_prefix(tokenizer, model, PROMPT.replace("w1", "w4"))[2]
+
+    assert first is second
+    assert metrics.PREFIX_CACHE_REQUESTS.value(result="hit") == 1
+    assert metrics.PREFIX_CACHE_REQUESTS.value(result="miss") == 1
+    metrics.reset_metrics()
+
+def test_prompts_without_a_prefix_are_encoded_whole(tiny_gpt2, fresh_prefix_cache):
+    tokenizer, model = tiny_gpt2
+    inputs, _, entry = encode_prompt_with_prefix(tokenizer, model, "budget save rent")
+    assert entry is None and inputs["input_ids"].shape[1] == 3
+
+    with patch.object(model_handlers, "prefix_cache", PrefixCache(max_entries=0)):
+        assert encode_prompt_with_prefix(tokenizer, model, PROMPT)[2] is None
+
+def test_overlong_prompts_keep_the_prefix_and_their_end(tiny_gpt2, fresh_prefix_cache):
+    tokenizer, model = tiny_gpt2
+    prompt = PROMPT + " w5" * 300 + " budget save"
+    inputs, max_new_tokens, entry = encode_prompt_with_prefix(tokenizer, model, prompt)
+
+    assert inputs["input_ids"].shape[1] == model.config.n_positions - max_new_tokens
+    assert torch.equal(inputs["input_ids"][:, :entry.length], entry.input_ids)
+    assert tokenizer.decode(inputs["input_ids"][0][-2:]) == "budget save"
+
+def test_overlong_prompts_keep_the_prefix_without_the_cache(tiny_gpt2):
+    tokenizer, model = tiny_gpt2
+    prompt = PROMPT + " w5" * 300 + " budget save"
+    prefix_ids = tokenizer(split_prompt(prompt)[0], return_tensors="pt")["input_ids"]
+
+    with patch.object(model_handlers, "prefix_cache", PrefixCache(max_entries=0)):
+        inputs, max_new_tokens, entry = encode_prompt_with_prefix(tokenizer, model, prompt)
+
+    assert entry is None
+    assert inputs["input_ids"].shape[1] == inputs["attention_mask"].shape[1] == model.config.n_positions - max_new_tokens
+    assert torch.equal(inputs["input_ids"][:, :prefix_ids.shape[1]], prefix_ids)
+    assert tokenizer.decode(inputs["input_ids"][0][-2:]) == "budget save"
+
+def test_batched_rows_reuse_the_prefix(tiny_gpt2, fresh_prefix_cache, monkeypatch):
+    monkeypatch.setenv("HF_BATCH_WINDOW_MS", "200")
+    tokenizer, model = tiny_gpt2
+    seen = {}
+    original_generate = model.generate
+
+    def generate(**kwargs):
+        seen.update(kwargs)
+        return original_generate(**kwargs)
+
+    prefix = split_prompt(PROMPT)[0]
+    batcher = MicroBatcher()
+    with patch.object(model, "generate", side_effect=generate):
+        requests = []
+        for rest in ["income", "income w1 w2 w3"]:
+            inputs, _, entry = encode_prompt_with_prefix(tokenizer, model, prefix + rest)
+            requests.append(batcher.submit("gpt2", tokenizer, model, inputs, 4, entry))
+        outputs = ["".join(request.stream(10)) for request in requests]
+
+    assert all(outputs)
+    assert seen["past_key_values"][0][0].shape[0] == 2
+    # Padding sits between the shared prefix and the shorter row's own tokens
+    mask = seen["attention_mask"][0].tolist()
+    assert mask == [1] * entry.length + [0, 0, 0] + [1]
+
+    # The padded row sees the same next-token distribution as when run alone
+    alone_inputs, _, _ = encode_prompt_with_prefix(tokenizer, model, prefix + "income")
+    # Positions follow the attention mask, as generate derives them
+    position_ids = (seen["attention_mask"].cumsum(-1) - 1).clamp(min=0)[:, entry.length:]
+    batched = last_logits(model, input_ids=seen["input_ids"][:, entry.length:], position_ids=position_ids,
+                          past_key_values=entry.expand(2), attention_mask=seen["attention_mask"])
+    assert torch.allclose(batched[0], last_logits(model, **alone_inputs)[0], atol=1e-4)
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from app.services.projection import SavingsGoal, Scenario, band_months, monthly_rate, project_savings, simulate
+from app.ui.layout import projection_scenarios
+
+def recursive_projection(current_savings, monthly_savings, months, scenario):
+    """Month-by-month reference for a deterministic scenario."""
+    rate = monthly_rate(scenario.annual_return)
+    growth = monthly_rate(scenario.income_growth)
+    inflation = monthly_rate(scenario.inflation)
+    balance, balances = current_savings, [current_savings]
+    for month in range(1, months + 1):
+        contribution = monthly_savings * (1 + scenario.contribution_change) * (1 + growth) ** (month - 1)
+        balance = balance * (1 + rate) + contribution
+        balances.append(balance / (1 + inflation) ** month)
+    return np.array(balances)
+
+def test_baseline_matches_linear_projection():
+    projection = project_savings(10000, 500, 36, max_points=37)
+    assert list(projection.months) == list(range(37))
+    np.testing.assert_allclose(projection.band(0, 50), 10000 + 500 * np.arange(37))
+    np.testing.assert_allclose(projection.band(0, 10), projection.band(0, 90))
+
+def test_deterministic_scenarios_match_recursion():
+    scenarios = [
+        Scenario("Cash", 0.03, inflation=0.025),
+        Scenario("Raise", 0.05, income_growth=0.04, contribution_change=0.1),
+        Scenario("Debt", -0.02),
+    ]
+    balances = simulate(2500, 300, 120, scenarios, paths=1)
+    assert balances.shape == (3, 1, 121)
+    for index, scenario in enumerate(scenarios):
+        np.testing.assert_allclose(balances[index, 0], recursive_projection(2500, 300, 120, scenario))
+
+def test_monte_carlo_bands_are_ordered_and_centered():
+    scenario = Scenario("Invested", 0.06, 0.15)
+    projection = project_savings(10000, 500, 240, [scenario], paths=4000)
+    low, median, high = (projection.band(0, p) for p in (10, 50, 90))
+    assert (low <= median).all() and (median <= high).all()
+    assert high[-1] > low[-1]
+    expected = recursive_projection(10000, 500, 240, Scenario("Mean", 0.06))[-1]
+    assert projection.mean[0, -1] == pytest.approx(expected, rel=0.05)
+
+def test_simulation_is_reproducible_for_a_seed():
+    scenario = Scenario("Invested", 0.06, 0.15)
+    first = simulate(1000, 100, 60, [scenario], paths=101, seed=7)
+    assert first.shape == (1, 101, 61)
+    np.testing.assert_array_equal(first, simulate(1000, 100, 60, [scenario], paths=101, seed=7))
+    assert not np.array_equal(first, simulate(1000, 100, 60, [scenario], paths=101, seed=8))
+
+def test_goal_probability_per_scenario():
+    scenarios = [Scenario("Flat"), Scenario("Invested", 0.07, 0.2)]
+    goals = [SavingsGoal("Easy", 5000, 12), SavingsGoal("Impossible", 10 ** 9, 24), SavingsGoal("Late", 24000, 999)]
+    projection = project_savings(0, 1000, 24, scenarios, goals, paths=1000)
+    assert projection.goal_probability.shape == (2, 3)
+    assert list(projection.goal_probability[0]) == [1.0, 0.0, 1.0]
+    assert projection.goal_probability[1, 1] == 0.0
+    assert 0.5 < projection.goal_probability[1, 2] < 1.0
+
+def test_band_months_downsample_long_timelines():
+    months = band_months(600, 121)
+    assert months[0] == 0 and months[-1] == 600
+    assert len(months) == 121
+    assert list(band_months(12, 121)) == list(range(13))
+
+def test_page_scenarios_differ_only_in_return():
+    saving, investing = projection_scenarios(annual_return=0.0, volatility=0.0, inflation=3.0, income_growth=2.0)
+    projection = project_savings(10000, 500, 240, [saving, investing], [SavingsGoal("Target", 100000, 240)])
+    np.testing.assert_allclose(projection.band(0, 50), projection.band(1, 50))
+    assert projection.goal_probability[0, 0] == projection.goal_probability[1, 0]
+    # Saving only is deflated to today's dollars too
+    nominal = project_savings(10000, 500, 240, [Scenario("Nominal", income_growth=0.02)])
+    assert projection.band(0, 50)[-1] < nominal.band(0, 50)[-1]
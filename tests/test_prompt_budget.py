@@ -0,0 +1,102 @@
+import pytest
+from app.services import metrics, prompt_budget
+from app.services.model_handlers import encode_prompt
+from app.services.model_registry import ModelRegistry
+from app.services.prefix_cache import split_prompt
+from app.services.prompt_budget import DETAIL_LEVELS, count_tokens, input_token_budget
+from app.services.recommender import build_prompt, create_gpt_prompt
+from app.services.statement_ingestion import load_statement, normalize_statement
+from app.api.models import BankStatement
+from benchmarks.synthetic import synthetic_statement, synthetic_user_data
+
+SOURCES = "Investopedia.com, NerdWallet.com"
+
+@pytest.fixture(scope="module")
+def large_statement():
+    return BankStatement.from_frame(normalize_statement(synthetic_statement(5000)))
+
+def test_gpt4_prompt_gets_the_detailed_statement(large_statement):
+    plan = build_prompt(synthetic_user_data(large_statement, "GPT-4"), SOURCES)
+
+    assert plan["template"] == "full" and plan["detail_level"] == 0
+    assert plan["input_tokens"] <= plan["budget"] == 2000
+    assert "Monthly Withdrawals by Category (last 6 months):" in plan["prompt"]
+    assert "Largest Transactions:" in plan["prompt"]
+    assert "such as Investopedia.com, NerdWallet.com." in plan["prompt"]
+
+def test_sources_may_be_a_list(large_statement):
+    _, prompt = create_gpt_prompt(synthetic_user_data(large_statement), ["Source1", "Source2"])
+    assert "such as Source1, Source2." in prompt
+
+def test_summarized_statement_lists_real_largest_transactions(tmp_path):
+    path = tmp_path / "statement.csv"
+    synthetic_statement(20000).to_csv(path, index=False)
+    frame, summarized = load_statement(str(path), memory_limit_mb=0.5)
+    assert summarized
+
+    plan = build_prompt(synthetic_user_data(BankStatement.from_frame(frame), "GPT-4"), SOURCES)
+    largest = plan["prompt"].split("Largest Transactions:\n", 1)[1].split("\n\n", 1)[0].splitlines()
+    assert len(largest) == DETAIL_LEVELS[plan["detail_level"]]["transactions"]
+    assert all(line.split(" ", 1)[1].startswith("Transaction ") for line in largest)
+
+def test_local_model_prompt_fits_its_context(large_statement):
+    plan = build_prompt(synthetic_user_data(large_statement, "gpt2"), SOURCES)
+
+    assert plan["budget"] == 1024 - 500
+    assert plan["input_tokens"] <= plan["budget"]
+    assert plan["template"] == "compact"
+    # The format instructions survive intact in the shared prefix ahead of the client's data
+    prefix, _ = split_prompt(plan["prompt"])
+    assert "---BUDGET_JSON_START---" in prefix and "---BUDGET_JSON_END---" in prefix
+
+def test_tighter_budgets_drop_detail(large_statement, monkeypatch):
+    user_data = synthetic_user_data(large_statement, "GPT-4")
+    monkeypatch.setenv("PROMPT_TOKEN_BUDGET_OPENAI", "900")
+    plan = build_prompt(user_data, SOURCES)
+    # Statement detail is kept before instruction verbosity
+    assert plan["input_tokens"] <= 900
+    assert (plan["template"], plan["detail_level"]) == ("compact", 0)
+
+    monkeypatch.setenv("PROMPT_TOKEN_BUDGET_OPENAI", "550")
+    plan = build_prompt(user_data, SOURCES)
+    assert plan["input_tokens"] <= 550
+    assert plan["detail_level"] > 0
+
+    monkeypatch.setenv("PROMPT_TOKEN_BUDGET_OPENAI", "50")
+    plan = build_prompt(user_data, SOURCES)
+    # Nothing fits: the most compact prompt is used and still carries the totals
+    assert plan["input_tokens"] > 50
+    assert (plan["template"], plan["detail_level"]) == ("compact", len(DETAIL_LEVELS) - 1)
+    assert "Total Withdrawals:" in plan["prompt"]
+
+def test_budget_reserves_output_tokens(monkeypatch):
+    monkeypatch.setenv("LLM_MAX_OUTPUT_TOKENS_HUGGINGFACE", "300")
+    assert input_token_budget("distilgpt2") == 1024 - 300
+    monkeypatch.setenv("PROMPT_TOKEN_BUDGET_OPENAI", "100000")
+    assert input_token_budget("GPT-4") == 8192 - 1500
+
+def test_prompt_tokens_are_recorded(large_statement):
+    metrics.reset_metrics()
+    build_prompt(synthetic_user_data(large_statement, "gpt2"), SOURCES)
+    assert metrics.PROMPT_TOKENS.snapshot()[("huggingface",)]["count"] == 1
+    metrics.reset_metrics()
+
+def test_resident_tokenizer_is_used_for_counting(tiny_gpt2, monkeypatch):
+    tokenizer, _ = tiny_gpt2
+    registry = ModelRegistry(loader=lambda model_name: tiny_gpt2)
+    monkeypatch.setattr(prompt_budget, "model_registry", registry)
+
+    text = "budget save rent food income"
+    assert count_tokens(text, "gpt2") == len(text) // 3 + 1  # estimate before the model is loaded
+    registry.get("gpt2")
+    assert count_tokens(text, "gpt2") == len(tokenizer(text)["input_ids"]) == 5
+
+def test_overlong_prompts_keep_their_end(tiny_gpt2):
+    tokenizer, model = tiny_gpt2
+    prompt = " ".join(["w1"] * 400 + ["budget", "save"])
+
+    inputs, max_new_tokens = encode_prompt(tokenizer, model, prompt)
+
+    assert max_new_tokens == model.config.n_positions // 2
+    assert inputs["input_ids"].shape[1] == model.config.n_positions - max_new_tokens
+    assert tokenizer.decode(inputs["input_ids"][0][-2:]) == "budget save"
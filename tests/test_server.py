@@ -0,0 +1,72 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import httpx
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def worker_pids(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as children:
+        return [int(child) for child in children.read().split()]
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/task"), reason="needs Linux /proc")
+def test_server_forks_workers_and_replaces_dead_ones():
+    port = free_port()
+    env = {**os.environ, "ADVICE_CACHE_ENABLED": "false", "HF_PRELOAD_MODELS": ""}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.api.server", "--port", str(port), "--workers", "2", "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/")
+                break
+            except httpx.TransportError:
+                assert time.monotonic() < deadline, "server did not start"
+                time.sleep(0.2)
+        assert response.status_code == 200
+        workers = worker_pids(server.pid)
+        assert len(workers) == 2
+
+        os.kill(workers[0], signal.SIGKILL)
+        deadline = time.monotonic() + 15
+        while len(set(worker_pids(server.pid)) - {workers[0]}) < 2:
+            assert time.monotonic() < deadline, "dead worker was not replaced"
+            time.sleep(0.2)
+        assert httpx.get(f"http://127.0.0.1:{port}/").status_code == 200
+    finally:
+        server.send_signal(signal.SIGTERM)
+        assert server.wait(timeout=20) == 0
+
+def test_stop_handlers_are_installed_before_workers_are_forked(monkeypatch):
+    from app.api.server import Supervisor
+
+    supervisor = Supervisor(app=None, sock=None, workers=3, limit_concurrency=0)
+    handlers = []
+
+    def spawn(number):
+        handlers.append(signal.getsignal(signal.SIGTERM))
+        if number == 1:
+            # A stop signal arriving while the workers are being forked
+            supervisor.stop(signal.SIGTERM, None)
+
+    monkeypatch.setattr(supervisor, "spawn", spawn)
+    previous = {signum: signal.getsignal(signum) for signum in (signal.SIGINT, signal.SIGTERM)}
+    try:
+        supervisor.run()
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+    assert handlers == [supervisor.stop, supervisor.stop]
@@ -0,0 +1,53 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from app.services import backends
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cold import of an entry point, in seconds; torch + transformers alone take longer than this
+IMPORT_TIME_BUDGET_SECONDS = float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", "3.0"))
+
+HEAVY_MODULES = ["torch", "transformers"]
+
+def cold_import(module):
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(json.dumps({'seconds': time.perf_counter() - start, "
+        f"'loaded': [name for name in {HEAVY_MODULES!r} if name in sys.modules]}}))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+@pytest.mark.parametrize("module", ["app.api.main", "app.ui.advice", "app.services.recommender"])
+def test_entry_points_import_without_local_model_runtime(module):
+    result = cold_import(module)
+    assert result["loaded"] == []
+    assert result["seconds"] < IMPORT_TIME_BUDGET_SECONDS
+
+def test_runtime_is_imported_once_on_first_use():
+    first = backends.load_runtime("huggingface")
+    assert [module.__name__ for module in first] == HEAVY_MODULES
+    assert backends.load_runtime("huggingface") is first
+    assert "huggingface" in backends.get_backend_stats()["loaded_backends"]
+
+def test_models_map_to_backends():
+    assert backends.backend_for_model("GPT-4") == "openai"
+    assert backends.backend_for_model("distilgpt2") == "huggingface"
+    assert backends.backend_for_model("llama") is None
+    models = backends.supported_models()
+    assert models[0] == backends.DEFAULT_MODEL
+    assert all(backends.backend_for_model(model) for model in models)
+
+def test_api_models_do_not_import_the_services_layer():
+    code = "import sys, app.api.models\nprint(sorted(name for name in sys.modules if name.startswith('app.services')))"
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip().splitlines()[-1] == "[]"
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.api.models import BankStatement
+from app.services.statement_index import LARGEST_TRANSACTIONS, StatementIndex
+from app.services.statement_ingestion import aggregate_statement_chunks
+
+def transactions(rows=500, categories=("Rent", "Groceries", "Dining", "Income"), start="2023-01-01", days=400, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Date': pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, rows), 'D'),
+        'Description': [f"Transaction {i}" for i in range(rows)],
+        'Category': rng.choice(list(categories), rows),
+        'Withdrawals': np.where(rng.random(rows) < 0.2, 0.0, rng.integers(1, 500, rows).astype(float)),
+        'Deposits': np.where(rng.random(rows) < 0.9, 0.0, rng.integers(1, 3000, rows).astype(float)),
+    })
+
+def reference_cube(frame, column):
+    month = frame['Date'].dt.to_period('M')
+    cube = frame.groupby(['Category', month], observed=True)[column].sum().unstack(fill_value=0.0)
+    cube.index = cube.index.astype(str)
+    return cube
+
+def test_index_matches_groupby():
+    frame = BankStatement(transactions()).to_frame()
+    index = StatementIndex.from_frame(frame)
+
+    for column in ('Withdrawals', 'Deposits'):
+        assert index.total(column) == pytest.approx(frame[column].sum())
+        expected_totals = frame.groupby('Category', observed=True)[column].sum()
+        expected_totals.index = expected_totals.index.astype(str)
+        pd.testing.assert_series_equal(index.category_totals(column), expected_totals, check_names=False)
+        expected = reference_cube(frame, column)
+        cube = index.cube(column)
+        pd.testing.assert_frame_equal(cube[expected.columns], expected, check_names=False)
+        # Months without transactions are present and empty
+        assert (cube.drop(columns=expected.columns).to_numpy() == 0).all()
+
+    assert index.cube('Count').to_numpy().sum() == len(frame)
+    assert list(index.months) == list(pd.period_range(frame['Date'].min(), frame['Date'].max(), freq='M'))
+    pd.testing.assert_series_equal(
+        index.largest['Withdrawals'],
+        frame['Withdrawals'].nlargest(LARGEST_TRANSACTIONS).reset_index(drop=True),
+    )
+
+def test_append_matches_a_fresh_build():
+    first = transactions(seed=1)
+    # New categories and months on both sides of the existing range
+    later = transactions(rows=200, categories=("Dining", "Travel"), start="2022-06-01", days=900, seed=2)
+    statement = BankStatement(first)
+    statement.fingerprint()
+    statement.aggregates()
+
+    appended = statement.append(later)
+    fresh = BankStatement(pd.concat([first, later], ignore_index=True))
+
+    assert len(appended) == len(first) + len(later)
+    assert appended.fingerprint() == fresh.fingerprint()
+    for column in ('Withdrawals', 'Deposits', 'Count'):
+        pd.testing.assert_frame_equal(appended.aggregates().cube(column), fresh.aggregates().cube(column))
+    pd.testing.assert_series_equal(appended.category_totals(), fresh.category_totals())
+    pd.testing.assert_frame_equal(appended.aggregates().largest, fresh.aggregates().largest)
+    # The original statement and its index are unchanged
+    assert len(statement) == len(first)
+    assert "Travel" not in statement.aggregates().categories
+
+def test_append_without_existing_index_builds_lazily():
+    first, later = transactions(rows=50, seed=3), transactions(rows=20, seed=4)
+    appended = BankStatement(first).append(later.to_dict("records"))
+    fresh = BankStatement(pd.concat([first, later], ignore_index=True))
+    assert appended.fingerprint() == fresh.fingerprint()
+    assert appended.total('Withdrawals') == pytest.approx(fresh.total('Withdrawals'))
+
+def test_rolling_mean_over_calendar_months():
+    frame = pd.DataFrame({
+        'Date': pd.to_datetime(['2024-01-15', '2024-02-15', '2024-04-15', '2024-04-20']),
+        'Description': ['a', 'b', 'c', 'd'],
+        'Category': ['Rent', 'Rent', 'Rent', 'Food'],
+        'Withdrawals': [300.0, 600.0, 900.0, 30.0],
+        'Deposits': 0.0,
+    })
+    rolling = StatementIndex.from_frame(frame).rolling_mean(3)
+    assert list(rolling.columns.astype(str)) == ['2024-01', '2024-02', '2024-03', '2024-04']
+    assert rolling.loc['Rent'].tolist() == [300.0, 450.0, 300.0, 500.0]
+    assert rolling.loc['Food'].tolist() == [0.0, 0.0, 0.0, 10.0]
+    with pytest.raises(ValueError):
+        StatementIndex.from_frame(frame).rolling_mean(0)
+
+def test_undated_transactions_count_in_totals_only():
+    frame = pd.DataFrame({
+        'Date': pd.to_datetime(['2024-01-15', None]),
+        'Description': ['a', 'b'],
+        'Category': ['Rent', 'Rent'],
+        'Withdrawals': [100.0, 50.0],
+        'Deposits': [0.0, np.nan],
+    })
+    index = StatementIndex.from_frame(frame)
+    assert index.category_totals()['Rent'] == 150.0
+    assert index.cube().to_numpy().tolist() == [[100.0]]
+    assert index.total('Deposits') == 0.0
+
+def test_largest_skips_monthly_totals_of_summarized_statements():
+    raw = transactions(rows=2000)
+    summarized = aggregate_statement_chunks([raw.iloc[:1000], raw.iloc[1000:]], top_n=5)
+    statement = BankStatement.from_frame(summarized)
+    expected = raw.nlargest(5, 'Withdrawals')['Description'].tolist()
+
+    largest = statement.aggregates().largest
+    assert sorted(largest['Description']) == sorted(expected)
+    # Monthly totals still count towards the totals
+    assert statement.total('Withdrawals') == pytest.approx(raw['Withdrawals'].sum())
+
+    # Also when the summarized rows extend an existing index
+    base = BankStatement(transactions(rows=10, seed=1))
+    base.aggregates()
+    appended = base.append(statement)
+    assert not appended.to_frame()['Summary'].iloc[:10].any()
+    assert not appended.aggregates().largest['Description'].str.contains("monthly total").any()
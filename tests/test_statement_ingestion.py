@@ -0,0 +1,191 @@
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from app.services import statement_ingestion
+from app.services.statement_ingestion import (
+    TOP_TRANSACTIONS, StatementCache, content_hash, load_statement, normalize_statement,
+)
+
+def sample_statement():
+    # Same layout as the sample statement shown in the app
+    return pd.DataFrame({
+        'Date': ['9/1/2024', '9/5/2024', '9/10/2024', '9/15/2024', '9/16/2024'],
+        'Description': ['Paycheck', 'Rent Payment', 'Groceries', 'Utilities', 'Coffee'],
+        'Debit': ['', '$1,000', '300', '200.50', '100'],
+        'Credit': ['3500', '', '', '', ''],
+        'Category': ['Income', 'Rent', 'Groceries', 'Utilities', 'Personal'],
+        'Balance': ['3500', '2500', '2200', '2000', '1900']
+    })
+
+def test_maps_debit_credit_layout_and_cleans_currency():
+    df = normalize_statement(sample_statement())
+
+    assert list(df.columns) == ['Date', 'Description', 'Category', 'Withdrawals', 'Deposits', 'Balance']
+    assert df['Withdrawals'].tolist() == [0.0, 1000.0, 300.0, 200.5, 100.0]
+    assert df['Deposits'].tolist() == [3500.0, 0.0, 0.0, 0.0, 0.0]
+    assert df['Date'].iloc[0] == pd.Timestamp("2024-09-01")
+
+def test_mixed_date_formats_and_numeric_columns():
+    df = normalize_statement(pd.DataFrame({
+        'Date': ['2023-05-01', '05/02/2023', 'May 3, 2023'],
+        'Description': ['Salary', 'Rent', 'Coffee'],
+        'Category': ['Income', 'Housing', 'Dining'],
+        'Withdrawals': [0, 1500, 4.5],
+        'Deposits': [5000, None, None],
+    }))
+
+    assert df['Date'].dt.day.tolist() == [1, 2, 3]
+    assert df['Deposits'].tolist() == [5000.0, 0.0, 0.0]
+
+def test_missing_columns_are_reported():
+    with pytest.raises(ValueError, match="missing required columns: Category"):
+        normalize_statement(pd.DataFrame({'Date': ['2023-01-01'], 'Description': ['x'], 'Withdrawals': [1]}))
+
+def test_invalid_values_report_line_numbers():
+    statement = sample_statement()
+    statement.loc[2, 'Debit'] = 'abc'
+    with pytest.raises(ValueError, match=r"Invalid amount in column 'Withdrawals' on line\(s\) 4"):
+        normalize_statement(statement)
+
+    statement = sample_statement()
+    statement.loc[0, 'Date'] = 'not a date'
+    with pytest.raises(ValueError, match=r"Invalid date on line\(s\) 2"):
+        normalize_statement(statement)
+
+def large_statement_csv(rows=5000):
+    rng = np.random.default_rng(1)
+    categories = np.array(['Rent', 'Groceries', 'Dining', 'Income'])
+    df = pd.DataFrame({
+        'Date': (pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")).strftime("%m/%d/%Y"),
+        'Description': [f"Transaction {i}" for i in range(rows)],
+        'Debit': [f"${amount:,.2f}" for amount in rng.gamma(2.0, 50.0, rows).round(2)],
+        'Credit': '',
+        'Category': rng.choice(categories, rows),
+    })
+    return df.to_csv(index=False).encode()
+
+def test_large_statement_is_aggregated_in_chunks(tmp_path):
+    data = large_statement_csv()
+    full = normalize_statement(pd.read_csv(io.BytesIO(data)))
+
+    # A tiny ceiling forces the chunked path (1000-row chunks)
+    aggregated, summarized = load_statement(io.BytesIO(data), memory_limit_mb=0.01)
+
+    assert summarized
+    assert len(aggregated) <= 4 * 12 + TOP_TRANSACTIONS
+    pd.testing.assert_series_equal(
+        aggregated.groupby('Category')['Withdrawals'].sum(),
+        full.groupby('Category')['Withdrawals'].sum(),
+        check_exact=False, atol=0.05,
+    )
+    by_month = lambda df: df.groupby(df['Date'].dt.to_period('M'))['Withdrawals'].sum()
+    pd.testing.assert_series_equal(by_month(aggregated), by_month(full), check_exact=False, atol=0.05)
+    individual = aggregated[~aggregated['Description'].str.endswith("(monthly total)")]
+    assert sorted(individual['Withdrawals'], reverse=True) == full['Withdrawals'].nlargest(TOP_TRANSACTIONS).tolist()
+
+    path = tmp_path / "statement.csv"
+    path.write_bytes(data)
+    from_path, summarized = load_statement(str(path), memory_limit_mb=0.01)
+    assert summarized
+    assert from_path['Withdrawals'].sum() == pytest.approx(full['Withdrawals'].sum())
+
+def test_small_statement_is_loaded_whole():
+    data = large_statement_csv(rows=50)
+    df, summarized = load_statement(io.BytesIO(data))
+    assert not summarized
+    assert len(df) == 50
+
+def test_zero_memory_limit_is_not_the_default():
+    data = large_statement_csv(rows=50)
+    _, summarized = load_statement(io.BytesIO(data), memory_limit_mb=0)
+    assert summarized
+
+def test_chunked_errors_report_csv_lines():
+    data = large_statement_csv(rows=2500).decode().splitlines()
+    data[2200] = data[2200].replace("/2022", "/nope", 1)
+    with pytest.raises(ValueError, match=r"Invalid date on line\(s\) 2201"):
+        load_statement(io.BytesIO("\n".join(data).encode()), memory_limit_mb=0.01)
+
+def counting_loads(monkeypatch):
+    calls = []
+    def counted(source, memory_limit_mb=None):
+        calls.append(source)
+        return load_statement(source, memory_limit_mb)
+    monkeypatch.setattr(statement_ingestion, "load_statement", counted)
+    return calls
+
+def test_statement_cache_parses_each_upload_once(monkeypatch):
+    calls = counting_loads(monkeypatch)
+    cache = StatementCache(max_entries=4)
+    data = large_statement_csv(rows=50)
+
+    first = cache.load(io.BytesIO(data))
+    again = cache.load(io.BytesIO(data))
+    assert again is first
+    assert len(calls) == 1
+    assert first.rows == 50 and not first.summarized
+    assert len(first.preview) == 5
+    assert len(first.statement) == 50
+
+    cache.load(io.BytesIO(large_statement_csv(rows=60)))
+    assert len(calls) == 2
+    # The memory ceiling changes how a statement is parsed, so it is part of the key
+    assert cache.load(io.BytesIO(data), memory_limit_mb=0.01) is not first
+    # An explicit zero is a ceiling, not the default
+    assert cache.load(io.BytesIO(data), memory_limit_mb=0).summarized
+    assert cache._load_locks == {}
+
+def test_statement_cache_evicts_least_recently_used(monkeypatch):
+    calls = counting_loads(monkeypatch)
+    cache = StatementCache(max_entries=2)
+    uploads = [large_statement_csv(rows=rows) for rows in (10, 20, 30)]
+
+    first = cache.load(io.BytesIO(uploads[0]))
+    cache.load(io.BytesIO(uploads[1]))
+    cache.load(io.BytesIO(uploads[0]))
+    cache.load(io.BytesIO(uploads[2]))
+    assert cache.get_stats()["entries"] == 2
+    assert cache.load(io.BytesIO(uploads[0])) is first
+    cache.load(io.BytesIO(uploads[1]))
+    assert len(calls) == 4
+
+def test_statement_cache_memory_cap(monkeypatch):
+    calls = counting_loads(monkeypatch)
+    cache = StatementCache(max_entries=8, max_memory_mb=0.001)
+    data = large_statement_csv(rows=200)
+    cache.load(io.BytesIO(data))
+    cache.load(io.BytesIO(data))
+    assert cache.get_stats()["entries"] == 0
+    assert len(calls) == 2
+
+def test_statement_cache_does_not_keep_failures(monkeypatch):
+    calls = counting_loads(monkeypatch)
+    cache = StatementCache(max_entries=4)
+    with pytest.raises(ValueError):
+        cache.load(io.BytesIO(b"Date,Description\n2024-01-01,Coffee\n"))
+    with pytest.raises(ValueError):
+        cache.load(io.BytesIO(b"Date,Description\n2024-01-01,Coffee\n"))
+    assert len(calls) == 2
+    assert cache._load_locks == {}
+
+def test_content_hash_matches_across_sources(tmp_path):
+    data = large_statement_csv(rows=20)
+    path = tmp_path / "statement.csv"
+    path.write_bytes(data)
+
+    class Upload(io.RawIOBase):
+        """A file without getvalue, read from its current position."""
+        def __init__(self, data):
+            self._buffer = io.BytesIO(data)
+        def read(self, size=-1):
+            return self._buffer.read(size)
+        def tell(self):
+            return self._buffer.tell()
+        def seek(self, offset, whence=0):
+            return self._buffer.seek(offset, whence)
+
+    upload = Upload(data)
+    upload.seek(7)
+    assert content_hash(str(path)) == content_hash(io.BytesIO(data)) == content_hash(upload)
+    assert upload.tell() == 7